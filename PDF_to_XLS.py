@@ -1,548 +1,348 @@
+"""Interface do Streamlit do conversor de PDF para Excel (streamlit run PDF_to_XLS.py)
+
+A conversão fica em converter.py; este módulo apenas monta a página, envia
+os PDFs para a fila de trabalhos e exibe os resultados.
+"""
+import hashlib
+import json
+import locale
+import os
+import tempfile
+
 import streamlit as st
-import pdfplumber
 import pandas as pd
-import numpy as np
-from io import BytesIO
-import tempfile
-import os
-import re
-from difflib import SequenceMatcher
-import datetime
-import locale
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
-# from openpyxl.formatting.rule import DataBarRule # Removido DataBarRule
-import openpyxl
 
-# Configurar locale para português brasileiro
-try:
-    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-except:
+from converter import (
+    CHECKPOINT_PAGES, OUTPUT_FORMATS, SCAN_BACKENDS, CleaningRules, JobQueue, ResultCache,
+    available_profilers, cleanup_checkpoints, format_duration,
+)
+
+def setup_locale():
+    """Configura o locale para português brasileiro, se disponível"""
     try:
-        locale.setlocale(locale.LC_ALL, 'Portuguese_Brazil.1252')
+        locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
     except:
-        pass  # Fallback para o locale padrão
+        try:
+            locale.setlocale(locale.LC_ALL, 'Portuguese_Brazil.1252')
+        except:
+            pass  # Fallback para o locale padrão
 
-def similar(a, b):
-    """Calcula similaridade entre duas strings"""
-    return SequenceMatcher(None, a, b).ratio()
+def preview_column_config(schema):
+    """Configuração de exibição das colunas da pré-visualização conforme o esquema"""
+    column_config = {}
+    for column in schema.columns:
+        col_type = schema.kind(column)
+        if col_type == 'money':
+            column_config[column] = st.column_config.NumberColumn(column, format="R$ %.2f")
+        elif col_type == 'percent':
+            column_config[column] = st.column_config.NumberColumn(column, format="percent")
+        elif col_type == 'number':
+            column_config[column] = st.column_config.NumberColumn(column, format="%.2f")
+        elif col_type == 'date':
+            column_config[column] = st.column_config.DateColumn(column, format="DD/MM/YYYY")
+    return column_config
 
-def clean_columns(columns):
-    """Garante que os nomes das colunas sejam únicos e limpos"""
-    # Primeiro, limpar e normalizar os nomes das colunas
-    cleaned_cols = []
-    for col in columns:
-        # Garantir que a coluna não seja None
-        if col is None:
-            col = "Coluna"
-        else:
-            col = str(col).strip()
-            # Remover caracteres especiais e múltiplos espaços
-            col = re.sub(r'\s+', ' ', col)
-            if col == '':
-                col = "Coluna"
-        cleaned_cols.append(col)
-    
-    # Depois, garantir que sejam únicos
-    seen = {}
-    new_columns = []
-    for col in cleaned_cols:
-        new_col = col
-        count = 1
-        while new_col in seen:
-            new_col = f"{col}_{count}"
-            count += 1
-        seen[new_col] = True
-        new_columns.append(new_col)
-    
-    return new_columns
+@st.cache_resource
+def get_checkpoint_dir():
+    """Diretório dos checkpoints de extração; entradas sem uso há mais de 7 dias são removidas"""
+    checkpoint_dir = os.environ.get('PDF_XLS_CHECKPOINT_DIR') or os.path.join(tempfile.gettempdir(), 'pdf_xls_checkpoints')
+    cleanup_checkpoints(checkpoint_dir)
+    return checkpoint_dir
 
-def detect_column_type(column_name, sample_values):
-    """Detecta o tipo de dados de uma coluna com base no nome e valores"""
-    column_name = str(column_name).lower()
-    
-    # Padrões para reconhecimento de tipos
-    money_patterns = ['valor', 'preço', 'custo', 'total', 'r$', 'reais', 'saldo', 'montante']
-    date_patterns = ['data', 'período', 'mês', 'ano', 'dia', 'dt_']
-    percent_patterns = ['percentual', '%', 'porcentagem', 'taxa']
-    quantity_patterns = ['quantidade', 'qtd', 'qtde', 'volume', 'número', 'num']
-    
-    # Verificar pelo nome da coluna
-    if any(pattern in column_name for pattern in money_patterns):
-        return 'money'
-    elif any(pattern in column_name for pattern in date_patterns):
-        return 'date'
-    elif any(pattern in column_name for pattern in percent_patterns):
-        return 'percent'
-    elif any(pattern in column_name for pattern in quantity_patterns):
-        return 'number'
-    
-    # Se não foi possível determinar pelo nome, tentar pelos valores
-    numeric_count = 0
-    date_count = 0
-    percent_count = 0
-    money_count = 0
-    
-    # Padrões regex para detecção
-    money_regex = r'^R?\$?\s*\d+[.,]\d+$|^\d+[.,]\d+\s*R?\$?$'
-    percent_regex = r'^\d+[.,]?\d*\s*\%$'
-    date_regex = r'^\d{1,2}[/-]\d{1,2}[/-]\d{2,4}$|^\d{2,4}[/-]\d{1,2}[/-]\d{1,2}$'
-    number_regex = r'^\d+[.,]?\d*$' # Corrigido: adicionado o fechamento da aspa simples
-    
-    for value in sample_values:
-        if value is None or pd.isna(value) or str(value).strip() == '':
-            continue
-            
-        value_str = str(value).strip()
-        
-        if re.match(money_regex, value_str):
-            money_count += 1
-        elif re.match(percent_regex, value_str):
-            percent_count += 1
-        elif re.match(date_regex, value_str):
-            date_count += 1
-        elif re.match(number_regex, value_str):
-            numeric_count += 1
-    
-    # Determinar o tipo com base na contagem
-    total_valid = money_count + percent_count + date_count + numeric_count
-    if total_valid == 0:
-        return 'text'
-    
-    threshold = 0.6  # 60% dos valores precisam corresponder ao padrão
-    
-    if money_count / total_valid >= threshold:
-        return 'money'
-    elif percent_count / total_valid >= threshold:
-        return 'percent'
-    elif date_count / total_valid >= threshold:
-        return 'date'
-    elif numeric_count / total_valid >= threshold:
-        return 'number'
-    
-    return 'text'
+@st.cache_resource
+def get_result_cache():
+    """Cache de resultados compartilhado entre as sessões e reexecuções do Streamlit"""
+    max_mb = int(os.environ.get('PDF_XLS_CACHE_MB', '256'))
+    return ResultCache(
+        max_bytes=max_mb * 1024 * 1024,
+        disk_dir=os.environ.get('PDF_XLS_CACHE_DIR') or None
+    )
 
-def convert_to_numeric(value):
-    """Converte um valor para numérico, removendo caracteres não numéricos"""
-    if value is None or pd.isna(value):
-        return None
-        
-    value_str = str(value).strip()
-    
-    # Remover símbolos de moeda e outros caracteres não numéricos
-    value_str = re.sub(r'[^\d,.-]', '', value_str)
-    
-    # Substituir vírgula por ponto para conversão
-    value_str = value_str.replace(',', '.')
-    
-    try:
-        return float(value_str)
-    except:
-        return None
+@st.cache_resource
+def get_job_queue():
+    """Fila de conversões compartilhada por todas as sessões do servidor
+    
+    O diretório, o número de processos e a validade dos trabalhos concluídos
+    vêm de PDF_XLS_JOBS_DIR, PDF_XLS_JOB_WORKERS e PDF_XLS_JOB_TTL_HOURS.
+    """
+    jobs_dir = os.environ.get('PDF_XLS_JOBS_DIR') or os.path.join(tempfile.gettempdir(), 'pdf_xls_jobs')
+    ttl_hours = float(os.environ.get('PDF_XLS_JOB_TTL_HOURS', '24'))
+    return JobQueue(jobs_dir, workers=int(os.environ.get('PDF_XLS_JOB_WORKERS', '0')),
+                    ttl_seconds=ttl_hours * 3600)
+
+# Nomes das etapas exibidos no relatório de desempenho
+STAGE_LABELS = {
+    'extract': 'Extração (pdfplumber)',
+    'scan': 'Pré-análise (pypdfium2)',
+    'context': 'Contexto',
+    'alignment': 'Alinhamento de colunas',
+    'type_inference': 'Inferência de tipos',
+    'coercion': 'Conversão de tipos',
+    'concat': 'Concatenação',
+    'write': 'Gravação',
+    'format': 'Formatação',
+    'checkpoint': 'Checkpoints',
+    'stitch': 'União de tabelas entre páginas',
+}
 
-def convert_to_date(value):
-    """Tenta converter um valor para data"""
-    if value is None or pd.isna(value):
-        return None
+def show_performance_report(result):
+    """Exibe o relatório de desempenho da conversão em um expander"""
+    report = result.performance_report()
+    with st.expander("⏱️ Diagnóstico de desempenho"):
+        col1, col2, col3 = st.columns(3)
+        if report['total_seconds'] is not None:
+            col1.metric("Tempo total", f"{report['total_seconds']:.2f} s")
+        col2.metric("Páginas", f"{report['pages']} ({report['pages_skipped']} puladas)")
+        if report['peak_rss_mb'] is not None:
+            col3.metric("Pico de memória", f"{report['peak_rss_mb']:.0f} MB")
         
-    value_str = str(value).strip()
-    
-    # Formatos comuns de data no Brasil
-    date_formats = [
-        '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%Y-%m-%d',
-        '%d/%m/%y', '%d-%m-%y', '%y/%m/%d', '%y-%m-%d'
+        stages = pd.DataFrame(
+            [(STAGE_LABELS.get(stage, stage), seconds) for stage, seconds in report['stage_seconds'].items()],
+            columns=['Etapa', 'Segundos']
+        )
+        st.dataframe(stages, hide_index=True, column_config={'Segundos': st.column_config.NumberColumn(format="%.3f")})
+        
+        st.markdown(
+            f"- Tentativas de estratégia: {report['strategy_attempts']} "
+            f"(acertos: {report['strategy_hits']}, falhas: {report['strategy_misses']})\n"
+            f"- Tabelas encontradas: {report['tables_found']}, descartadas pelo filtro de linhas: "
+            f"{report['tables_dropped']} ({report['rows_dropped']} linhas removidas), com erro: {report['tables_failed']}\n"
+            f"- Partes de tabelas unidas entre páginas: {report['tables_stitched']}, tabelas repetidas descartadas: "
+            f"{report['tables_deduplicated']}\n"
+            f"- Colunas: {report['columns_seen']} cabeçalhos, {report['columns_merged']} unificados "
+            f"({report['column_comparisons']} comparações de similaridade)"
+        )
+        
+        if report['page_stats']:
+            st.caption("Por página")
+            st.dataframe(pd.DataFrame(report['page_stats']), hide_index=True)
+        
+        if result.profile:
+            st.caption("Perfilador")
+            st.code(result.profile, language=None)
+
+def show_column_mapping(column_mapping):
+    """Exibe as colunas unificadas pelo alinhamento de cabeçalhos"""
+    if not column_mapping:
+        return
+    rows = [
+        (canonical, variant, count)
+        for canonical, variants in column_mapping.items()
+        for variant, count in variants.items()
     ]
-    
-    for fmt in date_formats:
-        try:
-            return datetime.datetime.strptime(value_str, fmt).date()
-        except:
-            continue
-            
-    return None
+    with st.expander(f"🔗 Colunas unificadas ({len(column_mapping)})"):
+        st.dataframe(pd.DataFrame(rows, columns=['Coluna', 'Cabeçalho original', 'Tabelas']), hide_index=True)
 
-def convert_to_percent(value):
-    """Converte um valor para percentual"""
-    if value is None or pd.isna(value):
-        return None
+def show_single_result(file_name, result, output, output_format):
+    """Exibe o resultado da conversão de um único PDF: avisos, download e pré-visualização"""
+    if result.stats.get('pages_resumed'):
+        st.info(f"♻️ {result.stats['pages_resumed']} páginas recuperadas de uma execução anterior.")
+    for message in result.warnings:
+        st.warning(message)
+    
+    if not result.table_count:
+        st.warning("⚠️ Nenhuma tabela encontrada no PDF.")
+    else:
+        total_tables = result.table_count
+        st.success(f"✅ {total_tables} tabelas processadas!")
         
-    value_str = str(value).strip()
-    
-    # Remover o símbolo de percentual
-    value_str = value_str.replace('%', '')
-    
-    # Substituir vírgula por ponto para conversão
-    value_str = value_str.replace(',', '.')
+        format_label, extension, mime = OUTPUT_FORMATS[output_format]
+        
+        st.download_button(
+            label="⬇️ Baixar Arquivo Excel Consolidado" if output_format == 'xlsx'
+                  else f"⬇️ Baixar Arquivo {format_label} Consolidado",
+            data=output,
+            file_name=file_name.replace('.pdf', '') + '_tabelas_consolidadas' + extension,
+            mime=mime
+        )
+        
+        st.subheader("📋 Pré-visualização da Tabela Consolidada")
+        try:
+            # Prévia montada durante o processamento, com os mesmos tipos da planilha
+            st.dataframe(result.preview, column_config=preview_column_config(result.schema))
+        except Exception as e:
+            st.warning(f"Não foi possível gerar pré-visualização: {str(e)}")
     
-    try:
-        return float(value_str) / 100.0
-    except:
-        return None
+    show_column_mapping(result.column_mapping)
+    show_performance_report(result)
 
-def process_dataframe(df):
-    """Processa o DataFrame para converter tipos de dados"""
-    # Criar uma cópia para não modificar o original
-    processed_df = df.copy()
-    
-    # Detectar e converter tipos de dados para cada coluna
-    for col in processed_df.columns:
-        # Pular colunas de metadados
-        if col in ['Origem', 'Página', 'Tabela']:
-            continue
-            
-        # Obter amostra de valores não nulos
-        sample_values = processed_df[col].dropna().astype(str).tolist()[:20]
-        if not sample_values:
-            continue
-            
-        # Detectar tipo da coluna
-        col_type = detect_column_type(col, sample_values)
+def process_single_upload(uploaded_file, options):
+    """Converte um único PDF pela fila de trabalhos, com cache de resultados"""
+    try:
+        # Reexecuções e reenvios do mesmo arquivo são atendidos pelo cache
+        cache = get_result_cache()
+        settings = {'adaptive': options['adaptive'], 'streaming': options['streaming'], 'format': options['format'],
+                    'align': options['align'], 'stitch': options['stitch'], 'cleaning': options['cleaning'].settings(),
+                    'backend': options['backend']}
+        cache_key = cache.make_key(uploaded_file.getbuffer(), settings)
+        cached = cache.get(cache_key) if options['profiler'] is None else None
+        if cached is not None:
+            discard_job()
+            show_single_result(uploaded_file.name, *cached, options['format'])
+            return
         
-        # Converter valores com base no tipo detectado
-        if col_type == 'money':
-            processed_df[col] = processed_df[col].apply(convert_to_numeric)
-        elif col_type == 'number':
-            processed_df[col] = processed_df[col].apply(convert_to_numeric)
-        elif col_type == 'date':
-            processed_df[col] = processed_df[col].apply(convert_to_date)
-        elif col_type == 'percent':
-            processed_df[col] = processed_df[col].apply(convert_to_percent)
-    
-    return processed_df
+        status = submitted_job([uploaded_file], dict(options, consolidate=False))
+        if not status['finished']:
+            show_job_progress(status['id'])
+            return
+        
+        state = status['files'][0]
+        if state['status'] != 'done':
+            st.error(f"❌ Falha no processamento: {state['error'] or status['error'] or 'conversão cancelada'}")
+            return
+        result = get_job_queue().result(status['id'])
+        output = None
+        if status['outputs'] and result.table_count:
+            with open(status['outputs'][0][1], 'rb') as f:
+                output = f.read()
+        if options['profiler'] is None:
+            cache.put(cache_key, result, output)
+        show_single_result(uploaded_file.name, result, output, options['format'])
+    
+    except Exception as e:
+        st.error(f"❌ Falha no processamento: {str(e)}")
 
-def detect_table_type(df):
-    """Detecta o tipo de tabela com base nas colunas e conteúdo"""
-    # Implementação básica - pode ser expandida com mais heurísticas
-    cols = [str(col).lower() for col in df.columns]
-    
-    # Verificar padrões comuns em colunas
-    financial_keywords = ['valor', 'preço', 'custo', 'total', 'r$', 'reais', 'saldo']
-    date_keywords = ['data', 'período', 'mês', 'ano', 'dia']
-    person_keywords = ['nome', 'pessoa', 'cliente', 'funcionário', 'cpf', 'cnpj']
-    
-    financial_score = sum(1 for kw in financial_keywords if any(kw in col for col in cols))
-    date_score = sum(1 for kw in date_keywords if any(kw in col for col in cols))
-    person_score = sum(1 for kw in person_keywords if any(kw in col for col in cols))
-    
-    if financial_score > max(date_score, person_score):
-        return "financial"
-    elif date_score > max(financial_score, person_score):
-        return "date"
-    elif person_score > max(financial_score, date_score):
-        return "person"
+# Ícones do estado de cada arquivo de um lote
+BATCH_STATUS_LABELS = {
+    'queued': '⏳ Na fila',
+    'running': '🔄 Processando',
+    'done': '✅ Concluído',
+    'failed': '❌ Falha',
+    'cancelled': '⏹️ Cancelado',
+}
+
+def batch_key(uploaded_files, settings):
+    """Identifica um lote pelo conteúdo dos arquivos e pelas configurações"""
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    for uploaded_file in uploaded_files:
+        digest.update(uploaded_file.name.encode())
+        digest.update(hashlib.sha256(uploaded_file.getbuffer()).digest())
+    return digest.hexdigest()
+
+def batch_status_table(states):
+    """Tabela com o estado de cada arquivo de um lote"""
+    rows = []
+    for state in states:
+        pages = f"{state['pages']} de {state['total_pages']}" if state['total_pages'] is not None else ''
+        eta = format_duration(state['eta']) if state['eta'] is not None and state['status'] == 'running' else ''
+        rows.append((state['name'], BATCH_STATUS_LABELS[state['status']], pages, state['tables'], state['rows'],
+                     eta, state['seconds']))
+    return pd.DataFrame(rows, columns=['Arquivo', 'Situação', 'Páginas', 'Tabelas', 'Linhas', 'Restante', 'Segundos'])
+
+def describe_file_progress(state):
+    """Resumo de uma linha do progresso de um arquivo da fila, para a barra de progresso"""
+    if state['status'] == 'queued':
+        return "Aguardando na fila de conversões..."
+    if not state['total_pages']:
+        return "Abrindo o PDF..."
+    text = f"Página {state['pages']} de {state['total_pages']} · {state['tables']} tabelas"
+    if state['pages'] >= state['total_pages']:
+        text += " · gerando o arquivo de saída"
+    elif state['eta'] is not None:
+        text += f" · cerca de {format_duration(state['eta'])} restantes"
+    return text
+
+@st.fragment(run_every=1.0)
+def show_job_progress(job_id):
+    """Acompanha um trabalho da fila sem bloquear o restante da página"""
+    status = get_job_queue().status(job_id)
+    if status is None or status['finished']:
+        st.rerun()
+    states = status['files']
+    if len(states) == 1:
+        state = states[0]
+        fraction = state['pages'] / state['total_pages'] if state['total_pages'] else 0.0
+        st.progress(min(1.0, fraction), text=describe_file_progress(state))
+        # Primeiras linhas assim que ficam prontas, sem esperar o fim da conversão
+        preview = get_job_queue().preview(job_id)
+        if preview is not None:
+            preview_df, schema = preview
+            st.dataframe(preview_df, column_config=preview_column_config(schema))
+        return
+    
+    done = sum(1 for state in states if state['status'] in ('done', 'failed', 'cancelled'))
+    if all(state['total_pages'] for state in states):
+        # Todas as páginas conhecidas: progresso por página
+        fraction = sum(state['pages'] for state in states) / sum(state['total_pages'] for state in states)
     else:
-        return "general"
+        fraction = done / len(states)
+    st.progress(min(1.0, fraction), text=f"Processando {len(states)} PDFs: {done} concluídos")
+    st.dataframe(batch_status_table(states), hide_index=True,
+                 column_config={'Segundos': st.column_config.NumberColumn(format="%.1f")})
 
-def standardize_columns(all_tables):
-    """Padroniza as colunas entre tabelas similares para facilitar a concatenação"""
-    if not all_tables:
-        return []
-    
-    # Agrupar tabelas por tipo
-    table_groups = {}
-    for df in all_tables:
-        table_type = detect_table_type(df)
-        if table_type not in table_groups:
-            table_groups[table_type] = []
-        table_groups[table_type].append(df)
-    
-    standardized_tables = []
-    
-    # Processar cada grupo separadamente
-    for table_type, tables in table_groups.items():
-        # Encontrar colunas comuns no grupo
-        column_freq = {}
-        for df in tables:
-            for col in df.columns:
-                col_lower = str(col).lower()
-                if col_lower not in column_freq:
-                    column_freq[col_lower] = {'count': 0, 'variations': {}}
-                column_freq[col_lower]['count'] += 1
-                if col not in column_freq[col_lower]['variations']:
-                    column_freq[col_lower]['variations'][col] = 0
-                column_freq[col_lower]['variations'][col] += 1
-        
-        # Determinar o nome padrão para cada coluna (o mais frequente)
-        standard_names = {}
-        for col_lower, data in column_freq.items():
-            variations = data['variations']
-            standard_names[col_lower] = max(variations.items(), key=lambda x: x[1])[0]
+def show_batch_results(status):
+    """Exibe o resultado de um lote concluído: situação, avisos e downloads"""
+    states = status['files']
+    if status['error']:
+        st.error(f"❌ Falha no processamento: {status['error']}")
+    for state in states:
+        if state['status'] == 'failed':
+            st.error(f"❌ {state['name']}: {state['error']}")
+        for message in state['warnings']:
+            st.warning(f"{state['name']}: {message}")
+    
+    total_tables = sum(state['tables'] for state in states if state['status'] == 'done')
+    if not total_tables:
+        st.warning("⚠️ Nenhuma tabela encontrada nos PDFs.")
+    else:
+        converted = sum(1 for state in states if state['status'] == 'done')
+        st.success(f"✅ {total_tables} tabelas processadas em {converted} arquivos!")
         
-        # Padronizar cada tabela no grupo
-        for df in tables:
-            # Criar mapeamento de nomes de colunas
-            col_mapping = {}
-            for col in df.columns:
-                col_lower = str(col).lower()
-                if col_lower in standard_names:
-                    col_mapping[col] = standard_names[col_lower]
-            
-            # Renomear colunas
-            if col_mapping:
-                df = df.rename(columns=col_mapping)
-            
-            standardized_tables.append(df)
-    
-    return standardized_tables
+        options = status['options']
+        format_label, extension, mime = OUTPUT_FORMATS[options['format']]
+        for index, (file_name, path) in enumerate(status['outputs']):
+            if options['consolidate']:
+                label = f"⬇️ Baixar Arquivo {'Excel' if options['format'] == 'xlsx' else format_label} Consolidado"
+            else:
+                label = f"⬇️ {file_name}"
+            with open(path, 'rb') as f:
+                st.download_button(label=label, data=f.read(), file_name=file_name, mime=mime,
+                                   key=f"batch_download_{index}")
+    
+    st.dataframe(batch_status_table(states), hide_index=True,
+                 column_config={'Segundos': st.column_config.NumberColumn(format="%.1f")})
+    show_column_mapping(status['column_mapping'])
 
-def extract_tables_with_context(file):
-    """Extrai tabelas com contexto do texto anterior"""
-    all_tables_data = []  # Lista para armazenar DataFrames com contexto
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(file.getvalue())
-        tmp_path = tmp_file.name
-    
-    try:
-        with pdfplumber.open(tmp_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                # Tentar diferentes estratégias de extração
-                extraction_strategies = [
-                    {"vertical_strategy": "text", "horizontal_strategy": "text"},
-                    {"vertical_strategy": "lines", "horizontal_strategy": "lines"},
-                    {"vertical_strategy": "lines_strict", "horizontal_strategy": "lines_strict"}
-                ]
-                
-                tables = []
-                for strategy in extraction_strategies:
-                    try:
-                        tables = page.extract_tables(strategy)
-                        if tables and any(len(t) > 1 for t in tables):
-                            break  # Encontrou tabelas válidas, usar esta estratégia
-                    except Exception:
-                        continue  # Tentar próxima estratégia
-                
-                page_text = page.extract_text()
-                
-                for table_num, table in enumerate(tables, 1):
-                    if not table or len(table) <= 1:  # Ignorar tabelas vazias
-                        continue
-                        
-                    try:
-                        # Processar tabela
-                        headers = table[0]
-                        data = table[1:]
-                        
-                        # Garantir headers únicos e limpos
-                        headers = clean_columns(headers)
-                        
-                        # Criar DataFrame
-                        df = pd.DataFrame(data, columns=headers)
-                        
-                        # Limpar dados
-                        # Remover linhas vazias ou com muitos valores nulos
-                        df = df.dropna(how='all').reset_index(drop=True)
-                        df = df.loc[df.apply(lambda x: x.astype(str).str.strip().ne('').sum() > len(x) * 0.3, axis=1)]
-                        
-                        if not df.empty:
-                            # Obter contexto (texto antes da tabela)
-                            context = f"Página {page_num}, Tabela {table_num}"
-                            try:
-                                # Estimar a posição Y da tabela
-                                y_position = 0
-                                for word in page.extract_words():
-                                    if any(cell and str(cell).strip() in word['text'] for row in table for cell in row):
-                                        y_position = word['top']
-                                        break
-                                
-                                if y_position > 0:
-                                    upper_part = page.crop((0, 0, page.width, y_position))
-                                    context_text = upper_part.extract_text()
-                                    if context_text:
-                                        context_lines = [line.strip() for line in context_text.split('\n') if line.strip()]
-                                        if context_lines:
-                                            # Pegar as últimas linhas como contexto (ajustado para pegar mais texto)
-                                            context = ' '.join(context_lines[-7:]) # Aumentado para 7 linhas
-                                        else:
-                                            # Fallback se não encontrar texto antes da tabela mas houver texto na página
-                                            if page_text.strip():
-                                                context = ' '.join(page_text.strip().split('\n')[-3:])
-                                    
-                            except Exception:
-                                # Se falhar, manter o contexto padrão
-                                pass
-                            
-                            # Adicionar colunas de metadados
-                            df['Origem'] = context
-                            df['Página'] = page_num
-                            df['Tabela'] = table_num
-                            
-                            all_tables_data.append(df)
-                    except Exception as e:
-                        st.warning(f"Ignorando tabela na página {page_num} devido a erro: {str(e)}")
-                        continue
-    finally:
-        try:
-            os.unlink(tmp_path)
-        except:
-            pass
-    
-    # Não agrupar por similaridade, apenas retornar a lista de tabelas
-    return all_tables_data
+def submitted_job(uploaded_files, options):
+    """Situação do trabalho da fila para os arquivos enviados
+    
+    O id do trabalho fica na sessão; um novo trabalho é enviado à fila apenas
+    quando os arquivos ou as configurações mudam (ou o anterior expirou).
+    """
+    settings = {key: options[key] for key in ('adaptive', 'streaming', 'format', 'align', 'stitch', 'consolidate',
+                                              'backend', 'profiler')}
+    settings['cleaning'] = options['cleaning'].settings()
+    key = batch_key(uploaded_files, settings)
+    job_queue = get_job_queue()
+    status = None
+    if st.session_state.get('job_key') == key:
+        status = job_queue.status(st.session_state['job_id'])
+    if status is None:
+        discard_job()
+        job_id = job_queue.submit([(uploaded_file.name, uploaded_file.getbuffer()) for uploaded_file in uploaded_files],
+                                  options)
+        st.session_state['job_id'] = job_id
+        st.session_state['job_key'] = key
+        status = job_queue.status(job_id)
+    return status
 
-def format_excel_worksheet(worksheet, df):
-    """Aplica formatação a uma planilha Excel (sem barras de dados)"""
-    # Definir estilos
-    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    border = Border(
-        left=Side(style='thin'), 
-        right=Side(style='thin'), 
-        top=Side(style='thin'), 
-        bottom=Side(style='thin')
-    )
-    
-    # Aplicar estilos ao cabeçalho
-    for cell in worksheet[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        cell.border = border
-    
-    # Ajustar largura das colunas
-    for i, column in enumerate(df.columns, 1):
-        column_letter = get_column_letter(i)
-        # Calcular largura baseada no conteúdo
-        max_length = max(
-            len(str(column)),
-            df[column].astype(str).apply(len).max() if not df.empty else 0
-        )
-        adjusted_width = min(max(max_length + 2, 10), 50)  # Entre 10 e 50 caracteres
-        worksheet.column_dimensions[column_letter].width = adjusted_width
-    
-    # Aplicar formatação condicional para colunas numéricas
-    for i, column in enumerate(df.columns, 1):
-        column_letter = get_column_letter(i)
-        
-        # Detectar tipo de coluna
-        # Pular colunas de metadados
-        if column in ['Origem', 'Página', 'Tabela']:
-             for cell in worksheet[column_letter][1:]:
-                cell.alignment = Alignment(vertical='center', wrap_text=True)
-                cell.border = border
-             continue
-            
-        sample_values = df[column].dropna().astype(str).tolist()[:20]
-        if not sample_values:
-            # Aplicar bordas e alinhamento padrão mesmo se não houver dados
-            for cell in worksheet[column_letter][1:]:
-                cell.alignment = Alignment(vertical='center', wrap_text=True)
-                cell.border = border
-            continue
-            
-        col_type = detect_column_type(column, sample_values)
-        
-        # Aplicar formatação baseada no tipo
-        if col_type == 'money':
-            # Formato de moeda
-            for cell in worksheet[column_letter][1:]:
-                if cell.value is not None and isinstance(cell.value, (int, float)):
-                    cell.number_format = 'R$ #,##0.00'
-                    cell.alignment = Alignment(horizontal='right')
-                cell.border = border
-            
-        elif col_type == 'percent':
-            # Formato percentual
-            for cell in worksheet[column_letter][1:]:
-                if cell.value is not None and isinstance(cell.value, (int, float)):
-                    cell.number_format = '0.00%'
-                    cell.alignment = Alignment(horizontal='right')
-                cell.border = border
-        elif col_type == 'number':
-            # Formato numérico
-            for cell in worksheet[column_letter][1:]:
-                if cell.value is not None and isinstance(cell.value, (int, float)):
-                    cell.number_format = '#,##0.00'
-                    cell.alignment = Alignment(horizontal='right')
-                cell.border = border
-        elif col_type == 'date':
-            # Formato de data
-            for cell in worksheet[column_letter][1:]:
-                if cell.value is not None and isinstance(cell.value, datetime.date):
-                    cell.number_format = 'dd/mm/yyyy'
-                    cell.alignment = Alignment(horizontal='center')
-                cell.border = border
-        else:
-            # Texto
-            for cell in worksheet[column_letter][1:]:
-                cell.alignment = Alignment(vertical='center', wrap_text=True)
-                cell.border = border
-    
-    # Congelar painéis para facilitar a navegação
-    worksheet.freeze_panes = 'D2'  # Congelar cabeçalho e colunas de metadados
-    
-    # Adicionar filtros ao cabeçalho
-    worksheet.auto_filter.ref = worksheet.dimensions
+def process_batch_upload(uploaded_files, options):
+    """Converte vários PDFs pela fila de trabalhos, mantendo o script livre"""
+    status = submitted_job(uploaded_files, options)
+    if status['finished']:
+        show_batch_results(status)
+    else:
+        show_job_progress(status['id'])
 
-def create_excel_file(all_tables):
-    """Cria arquivo Excel com todas as tabelas concatenadas em uma única planilha"""
-    if not all_tables:
-        # Criar planilha vazia como fallback
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            pd.DataFrame(['Nenhuma tabela válida foi encontrada']).to_excel(
-                writer, sheet_name="Info", index=False)
-        output.seek(0)
-        return output
-    
-    output = BytesIO()
-    
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Concatenar todas as tabelas em uma única planilha
-        try:
-            # Processar tipos de dados para cada tabela individualmente antes de concatenar
-            processed_tables = [process_dataframe(df) for df in all_tables]
-            
-            # Coletar todas as colunas possíveis de todas as tabelas processadas
-            all_columns = set()
-            for df in processed_tables:
-                all_columns.update(df.columns)
-            
-            # Garantir que todas as tabelas tenham as mesmas colunas antes de concatenar
-            final_tables = []
-            for df in processed_tables:
-                # Criar cópia para não modificar o original
-                std_df = df.copy()
-                # Adicionar colunas faltantes com valores NaN
-                for col in all_columns:
-                    if col not in std_df.columns:
-                        std_df[col] = pd.NA
-                final_tables.append(std_df)
-                
-            # Concatenar todas as tabelas padronizadas
-            combined_df = pd.concat(final_tables, ignore_index=True)
-            
-            # Reordenar colunas para que metadados fiquem primeiro
-            metadata_cols = ['Origem', 'Página', 'Tabela']
-            other_cols = [col for col in combined_df.columns if col not in metadata_cols]
-            # Garantir que todas as colunas de metadados existam antes de reordenar
-            ordered_cols = [col for col in metadata_cols if col in combined_df.columns] + other_cols
-            combined_df = combined_df[ordered_cols]
-            
-            # Salvar na planilha principal
-            combined_df.to_excel(writer, sheet_name="Todas as Tabelas", index=False)
-            
-            # Aplicar formatação à planilha principal
-            workbook = writer.book
-            worksheet = writer.sheets["Todas as Tabelas"]
-            format_excel_worksheet(worksheet, combined_df)
-            
-        except Exception as e:
-            # Fallback: criar planilha simples se a padronização ou concatenação falhar
-            st.warning(f"Usando método alternativo de agrupamento devido a: {str(e)}")
-            
-            # Simplesmente concatenar sem padronização e processamento de tipos
-            simple_combined = pd.concat(all_tables, ignore_index=True, sort=False)
-            simple_combined.to_excel(writer, sheet_name="Todas as Tabelas", index=False)
-            
-            # Aplicar formatação básica
-            worksheet = writer.sheets["Todas as Tabelas"]
-            format_excel_worksheet(worksheet, simple_combined)
-    
-    output.seek(0)
-    return output
+def discard_job():
+    """Cancela (se ainda não terminou) e descarta o trabalho da sessão, se houver"""
+    job_id = st.session_state.pop('job_id', None)
+    st.session_state.pop('job_key', None)
+    if job_id is not None:
+        get_job_queue().cancel(job_id)
 
 def main():
+    setup_locale()
     st.set_page_config(
         page_title="PDF para Excel Avançado",
         page_icon="📊",
@@ -555,50 +355,111 @@ def main():
     - Extrai todas as tabelas do PDF
     - Identifica o contexto/título de cada tabela
     - Combina todas as tabelas em uma única planilha sequencialmente
+    - Une tabelas que continuam de uma página para a outra e ignora quadros repetidos em todas as páginas
     - Detecta e formata automaticamente tipos de dados (números, datas, moeda)
     - Aplica formatação profissional às planilhas (sem barras de dados)
     - Mantém a origem de cada linha de dados
+    - Converte vários PDFs ao mesmo tempo, em um arquivo consolidado ou um por PDF
     """)
     
-    uploaded_file = st.file_uploader(
-        "Carregue seu arquivo PDF",
+    adaptive = st.sidebar.checkbox(
+        "Seleção adaptativa de estratégia",
+        value=True,
+        help="Pula páginas com poucos caracteres e ordena as estratégias de cada página pelas linhas de grade e pela quantidade de caracteres"
+    )
+    
+    backend = st.sidebar.selectbox(
+        "Pré-análise das páginas",
+        list(SCAN_BACKENDS),
+        format_func=lambda key: SCAN_BACKENDS[key],
+        help="Com o pypdfium2, páginas sem regiões tabulares (texto corrido) são descartadas antes da análise "
+             "de layout do pdfplumber; muito mais rápido em documentos com muito texto"
+    )
+    
+    min_filled = st.sidebar.slider(
+        "Preenchimento mínimo das linhas (%)",
+        min_value=0,
+        max_value=90,
+        value=30,
+        step=5,
+        help="Linhas de tabela com esta fração ou menos de células preenchidas são descartadas"
+    )
+    
+    align_columns = st.sidebar.checkbox(
+        "Unificar colunas semelhantes",
+        value=True,
+        help="Cabeçalhos que diferem só em maiúsculas, acentos, espaços ou pequenos erros "
+             "(\"Valor Total\", \"VALOR  TOTAL\") viram uma única coluna"
+    )
+    
+    stitch_tables = st.sidebar.checkbox(
+        "Unir tabelas quebradas entre páginas",
+        value=True,
+        help="Une as partes de uma tabela que continua na página seguinte (com ou sem o cabeçalho repetido) "
+             "e descarta tabelas repetidas em todas as páginas, como cabeçalhos e rodapés"
+    )
+    
+    output_format = st.sidebar.selectbox(
+        "Formato de saída",
+        list(OUTPUT_FORMATS),
+        format_func=lambda key: OUTPUT_FORMATS[key][0],
+        help="Parquet, Arrow e CSV preservam os tipos e não passam pelo openpyxl; indicados para PDFs grandes e análises"
+    )
+    
+    streaming = st.sidebar.checkbox(
+        "Gravação em fluxo (menos memória)",
+        value=False,
+        disabled=output_format != 'xlsx',
+        help="Grava a planilha em modo write-only a partir de arquivos temporários; indicado para PDFs grandes"
+    )
+    
+    use_checkpoints = st.sidebar.checkbox(
+        "Checkpoints de extração",
+        value=True,
+        help=f"PDFs com mais de {CHECKPOINT_PAGES} páginas são extraídos em intervalos salvos em disco; "
+             "se o processamento for interrompido, o reenvio do mesmo arquivo retoma do último intervalo concluído"
+    )
+    
+    profiler_options = ['Nenhum'] + available_profilers()
+    profiler = st.sidebar.selectbox(
+        "Perfilador",
+        profiler_options,
+        help="Perfila a conversão de cada PDF no processo da fila que a executa; ignora o cache"
+    )
+    profiler = None if profiler == 'Nenhum' else profiler
+    
+    consolidate = st.sidebar.radio(
+        "Com vários PDFs",
+        [True, False],
+        format_func=lambda value: "Um arquivo consolidado" if value else "Um arquivo por PDF",
+        help="O arquivo consolidado reúne as tabelas de todos os PDFs, com a coluna 'Arquivo' indicando a origem"
+    )
+    
+    uploaded_files = st.file_uploader(
+        "Carregue seus arquivos PDF",
         type="pdf",
-        accept_multiple_files=False
+        accept_multiple_files=True
     )
     
-    if uploaded_file is not None:
-        with st.spinner("Processando PDF..."):
-            try:
-                # A função extract_tables_with_context agora retorna apenas a lista de tabelas
-                all_tables = extract_tables_with_context(uploaded_file)
-                
-                if not all_tables:
-                    st.warning("⚠️ Nenhuma tabela encontrada no PDF.")
-                else:
-                    total_tables = len(all_tables)
-                    st.success(f"✅ {total_tables} tabelas processadas!")
-                    
-                    # A função create_excel_file agora recebe apenas a lista de tabelas
-                    output = create_excel_file(all_tables)
-                    file_name = uploaded_file.name.replace('.pdf', '') + '_tabelas_consolidadas.xlsx'
-                    
-                    st.download_button(
-                        label="⬇️ Baixar Arquivo Excel Consolidado",
-                        data=output,
-                        file_name=file_name,
-                        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                    )
-                    
-                    st.subheader("📋 Pré-visualização da Tabela Consolidada")
-                    try:
-                        # Criar uma prévia da tabela combinada
-                        preview_combined = pd.concat(all_tables, ignore_index=True).head(20)
-                        st.dataframe(preview_combined)
-                    except Exception as e:
-                        st.warning(f"Não foi possível gerar pré-visualização: {str(e)}")
-                        
-            except Exception as e:
-                st.error(f"❌ Falha no processamento: {str(e)}")
+    options = {
+        'adaptive': adaptive,
+        'align': align_columns,
+        'stitch': stitch_tables,
+        'format': output_format,
+        'streaming': streaming,
+        'checkpoint_dir': get_checkpoint_dir() if use_checkpoints else None,
+        'profiler': profiler,
+        'consolidate': consolidate,
+        'cleaning': CleaningRules(min_filled_ratio=min_filled / 100),
+        'backend': backend,
+    }
+    
+    if not uploaded_files:
+        discard_job()
+    elif len(uploaded_files) > 1:
+        process_batch_upload(uploaded_files, options)
+    else:
+        process_single_upload(uploaded_files[0], options)
 
 if __name__ == "__main__":
     main()
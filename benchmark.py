@@ -0,0 +1,455 @@
+"""Benchmark do pipeline de conversão com um corpus de PDFs sintéticos
+
+Gera PDFs com tabelas (com ou sem traçado) e conteúdo pt-BR (valores em R$,
+datas e percentuais), executa a conversão completa de cada caso em um
+processo separado e registra o tempo de cada etapa, páginas/s, linhas/s e o
+pico de memória (RSS). Com --imports, mede apenas o tempo de importação dos
+módulos em interpretadores novos (partida dos processos do pool e da linha
+de comando). Com --alignment, confere quais pares de cabeçalhos o
+ColumnAligner une. O resultado é gravado em JSON para comparação entre commits.
+
+Exemplos:
+    python benchmark.py -o bench_atual.json
+    python benchmark.py --cases ruled prose --scale 2 --compare bench_anterior.json
+    python benchmark.py --cases prose --backends pdfplumber pdfium
+    python benchmark.py --imports --repeat 5
+    python benchmark.py --alignment
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Casos do corpus sintético: páginas com tabelas, tabelas por página, linhas,
+# colunas, tabelas com traçado e páginas só de texto; em 'statement' uma única
+# tabela segue de página em página, sob um quadro repetido em todas as páginas;
+# em 'titled' cada página traz uma tabela nova com as mesmas colunas, mas com
+# outro título, que não deve ser unida à da página anterior
+CORPUS_CASES = {
+    'ruled': dict(pages=20, tables=2, rows=20, cols=5, ruled=True, prose_pages=0),
+    'unruled': dict(pages=20, tables=2, rows=20, cols=5, ruled=False, prose_pages=0),
+    'prose': dict(pages=5, tables=1, rows=15, cols=4, ruled=True, prose_pages=30),
+    'wide': dict(pages=10, tables=1, rows=45, cols=8, ruled=True, prose_pages=0),
+    'statement': dict(pages=20, tables=1, rows=40, cols=5, ruled=True, prose_pages=0, continued=True),
+    'titled': dict(pages=10, tables=1, rows=40, cols=5, ruled=True, prose_pages=0, titled=True),
+}
+
+# Destinos medidos: XLSX em memória ou em fluxo e os formatos colunares/CSV
+SINKS = {
+    'memory': ('xlsx', False),
+    'streaming': ('xlsx', True),
+    'parquet': ('parquet', False),
+    'arrow': ('arrow', False),
+    'csv': ('csv', False),
+}
+DEFAULT_SINKS = ['memory', 'streaming']
+
+# Importações medidas com --imports; 'converter_deps' inclui todas as dependências pesadas do núcleo
+IMPORT_CASES = {
+    'converter': "import converter",
+    'converter_deps': ("import converter; converter.pd.DataFrame, converter.np.ndarray, converter.pa.Table, "
+                       "converter.pdfplumber.open, converter.pdfium.PdfDocument, converter.openpyxl.Workbook"),
+    'cli': "import cli",
+    'PDF_to_XLS': "import PDF_to_XLS",
+}
+
+# Pares de cabeçalhos conferidos com --alignment e se devem cair na mesma coluna:
+# variações de grafia sim, campos diferentes com nomes parecidos não
+ALIGNMENT_CHECKS = [
+    ('Valor Total', 'VALOR  TOTAL', True),
+    ('Valor Total', 'Valor total_1', True),
+    ('Valor Total', 'ValorTotal', True),
+    ('Data Vencimento', 'Data Vencimeto', True),
+    ('Parcela', 'Parcelas', True),
+    ('Valor Líquido', 'Valor Liquidado', False),
+    ('Prêmio Líquido', 'Prêmio Liquidado', False),
+    ('Data Emissão', 'Data Admissão', False),
+    ('Saldo Atual', 'Saldo Anual', False),
+    ('Campo 1', 'Campo 2', False),
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 40
+ROW_HEIGHT = 14
+FONT_SIZE = 8
+
+def escape_pdf_text(text):
+    """Escapa uma string literal de PDF"""
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def format_brl(value):
+    """Formata um valor em reais no padrão brasileiro (R$ 1.234,56)"""
+    return 'R$ ' + f"{value:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+def synthetic_row(rnd, cols, row_num):
+    """Linha de dados com data, descrição, valor, taxa e quantidade"""
+    row = [
+        f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2024",
+        f"Parcela {row_num + 1}",
+        format_brl(rnd.randint(1, 250000) / 100),
+        f"{rnd.randint(0, 20)},{rnd.randint(0, 9)}%",
+        str(rnd.randint(1, 500)),
+    ][:cols]
+    row += [f"Cód {rnd.randint(100, 999)}" for _ in range(cols - len(row))]
+    # Algumas células vazias, como nos extratos reais
+    if cols > 3 and rnd.random() < 0.1:
+        row[rnd.randrange(2, cols)] = ''
+    return row
+
+def synthetic_headers(cols):
+    headers = ['Data', 'Descrição', 'Valor Pago', 'Taxa %', 'Quantidade'][:cols]
+    return headers + [f"Campo {i}" for i in range(len(headers) + 1, cols + 1)]
+
+def build_page_content(page_index, case, rnd):
+    """Gera o fluxo de conteúdo de uma página"""
+    ops = []
+
+    def text(x, y, value, size=FONT_SIZE):
+        ops.append(f"BT /F1 {size} Tf {x:.2f} {y:.2f} Td ({escape_pdf_text(value)}) Tj ET")
+
+    def table(rows, top, ruled):
+        """Desenha as linhas de uma tabela a partir de top; retorna a posição da borda inferior"""
+        column_width = (PAGE_WIDTH - 2 * MARGIN) / len(rows[0])
+        for r, row in enumerate(rows):
+            for c, cell in enumerate(row):
+                text(MARGIN + 2 + c * column_width, top - (r + 1) * ROW_HEIGHT + 4, cell)
+
+        bottom = top - len(rows) * ROW_HEIGHT
+        if ruled:
+            for r in range(len(rows) + 1):
+                row_y = top - r * ROW_HEIGHT
+                ops.append(f"{MARGIN} {row_y:.2f} m {PAGE_WIDTH - MARGIN:.2f} {row_y:.2f} l S")
+            for c in range(len(rows[0]) + 1):
+                col_x = MARGIN + c * column_width
+                ops.append(f"{col_x:.2f} {top:.2f} m {col_x:.2f} {bottom:.2f} l S")
+        return bottom
+
+    y = PAGE_HEIGHT - 50
+    text(MARGIN, y, f"Seguradora Exemplo S.A. - Extrato {page_index + 1}", 12)
+    y -= 20
+
+    if page_index >= case['pages']:
+        # Página só de texto corrido
+        for i in range(50):
+            text(MARGIN, y, f"Cláusula {i + 1}: o segurado declara estar ciente das condições gerais da apólice.")
+            y -= 13
+        return "\n".join(ops)
+
+    cols = case['cols']
+    if case.get('continued'):
+        # Quadro idêntico no topo de todas as páginas, extraído como tabela
+        y = table([['Seguradora Exemplo S.A.', 'CNPJ 00.000.000/0001-00'],
+                   ['Central de atendimento', '0800 000 0000']], y, ruled=True) - 20
+        rows = [synthetic_row(rnd, cols, page_index * case['rows'] + r) for r in range(case['rows'])]
+        if page_index == 0:
+            text(MARGIN, y, "Demonstrativo de parcelas da apólice nº 1000")
+            y -= 18
+        if page_index % 2 == 0:
+            # O cabeçalho é repetido em páginas alternadas; nas demais a tabela continua direto pelos dados
+            rows = [synthetic_headers(cols)] + rows
+        table(rows, y, case['ruled'])
+        text(MARGIN, 30, f"Página {page_index + 1}")
+        return "\n".join(ops)
+
+    if case.get('titled'):
+        # Quadros de títulos alternados que chegam ao pé da página
+        text(MARGIN, y, ['Prêmios emitidos', 'Sinistros pagos'][page_index % 2])
+        y -= 18
+        rows = [synthetic_headers(cols)] + [synthetic_row(rnd, cols, r) for r in range(case['rows'])]
+        table(rows, y, case['ruled'])
+        return "\n".join(ops)
+
+    for table_index in range(case['tables']):
+        text(MARGIN, y, f"Demonstrativo {table_index + 1} da apólice nº {1000 + page_index}")
+        y -= 14
+        text(MARGIN, y, f"Período de referência {page_index % 12 + 1:02d}/2024")
+        y -= 18
+
+        rows = [synthetic_headers(cols)] + [synthetic_row(rnd, cols, r) for r in range(case['rows'])]
+        y = table(rows, y, case['ruled']) - 30
+    return "\n".join(ops)
+
+def write_synthetic_pdf(path, pages=5, tables=2, rows=10, cols=5, ruled=True, prose_pages=0, continued=False,
+                        titled=False, seed=1):
+    """Grava um PDF sintético mínimo (Helvetica, WinAnsiEncoding) com tabelas e texto"""
+    case = dict(pages=pages, tables=tables, rows=rows, cols=cols, ruled=ruled, continued=continued, titled=titled)
+    rnd = random.Random(seed)
+    contents = [build_page_content(i, case, rnd).encode('cp1252') for i in range(pages + prose_pages)]
+
+    page_count = len(contents)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(page_count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, content in enumerate(contents):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/CropBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+
+    with open(path, 'wb') as f:
+        f.write(output)
+    return path
+
+def scaled_case(name, scale):
+    """Parâmetros de um caso do corpus com o número de páginas multiplicado por scale"""
+    case = dict(CORPUS_CASES[name])
+    case['pages'] = max(1, round(case['pages'] * scale))
+    case['prose_pages'] = round(case['prose_pages'] * scale)
+    return case
+
+def build_corpus(case_names, corpus_dir, scale=1.0, seed=1):
+    """Gera os PDFs do corpus e retorna {caso: caminho}"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = {}
+    for name in case_names:
+        case = scaled_case(name, scale)
+        paths[name] = write_synthetic_pdf(os.path.join(corpus_dir, f"{name}.pdf"), seed=seed, **case)
+    return paths
+
+def round_mb(value):
+    return None if value is None else round(value, 1)
+
+def run_case(pdf_path, sink_name, workers, adaptive, backend='pdfplumber'):
+    """Converte um PDF e mede as etapas (executado em um processo novo para isolar a memória)"""
+    import converter
+
+    baseline_rss = converter.peak_rss_mb()
+    sink = converter.make_sink(*SINKS[sink_name])
+
+    started = time.perf_counter()
+    result, excel_file = converter.convert_pdf(pdf_path, sink, workers=workers, adaptive=adaptive,
+                                                  backend=backend)
+    with excel_file:
+        excel_file.seek(0, os.SEEK_END)
+        output_bytes = excel_file.tell()
+    elapsed = time.perf_counter() - started
+
+    report = result.performance_report()
+    return {
+        'pages': report['pages'],
+        'tables': report['tables'],
+        'rows': report['rows'],
+        'seconds': round(elapsed, 4),
+        'pages_per_second': round(report['pages'] / elapsed, 2),
+        'rows_per_second': round(report['rows'] / elapsed, 2),
+        'stage_seconds': {stage: round(value, 4) for stage, value in report['stage_seconds'].items()},
+        'baseline_rss_mb': round_mb(baseline_rss),
+        'peak_rss_mb': round_mb(report['peak_rss_mb']),
+        'peak_worker_rss_mb': round_mb(report['peak_worker_rss_mb']),  # Extração com workers > 1
+        'output_bytes': output_bytes,
+        'strategy_attempts': report['strategy_attempts'],
+        'strategy_hits': report['strategy_hits'],
+        'strategy_misses': report['strategy_misses'],
+        'tables_dropped': report['tables_dropped'],
+        'rows_dropped': report['rows_dropped'],
+        'tables_stitched': report['tables_stitched'],
+        'tables_deduplicated': report['tables_deduplicated'],
+    }
+
+def run_isolated(pdf_path, sink_name, workers, adaptive, backend='pdfplumber'):
+    """Executa run_case em um processo 'spawn' próprio, para medir o pico de RSS de forma independente"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(run_case, pdf_path, sink_name, workers, adaptive, backend).result()
+
+def measure_import(code):
+    """Tempo de execução de code (importações) em um interpretador novo, sem contar a partida do Python"""
+    script = f"import time; started = time.perf_counter(); {code}; print(time.perf_counter() - started)"
+    completed = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+def run_import_benchmark(repeat=5, log=print):
+    """Mede o tempo mediano de cada importação de IMPORT_CASES, retornando o relatório"""
+    report = {
+        'revision': git_revision(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'settings': {'repeat': repeat},
+        'imports': {},
+    }
+    for name, code in IMPORT_CASES.items():
+        runs = sorted(measure_import(code) for _ in range(repeat))
+        report['imports'][name] = round(runs[len(runs) // 2], 4)
+        log(f"{'import/' + name:<27} {report['imports'][name]:7.3f}s")
+    return report
+
+def run_alignment_checks(log=print):
+    """Alinha cada par de ALIGNMENT_CHECKS em duas tabelas e compara com o esperado, retornando o relatório"""
+    import pandas as pd
+    import converter
+
+    report = {'revision': git_revision(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'settings': {}, 'alignment': []}
+    for first, second, expected in ALIGNMENT_CHECKS:
+        aligner = converter.ColumnAligner()
+        aligner.align(pd.DataFrame(columns=[first]))
+        merged = list(aligner.align(pd.DataFrame(columns=[second])).columns) == [first]
+        report['alignment'].append({'columns': [first, second], 'expected': expected, 'merged': merged})
+        log(f"{'OK' if merged == expected else 'ERRO':<5} {first!r} {'=' if merged else '≠'} {second!r}")
+    return report
+
+def median_run(runs):
+    """Execução com o tempo total mediano"""
+    return sorted(runs, key=lambda run: run['seconds'])[len(runs) // 2]
+
+def git_revision():
+    """Commit atual do repositório, se disponível"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def result_key(case_name, sink_name, backend):
+    """Chave do resultado; a pré-análise padrão (pdfplumber) mantém as chaves dos relatórios anteriores"""
+    key = f"{case_name}/{sink_name}"
+    return key if backend == 'pdfplumber' else f"{key}/{backend}"
+
+def run_benchmark(case_names, sinks, corpus_dir, scale=1.0, repeat=1, workers=1, adaptive=True, log=print,
+                  backends=('pdfplumber',)):
+    """Gera o corpus e executa cada combinação caso x destino x pré-análise, retornando o relatório"""
+    import pandas as pd
+    import pdfplumber
+    import pypdfium2
+
+    paths = build_corpus(case_names, corpus_dir, scale)
+    report = {
+        'revision': git_revision(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pandas': pd.__version__,
+            'pdfplumber': pdfplumber.__version__,
+            'pypdfium2': pypdfium2.V_PYPDFIUM2,
+        },
+        'settings': {'scale': scale, 'repeat': repeat, 'workers': workers, 'adaptive': adaptive},
+        'corpus': {name: scaled_case(name, scale) for name in case_names},
+        'results': {},
+    }
+
+    for name in case_names:
+        for sink_name in sinks:
+            for backend in backends:
+                key = result_key(name, sink_name, backend)
+                runs = [run_isolated(paths[name], sink_name, workers, adaptive, backend) for _ in range(repeat)]
+                result = median_run(runs)
+                report['results'][key] = result
+                log(format_result_line(key, result))
+
+    return report
+
+def format_result_line(key, result):
+    stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in result['stage_seconds'].items())
+    return (f"{key:<27} {result['seconds']:7.2f}s {result['pages_per_second']:7.1f} pág/s "
+            f"{result['rows_per_second']:8.0f} linhas/s pico {result['peak_rss_mb'] or 0:6.0f} MB | {stages}")
+
+def compare_reports(previous, current):
+    """Linhas comparando o tempo total e por etapa com um relatório anterior"""
+    lines = [f"Comparação com {previous.get('revision') or 'relatório anterior'}:"]
+    if previous.get('settings') != current['settings'] or previous.get('corpus') != current.get('corpus'):
+        lines.append("Atenção: configurações ou corpus diferentes do relatório anterior")
+    for name, seconds in current.get('imports', {}).items():
+        old_seconds = previous.get('imports', {}).get(name)
+        if old_seconds:
+            lines.append(f"{'import/' + name:<27} {(seconds - old_seconds) / old_seconds:+.0%}")
+    for key, result in current.get('results', {}).items():
+        old = previous.get('results', {}).get(key)
+        if old is None:
+            continue
+        changes = []
+        for stage in ['total'] + list(result['stage_seconds']):
+            new_seconds = result['seconds'] if stage == 'total' else result['stage_seconds'].get(stage)
+            old_seconds = old['seconds'] if stage == 'total' else old.get('stage_seconds', {}).get(stage)
+            if not old_seconds or new_seconds is None:
+                continue
+            changes.append(f"{stage} {(new_seconds - old_seconds) / old_seconds:+.0%}")
+        rss_change = (result['peak_rss_mb'] or 0) - (old['peak_rss_mb'] or 0)
+        lines.append(f"{key:<27} {', '.join(changes)}, pico {rss_change:+.0f} MB")
+    return lines
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da conversão de PDF para Excel com PDFs sintéticos.")
+    parser.add_argument('--cases', nargs='+', choices=list(CORPUS_CASES), default=list(CORPUS_CASES),
+                        help="Casos do corpus a executar (padrão: todos)")
+    parser.add_argument('--sinks', nargs='+', choices=list(SINKS), default=DEFAULT_SINKS,
+                        help="Destinos a medir (padrão: XLSX em memória e em fluxo)")
+    parser.add_argument('--backends', nargs='+', choices=['pdfplumber', 'pdfium'], default=['pdfplumber'],
+                        help="Pré-análises das páginas a medir (padrão: pdfplumber)")
+    parser.add_argument('--imports', action='store_true',
+                        help="Mede apenas o tempo de importação dos módulos (ignora casos e destinos)")
+    parser.add_argument('--alignment', action='store_true',
+                        help="Confere apenas os pares de cabeçalhos unidos pelo alinhamento de colunas")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiplicador do número de páginas")
+    parser.add_argument('--repeat', type=int, default=1, help="Execuções por caso (usa a mediana)")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="Processos de extração por documento")
+    parser.add_argument('--no-adaptive', action='store_true', help="Desativa a seleção adaptativa de estratégias")
+    parser.add_argument('--corpus-dir', help="Diretório dos PDFs gerados (padrão: temporário)")
+    parser.add_argument('-o', '--output', help="Arquivo JSON com os resultados")
+    parser.add_argument('--compare', metavar='ANTERIOR.json', help="Compara com um resultado JSON anterior")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.imports:
+        report = run_import_benchmark(repeat=max(1, args.repeat))
+    elif args.alignment:
+        report = run_alignment_checks()
+    else:
+        with tempfile.TemporaryDirectory(prefix='pdf_xls_bench_') as tmp_dir:
+            report = run_benchmark(
+                args.cases, args.sinks, args.corpus_dir or tmp_dir,
+                scale=args.scale, repeat=max(1, args.repeat),
+                workers=args.workers, adaptive=not args.no_adaptive, backends=args.backends
+            )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print("\n".join(compare_reports(previous, report)))
+
+    if any(check['merged'] != check['expected'] for check in report.get('alignment', [])):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
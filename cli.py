@@ -0,0 +1,393 @@
+"""Conversão de PDFs para Excel pela linha de comando, sem a interface do Streamlit
+
+Exemplos:
+    python cli.py extratos/ -o saida/ -j 4
+    python cli.py "extratos/2024-*.pdf" --consolidate consolidado.xlsx --json
+    python cli.py extratos/ --format parquet -o saida/
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import converter
+
+OUTPUT_SUFFIX = '_tabelas_consolidadas'
+
+# Registro das entradas do arquivo consolidado, gravado ao lado dele
+MANIFEST_SUFFIX = '.manifest.json'
+
+# Valores de --cell-styles (None decide pelo número de linhas da planilha)
+CELL_STYLE_CHOICES = {'auto': None, 'always': True, 'never': False}
+
+def find_pdfs(inputs):
+    """Expande arquivos, diretórios (recursivamente) e padrões glob em uma lista de PDFs sem repetição"""
+    found = []
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = sorted(glob.glob(os.path.join(item, '**', '*.pdf'), recursive=True) +
+                                glob.glob(os.path.join(item, '**', '*.PDF'), recursive=True))
+        elif glob.has_magic(item):
+            candidates = sorted(glob.glob(item, recursive=True))
+        else:
+            candidates = [item]
+
+        for path in candidates:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                found.append(path)
+    return found
+
+def output_path_for(pdf_path, output_dir=None, output_format='xlsx'):
+    """Caminho do arquivo gerado para um PDF (mesmo nome usado pela interface)"""
+    extension = converter.OUTPUT_FORMATS[output_format][1]
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0] + OUTPUT_SUFFIX + extension
+    return os.path.join(output_dir or os.path.dirname(pdf_path) or '.', base_name)
+
+def is_up_to_date(output_path, input_paths):
+    """Indica se o arquivo de saída existe e é mais recente que todas as entradas"""
+    try:
+        output_mtime = os.path.getmtime(output_path)
+        return all(os.path.getmtime(path) <= output_mtime for path in input_paths)
+    except OSError:
+        return False
+
+def input_signature(pdf_path):
+    """Caminho absoluto, data de modificação e tamanho de uma entrada (None se ela não puder ser lida)"""
+    try:
+        stat = os.stat(pdf_path)
+    except OSError:
+        return {'path': os.path.abspath(pdf_path), 'mtime_ns': None, 'size': None}
+    return {'path': os.path.abspath(pdf_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+def write_manifest(output_path, signatures, summaries):
+    """Grava o manifesto do consolidado: entradas usadas, com a assinatura e o status de cada uma"""
+    manifest = {'inputs': [dict(signature, status=summary['status'])
+                           for signature, summary in zip(signatures, summaries)]}
+    partial_path = output_path + MANIFEST_SUFFIX + '.part'
+    with open(partial_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(partial_path, output_path + MANIFEST_SUFFIX)
+
+def is_consolidated_up_to_date(output_path, pdf_paths):
+    """Indica se o consolidado foi gerado com sucesso a partir exatamente destas entradas, sem alterações
+
+    Entradas que falharam, foram alteradas, incluídas ou removidas desde a
+    última execução (ou a falta do manifesto) tornam a saída desatualizada.
+    """
+    try:
+        if not os.path.exists(output_path):
+            return False
+        with open(output_path + MANIFEST_SUFFIX, encoding='utf-8') as f:
+            recorded = json.load(f)['inputs']
+        current = [input_signature(path) for path in pdf_paths]
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    return (all(entry.get('status') == 'ok' for entry in recorded) and
+            [{key: entry.get(key) for key in ('path', 'mtime_ns', 'size')} for entry in recorded] == current)
+
+def new_summary(pdf_path, output_path):
+    """Resumo inicial do processamento de um arquivo"""
+    return {
+        'input': pdf_path,
+        'output': output_path,
+        'status': 'pending',
+        'tables': 0,
+        'rows': 0,
+        'pages': 0,
+        'seconds': 0.0,
+        'warnings': [],
+        'column_mapping': {},
+        'error': None,
+    }
+
+def fill_summary(summary, result, started, options):
+    """Copia as contagens de um ConversionResult para o resumo do arquivo"""
+    summary['status'] = 'ok'
+    summary['tables'] = result.table_count
+    summary['rows'] = result.row_count
+    summary['pages'] = result.stats.get('pages', 0)
+    summary['warnings'] = list(result.warnings)
+    summary['column_mapping'] = dict(result.column_mapping)
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    if options['report']:
+        summary['performance'] = result.performance_report()
+    return summary
+
+def write_profile(result, path):
+    """Grava o relatório do perfilador ao lado da saída, se a conversão foi perfilada"""
+    if result.profile:
+        with open(path + '.profile.txt', 'w', encoding='utf-8') as f:
+            f.write(result.profile)
+
+def convert_file(pdf_path, output_path, options):
+    """Converte um PDF em um arquivo de saída próprio (executado nos processos do pool)"""
+    summary = new_summary(pdf_path, output_path)
+    started = time.perf_counter()
+    try:
+        sink = converter.make_sink(options['format'], options['streaming'], cell_styles=options['cell_styles'])
+        result, output_file = converter.convert_pdf(pdf_path, sink, workers=1, adaptive=options['adaptive'],
+                                                   profiler=options['profile'],
+                                                   checkpoint_dir=options['checkpoint_dir'],
+                                                   align_columns=options['align'], cleaning=options['cleaning'],
+                                                   backend=options['backend'], stitch_tables=options['stitch'])
+
+        # Gravar em arquivo temporário e renomear, para não deixar saídas incompletas
+        partial_path = output_path + '.part'
+        with output_file, open(partial_path, 'wb') as f:
+            shutil.copyfileobj(output_file, f)
+        os.replace(partial_path, output_path)
+
+        write_profile(result, output_path)
+        fill_summary(summary, result, started, options)
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+def extract_file_to_spool(pdf_path, spool_path, options, profile_base):
+    """Extrai e tipa as tabelas de um PDF, gravando-as em um arquivo temporário para a consolidação
+
+    Retorna o resumo e o esquema inferido para o arquivo. O perfil, se pedido,
+    é gravado em profile_base + '.profile.txt'.
+    """
+    summary = new_summary(pdf_path, None)
+    started = time.perf_counter()
+    schema = converter.ColumnSchema()
+    try:
+        result = converter.spool_tables(pdf_path, spool_path, os.path.basename(pdf_path), options['adaptive'],
+                                        options['checkpoint_dir'], options['profile'], cleaning=options['cleaning'],
+                                        backend=options['backend'], stitch_tables=options['stitch'])
+        schema = result.schema
+        write_profile(result, profile_base)
+        fill_summary(summary, result, started, options)
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary, schema
+
+def run_tasks(function, task_args, jobs, on_done=None):
+    """Executa as tarefas em um pool de processos (ou no próprio processo com jobs=1), preservando a ordem"""
+    results = [None] * len(task_args)
+    if jobs <= 1 or len(task_args) <= 1:
+        for i, args in enumerate(task_args):
+            results[i] = function(*args)
+            if on_done is not None:
+                on_done(results[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(task_args))) as executor:
+        futures = {executor.submit(function, *args): i for i, args in enumerate(task_args)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_done is not None:
+                on_done(results[futures[future]])
+    return results
+
+def convert_separately(pdf_paths, args, options, on_done):
+    """Gera um arquivo de saída por PDF, pulando os que já estão atualizados"""
+    summaries = []
+    pending = []
+    for pdf_path in pdf_paths:
+        output_path = output_path_for(pdf_path, args.output_dir, options['format'])
+        if not args.force and is_up_to_date(output_path, [pdf_path]):
+            summary = new_summary(pdf_path, output_path)
+            summary['status'] = 'skipped'
+            summaries.append(summary)
+            on_done(summary)
+        else:
+            summaries.append(None)
+            pending.append((len(summaries) - 1, (pdf_path, output_path, options)))
+
+    results = run_tasks(convert_file, [task for _, task in pending], args.jobs, on_done)
+    for (index, _), summary in zip(pending, results):
+        summaries[index] = summary
+    return summaries
+
+def convert_consolidated(pdf_paths, args, options, on_done):
+    """Gera um único arquivo com as tabelas de todos os PDFs, na ordem dos arquivos de entrada
+
+    Os cabeçalhos são alinhados entre todos os arquivos no processo principal.
+    Entradas que falharem ficam de fora e são registradas no manifesto, para
+    que a próxima execução as tente de novo. Retorna os resumos e o
+    mapeamento das colunas unificadas.
+    """
+    output_path = args.consolidate
+    if not args.force and is_consolidated_up_to_date(output_path, pdf_paths):
+        summaries = []
+        for pdf_path in pdf_paths:
+            summary = new_summary(pdf_path, output_path)
+            summary['status'] = 'skipped'
+            summaries.append(summary)
+            on_done(summary)
+        return summaries, {}
+
+    # Assinaturas lidas antes da extração: uma entrada alterada durante a execução fica desatualizada
+    signatures = [input_signature(pdf_path) for pdf_path in pdf_paths]
+    with tempfile.TemporaryDirectory(prefix='pdf_xls_') as spool_dir:
+        task_args = [(pdf_path, os.path.join(spool_dir, f'{i}.pkl'), options,
+                      f"{os.path.splitext(output_path)[0]}.{os.path.splitext(os.path.basename(pdf_path))[0]}")
+                     for i, pdf_path in enumerate(pdf_paths)]
+        results = run_tasks(extract_file_to_spool, task_args, args.jobs,
+                            on_done=lambda result: on_done(result[0]))
+
+        # Reunir as tabelas na ordem de entrada, uma tabela por vez
+        sink = converter.make_sink(options['format'], options['streaming'], spool_dir, options['cell_styles'])
+        aligner = converter.ColumnAligner() if options['align'] else None
+        spools = []
+        for (_, spool_path, _, _), (summary, schema) in zip(task_args, results):
+            summary['output'] = output_path
+            if summary['status'] == 'ok':
+                spools.append((spool_path, summary['tables'], schema))
+
+        partial_path = output_path + '.part'
+        with converter.consolidate_spools(spools, sink, aligner) as output_file, open(partial_path, 'wb') as f:
+            shutil.copyfileobj(output_file, f)
+        os.replace(partial_path, output_path)
+
+    summaries = [summary for summary, _ in results]
+    write_manifest(output_path, signatures, summaries)
+    column_mapping = aligner.mapping() if aligner is not None else {}
+    return summaries, column_mapping
+
+def build_report(summaries, elapsed, column_mapping=None):
+    """Totais de vazão e falhas do lote
+
+    column_mapping é o mapeamento das colunas unificadas no arquivo consolidado.
+    """
+    converted = [s for s in summaries if s['status'] == 'ok']
+    pages = sum(s['pages'] for s in converted)
+    rows = sum(s['rows'] for s in converted)
+    return {
+        'files': len(summaries),
+        'converted': len(converted),
+        'skipped': sum(1 for s in summaries if s['status'] == 'skipped'),
+        'failed': sum(1 for s in summaries if s['status'] == 'failed'),
+        'pages': pages,
+        'tables': sum(s['tables'] for s in converted),
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'pages_per_second': round(pages / elapsed, 2) if elapsed > 0 else 0.0,
+        'rows_per_second': round(rows / elapsed, 2) if elapsed > 0 else 0.0,
+        'results': summaries,
+        'column_mapping': column_mapping or {},
+    }
+
+def print_summary_line(summary):
+    """Linha de progresso de um arquivo no modo texto"""
+    if summary['status'] == 'ok':
+        print(f"OK      {summary['input']} ({summary['tables']} tabelas, {summary['rows']} linhas, "
+              f"{summary['pages']} páginas, {summary['seconds']:.1f}s)", flush=True)
+        if summary['column_mapping']:
+            print(f"        colunas unificadas: {format_column_mapping(summary['column_mapping'])}", flush=True)
+        if 'performance' in summary:
+            performance = summary['performance']
+            stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in performance['stage_seconds'].items())
+            print(f"        etapas: {stages}; tentativas de estratégia: {performance['strategy_attempts']}; "
+                  f"tabelas descartadas: {performance['tables_dropped']}, unidas: {performance['tables_stitched']}, "
+                  f"repetidas: {performance['tables_deduplicated']}", flush=True)
+    elif summary['status'] == 'skipped':
+        print(f"PULADO  {summary['input']} (saída atualizada)", flush=True)
+    else:
+        print(f"FALHA   {summary['input']}: {summary['error']}", flush=True)
+
+def format_column_mapping(column_mapping):
+    """Resumo em uma linha das colunas unificadas: canônica <- variações"""
+    return '; '.join(f"{canonical} <- {', '.join(repr(variant) for variant in variants if variant != canonical)}"
+                     for canonical, variants in column_mapping.items())
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Converte PDFs em planilhas Excel com as tabelas consolidadas."
+    )
+    parser.add_argument('inputs', nargs='+', help="Arquivos PDF, diretórios ou padrões glob")
+    parser.add_argument('-o', '--output-dir', help="Diretório dos arquivos gerados (padrão: junto de cada PDF)")
+    parser.add_argument('--consolidate', metavar='ARQUIVO',
+                        help="Gera um único arquivo com as tabelas de todos os PDFs e a coluna 'Arquivo'")
+    parser.add_argument('--format', choices=list(converter.OUTPUT_FORMATS), default='xlsx',
+                        help="Formato de saída: xlsx (padrão), parquet, arrow (IPC) ou csv")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Número de processos em paralelo (padrão: todos os núcleos)")
+    parser.add_argument('-f', '--force', action='store_true',
+                        help="Converte mesmo quando a saída já está atualizada")
+    parser.add_argument('--no-adaptive', action='store_true',
+                        help="Testa sempre todas as estratégias de extração na ordem original")
+    parser.add_argument('--in-memory', action='store_true',
+                        help="Usa a gravação em memória em vez da gravação em fluxo")
+    parser.add_argument('--cell-styles', choices=list(CELL_STYLE_CHOICES), default='auto',
+                        help="Bordas e alinhamento em cada célula do XLSX: auto aplica até "
+                             f"{converter.CELL_STYLE_MAX_ROWS} linhas; acima disso só os formatos numéricos")
+    parser.add_argument('--backend', choices=list(converter.SCAN_BACKENDS), default='pdfplumber',
+                        help="Pré-análise das páginas: pdfium descarta páginas sem tabelas antes do pdfplumber")
+    parser.add_argument('--min-filled', type=float, default=30, metavar='PCT',
+                        help="Descarta linhas de tabela com PCT%% ou menos de células preenchidas (padrão: 30)")
+    parser.add_argument('--no-align', action='store_true',
+                        help="Não unifica cabeçalhos quase iguais (\"Valor Total\", \"VALOR  TOTAL\")")
+    parser.add_argument('--no-stitch', action='store_true',
+                        help="Não une tabelas quebradas entre páginas nem descarta tabelas repetidas "
+                             "(cabeçalhos e rodapés de página)")
+    parser.add_argument('--checkpoint-dir',
+                        help="Grava a extração de PDFs grandes em fragmentos neste diretório, "
+                             "retomando execuções interrompidas")
+    parser.add_argument('--json', action='store_true', help="Imprime o relatório final em JSON")
+    parser.add_argument('--report', action='store_true',
+                        help="Inclui o relatório de desempenho (etapas, páginas, memória) de cada arquivo")
+    parser.add_argument('--profile', choices=converter.PROFILERS,
+                        help="Perfila cada conversão e grava o relatório em <saída>.profile.txt")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = {
+        'adaptive': not args.no_adaptive,
+        'streaming': not args.in_memory,
+        'cell_styles': CELL_STYLE_CHOICES[args.cell_styles],
+        'report': args.report,
+        'profile': args.profile,
+        'checkpoint_dir': args.checkpoint_dir,
+        'format': args.format,
+        'align': not args.no_align,
+        'stitch': not args.no_stitch,
+        'cleaning': converter.CleaningRules(min_filled_ratio=args.min_filled / 100),
+        'backend': args.backend,
+    }
+
+    pdf_paths = find_pdfs(args.inputs)
+    if not pdf_paths:
+        print("Nenhum PDF encontrado.", file=sys.stderr)
+        return 2
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    on_done = (lambda summary: None) if args.json else print_summary_line
+    started = time.perf_counter()
+    column_mapping = None
+    if args.consolidate:
+        summaries, column_mapping = convert_consolidated(pdf_paths, args, options, on_done)
+    else:
+        summaries = convert_separately(pdf_paths, args, options, on_done)
+    report = build_report(summaries, time.perf_counter() - started, column_mapping)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"\nTotal: {report['files']} arquivos ({report['converted']} convertidos, "
+              f"{report['skipped']} pulados, {report['failed']} falhas) em {report['seconds']:.1f}s - "
+              f"{report['pages_per_second']:.1f} páginas/s, {report['rows_per_second']:.0f} linhas/s")
+        if report['column_mapping']:
+            print(f"Colunas unificadas no consolidado: {format_column_mapping(report['column_mapping'])}")
+
+    return 1 if report['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3377 @@
+"""Núcleo da conversão de PDFs para Excel: extração, tipagem, destinos e fila de trabalhos
+
+Usado pela interface do Streamlit (PDF_to_XLS.py), pela linha de comando
+(cli.py) e pelo benchmark. As dependências pesadas (pandas, NumPy, pyarrow,
+pdfplumber, pypdfium2 e openpyxl) são importadas apenas no primeiro uso:
+importar o módulo, como fazem os processos do pool, custa pouco mais que as
+importações da biblioteca padrão.
+"""
+import io
+from io import BytesIO, StringIO
+import tempfile
+import os
+import sys
+import hashlib
+import json
+import pickle
+import sqlite3
+import uuid
+import threading
+import queue
+import multiprocessing
+import shutil
+import mmap
+import time
+import cProfile
+import pstats
+import importlib
+import importlib.util
+import logging
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait as futures_wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+import re
+import bisect
+import itertools
+import unicodedata
+from difflib import SequenceMatcher
+import datetime
+try:
+    import resource  # Indisponível no Windows
+except ImportError:
+    resource = None
+
+class LazyModule:
+    """Módulo importado apenas no primeiro acesso a um de seus atributos
+    
+    Na importação, o módulo substitui o LazyModule no namespace informado,
+    de modo que os acessos seguintes não passam mais pelo proxy.
+    """
+    
+    def __init__(self, name, namespace, alias):
+        self._name = name
+        self._namespace = namespace
+        self._alias = alias
+    
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        self._namespace[self._alias] = module
+        return getattr(module, attr)
+
+pdfplumber = LazyModule('pdfplumber', globals(), 'pdfplumber')
+pdfium = LazyModule('pypdfium2', globals(), 'pdfium')
+pdfium_c = LazyModule('pypdfium2.raw', globals(), 'pdfium_c')
+pd = LazyModule('pandas', globals(), 'pd')
+np = LazyModule('numpy', globals(), 'np')
+pa = LazyModule('pyarrow', globals(), 'pa')
+pc = LazyModule('pyarrow.compute', globals(), 'pc')
+pq = LazyModule('pyarrow.parquet', globals(), 'pq')
+openpyxl = LazyModule('openpyxl', globals(), 'openpyxl')
+
+# Colunas de metadados adicionadas a cada tabela extraída ('Arquivo' só na consolidação de vários PDFs)
+SOURCE_FILE_COLUMN = 'Arquivo'
+METADATA_COLUMNS = [SOURCE_FILE_COLUMN, 'Origem', 'Página', 'Tabela']
+# Metadados de texto repetidos em todas as linhas de uma tabela: categóricos na
+# tabela consolidada e com codificação de dicionário nos formatos colunares
+DICTIONARY_COLUMNS = [SOURCE_FILE_COLUMN, 'Origem']
+
+# Padrões para reconhecimento de tipos pelo nome da coluna
+MONEY_NAME_PATTERNS = ['valor', 'preço', 'custo', 'total', 'r$', 'reais', 'saldo', 'montante']
+DATE_NAME_PATTERNS = ['data', 'período', 'mês', 'ano', 'dia', 'dt_']
+PERCENT_NAME_PATTERNS = ['percentual', '%', 'porcentagem', 'taxa']
+QUANTITY_NAME_PATTERNS = ['quantidade', 'qtd', 'qtde', 'volume', 'número', 'num']
+
+# Padrões regex para detecção pelos valores (compilados uma única vez)
+MONEY_VALUE_REGEX = re.compile(r'^R?\$?\s*\d+[.,]\d+$|^\d+[.,]\d+\s*R?\$?$')
+PERCENT_VALUE_REGEX = re.compile(r'^\d+[.,]?\d*\s*\%$')
+DATE_VALUE_REGEX = re.compile(r'^\d{1,2}[/-]\d{1,2}[/-]\d{2,4}$|^\d{2,4}[/-]\d{1,2}[/-]\d{1,2}$')
+NUMBER_VALUE_REGEX = re.compile(r'^\d+[.,]?\d*$')
+WHITESPACE_REGEX = re.compile(r'\s+')
+
+# Formato de exibição no Excel para cada tipo de coluna
+EXCEL_NUMBER_FORMATS = {
+    'money': 'R$ #,##0.00',
+    'percent': '0.00%',
+    'number': '#,##0.00',
+    'date': 'dd/mm/yyyy',
+}
+
+def similar(a, b):
+    """Calcula similaridade entre duas strings"""
+    return SequenceMatcher(None, a, b).ratio()
+
+def clean_columns(columns):
+    """Garante que os nomes das colunas sejam únicos e limpos"""
+    # Primeiro, limpar e normalizar os nomes das colunas
+    cleaned_cols = []
+    for col in columns:
+        # Garantir que a coluna não seja None
+        if col is None:
+            col = "Coluna"
+        else:
+            col = str(col).strip()
+            # Remover caracteres especiais e múltiplos espaços
+            col = WHITESPACE_REGEX.sub(' ', col)
+            if col == '':
+                col = "Coluna"
+        cleaned_cols.append(col)
+    
+    # Depois, garantir que sejam únicos
+    seen = {}
+    new_columns = []
+    for col in cleaned_cols:
+        new_col = col
+        count = 1
+        while new_col in seen:
+            new_col = f"{col}_{count}"
+            count += 1
+        seen[new_col] = True
+        new_columns.append(new_col)
+    
+    return new_columns
+
+class CleaningRules:
+    """Regras de limpeza das linhas de cada tabela extraída
+    
+    - drop_empty_rows: remove as linhas sem nenhum valor;
+    - min_filled_ratio: mantém apenas as linhas com mais dessa fração de
+      células preenchidas (não vazias após remover espaços);
+    - missing_counts_as_filled: células nulas contam como preenchidas no
+      limite acima, como no filtro original (que comparava str(None)).
+    """
+    
+    def __init__(self, min_filled_ratio=0.3, drop_empty_rows=True, missing_counts_as_filled=True):
+        self.min_filled_ratio = min_filled_ratio
+        self.drop_empty_rows = drop_empty_rows
+        self.missing_counts_as_filled = missing_counts_as_filled
+    
+    def __repr__(self):
+        return f"CleaningRules({self.settings()!r})"
+    
+    def settings(self):
+        """Configurações das regras, para chaves de cache e de checkpoints"""
+        return {
+            'min_filled_ratio': self.min_filled_ratio,
+            'drop_empty_rows': self.drop_empty_rows,
+            'missing_counts_as_filled': self.missing_counts_as_filled,
+        }
+    
+    def row_mask(self, cells, missing):
+        """Linhas mantidas de uma matriz de células (object, linhas x colunas) e da sua máscara de nulos"""
+        filled = np.char.strip(cells.astype(str)) != ''
+        if not self.missing_counts_as_filled:
+            filled &= ~missing
+        keep = filled.sum(axis=1) > cells.shape[1] * self.min_filled_ratio
+        if self.drop_empty_rows:
+            keep &= ~missing.all(axis=1)
+        return keep
+
+def table_cells(rows, width):
+    """Matriz de células (object) das linhas brutas de uma tabela
+    
+    Linhas mais curtas são completadas com None; como no construtor do
+    DataFrame, a tabela é rejeitada se a linha mais longa não tiver width células.
+    """
+    lengths = {len(row) for row in rows}
+    longest = max(lengths, default=width)
+    if longest != width:
+        raise ValueError(f"{width} colunas no cabeçalho, mas os dados têm {longest} colunas")
+    if len(lengths) == 1:
+        cells = np.empty((len(rows), width), dtype=object)
+        cells[:] = rows
+        return cells
+    cells = np.full((len(rows), width), None, dtype=object)
+    for i, row in enumerate(rows):
+        cells[i, :len(row)] = row
+    return cells
+
+def build_table_frame(table, rules=None):
+    """Monta o DataFrame de uma tabela bruta (cabeçalho + linhas), já limpo
+    
+    A limpeza das linhas é feita sobre a matriz de células, antes de o
+    DataFrame existir. O índice é o mesmo do processo anterior: a posição da
+    linha entre as que têm algum valor.
+    """
+    if rules is None:
+        rules = CleaningRules()
+    headers = clean_columns(table[0])
+    cells = table_cells(table[1:], len(headers))
+    missing = pd.isna(cells)
+    keep = rules.row_mask(cells, missing)
+    if rules.drop_empty_rows:
+        index = np.cumsum(~missing.all(axis=1)) - 1
+    else:
+        index = np.arange(len(cells))
+    return pd.DataFrame(cells[keep], columns=headers, index=index[keep])
+
+def detect_column_type(column_name, sample_values):
+    """Detecta o tipo de dados de uma coluna com base no nome e valores"""
+    column_name = str(column_name).lower()
+    
+    # Verificar pelo nome da coluna
+    if any(pattern in column_name for pattern in MONEY_NAME_PATTERNS):
+        return 'money'
+    elif any(pattern in column_name for pattern in DATE_NAME_PATTERNS):
+        return 'date'
+    elif any(pattern in column_name for pattern in PERCENT_NAME_PATTERNS):
+        return 'percent'
+    elif any(pattern in column_name for pattern in QUANTITY_NAME_PATTERNS):
+        return 'number'
+    
+    # Se não foi possível determinar pelo nome, tentar pelos valores
+    numeric_count = 0
+    date_count = 0
+    percent_count = 0
+    money_count = 0
+    
+    for value in sample_values:
+        if value is None or pd.isna(value) or str(value).strip() == '':
+            continue
+            
+        value_str = str(value).strip()
+        
+        if MONEY_VALUE_REGEX.match(value_str):
+            money_count += 1
+        elif PERCENT_VALUE_REGEX.match(value_str):
+            percent_count += 1
+        elif DATE_VALUE_REGEX.match(value_str):
+            date_count += 1
+        elif NUMBER_VALUE_REGEX.match(value_str):
+            numeric_count += 1
+    
+    # Determinar o tipo com base na contagem
+    total_valid = money_count + percent_count + date_count + numeric_count
+    if total_valid == 0:
+        return 'text'
+    
+    threshold = 0.6  # 60% dos valores precisam corresponder ao padrão
+    
+    if money_count / total_valid >= threshold:
+        return 'money'
+    elif percent_count / total_valid >= threshold:
+        return 'percent'
+    elif date_count / total_valid >= threshold:
+        return 'date'
+    elif numeric_count / total_valid >= threshold:
+        return 'number'
+    
+    return 'text'
+
+def convert_to_numeric(value):
+    """Converte um valor para numérico, removendo caracteres não numéricos"""
+    if value is None or pd.isna(value):
+        return None
+        
+    value_str = str(value).strip()
+    
+    # Remover símbolos de moeda e outros caracteres não numéricos
+    value_str = re.sub(r'[^\d,.-]', '', value_str)
+    
+    # Substituir vírgula por ponto para conversão
+    value_str = value_str.replace(',', '.')
+    
+    try:
+        return float(value_str)
+    except:
+        return None
+
+# Formatos comuns de data no Brasil, testados em ordem
+DATE_FORMATS = [
+    '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%Y-%m-%d',
+    '%d/%m/%y', '%d-%m-%y', '%y/%m/%d', '%y-%m-%d'
+]
+
+# Formato geral aceito pelos formatos de data acima
+DATE_SHAPE_REGEX = r'^\d{1,4}[/-]\d{1,2}[/-]\d{1,4}$'
+
+def convert_to_date(value):
+    """Tenta converter um valor para data"""
+    if value is None or pd.isna(value):
+        return None
+        
+    value_str = str(value).strip()
+    
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value_str, fmt).date()
+        except:
+            continue
+            
+    return None
+
+def convert_to_percent(value):
+    """Converte um valor para percentual"""
+    if value is None or pd.isna(value):
+        return None
+        
+    value_str = str(value).strip()
+    
+    # Remover o símbolo de percentual
+    value_str = value_str.replace('%', '')
+    
+    # Substituir vírgula por ponto para conversão
+    value_str = value_str.replace(',', '.')
+    
+    try:
+        return float(value_str) / 100.0
+    except:
+        return None
+
+# Tipos Arrow usados nas conversões vetorizadas e na tabela consolidada (pelo nome, sem importar o pandas)
+ARROW_STRING = 'string[pyarrow]'
+ARROW_DATE = 'date32[day][pyarrow]'
+
+# Números com agrupamento de milhar explícito, que a conversão por valor não reconhece
+PT_BR_GROUPED_REGEX = r'^-?\d{1,3}(\.\d{3})+,\d+$|^-?\d{1,3}(\.\d{3}){2,}$'
+EN_US_GROUPED_REGEX = r'^-?\d{1,3}(,\d{3})+\.\d+$|^-?\d{1,3}(,\d{3}){2,}$'
+
+def normalize_decimal_separators(text):
+    """Normaliza separadores de milhar e decimal em uma Series de strings
+    
+    Valores agrupados no padrão pt-BR (1.234,56 ou 1.234.567) ou en-US
+    (1,234.56 ou 1,234,567) perdem o separador de milhar; nos demais a vírgula
+    vira ponto, como em convert_to_numeric.
+    """
+    result = text.str.replace(',', '.', regex=False)
+    
+    pt_br = text.str.match(PT_BR_GROUPED_REGEX).fillna(False).astype(bool)
+    if pt_br.any():
+        result[pt_br] = (text[pt_br]
+                         .str.replace('.', '', regex=False)
+                         .str.replace(',', '.', regex=False))
+    
+    en_us = text.str.match(EN_US_GROUPED_REGEX).fillna(False).astype(bool)
+    if en_us.any():
+        result[en_us] = text[en_us].str.replace(',', '', regex=False)
+    
+    return result
+
+# Literais aceitos na conversão vetorizada para float
+FLOAT_REGEX = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+def to_float_array(text):
+    """Converte uma Series de strings Arrow para float64, com NaN nos valores inválidos
+    
+    O cast do Arrow arredonda exatamente como float(), inclusive em números longos.
+    """
+    values = np.full(len(text), np.nan)
+    valid = text.str.match(FLOAT_REGEX).fillna(False).to_numpy(dtype=bool)
+    if valid.any():
+        values[valid] = pc.cast(pa.array(text[valid]), pa.float64()).to_numpy(zero_copy_only=False)
+    return values
+
+# Abaixo deste número de linhas, o custo fixo das operações Arrow supera o laço
+# em Python: as colunas pequenas são convertidas valor a valor, com as mesmas regras
+VECTORIZED_MIN_ROWS = 300
+
+def normalize_decimal_text(value_str):
+    """Versão por valor de normalize_decimal_separators"""
+    if re.match(PT_BR_GROUPED_REGEX, value_str):
+        return value_str.replace('.', '').replace(',', '.')
+    if re.match(EN_US_GROUPED_REGEX, value_str):
+        return value_str.replace(',', '')
+    return value_str.replace(',', '.')
+
+def parse_float_text(value_str):
+    """Versão por valor de to_float_array: NaN se o texto não for um literal aceito"""
+    if re.match(FLOAT_REGEX, value_str):
+        return float(value_str)
+    return np.nan
+
+def convert_series_to_numeric(series):
+    """Versão vetorizada de convert_to_numeric para uma coluna inteira"""
+    if len(series) < VECTORIZED_MIN_ROWS:
+        return series.map(lambda value: np.nan if pd.isna(value) else parse_float_text(
+            normalize_decimal_text(re.sub(r'[^\d,.-]', '', str(value))))).astype('float64')
+    
+    result = pd.Series(np.nan, index=series.index, dtype='float64')
+    mask = series.notna()
+    if not mask.any():
+        return result
+    
+    # Strings Arrow executam as operações de texto sem um laço em Python
+    text = series[mask].astype(str).astype(ARROW_STRING)
+    
+    # Remover símbolos de moeda e outros caracteres não numéricos
+    text = text.str.replace(r'[^\d,.-]', '', regex=True)
+    text = normalize_decimal_separators(text)
+    
+    result[mask] = to_float_array(text)
+    return result
+
+def convert_series_to_percent(series):
+    """Versão vetorizada de convert_to_percent para uma coluna inteira"""
+    if len(series) < VECTORIZED_MIN_ROWS:
+        return series.map(lambda value: np.nan if pd.isna(value) else parse_float_text(
+            normalize_decimal_text(str(value).replace('%', '').strip())) / 100.0).astype('float64')
+    
+    result = pd.Series(np.nan, index=series.index, dtype='float64')
+    mask = series.notna()
+    if not mask.any():
+        return result
+    
+    text = series[mask].astype(str).astype(ARROW_STRING)
+    
+    # Remover o símbolo de percentual
+    text = text.str.replace('%', '', regex=False).str.strip()
+    text = normalize_decimal_separators(text)
+    
+    result[mask] = to_float_array(text) / 100.0
+    return result
+
+def parse_date_text(value_str, date_formats):
+    """Versão por valor de convert_series_to_date: o primeiro formato que ler o valor, ou NaN"""
+    if not re.match(DATE_SHAPE_REGEX, value_str):
+        return np.nan
+    for fmt in date_formats:
+        try:
+            return datetime.datetime.strptime(value_str, fmt).date()
+        except ValueError:
+            continue
+    return np.nan
+
+def convert_series_to_date(series, date_formats=None):
+    """Versão vetorizada de convert_to_date: cada formato é aplicado uma única vez à coluna"""
+    if len(series) < VECTORIZED_MIN_ROWS:
+        return series.map(lambda value: np.nan if pd.isna(value) else parse_date_text(
+            str(value).strip(), date_formats or DATE_FORMATS)).astype('object')
+    
+    result = pd.Series(None, index=series.index, dtype='object')
+    mask = series.notna()
+    if not mask.any():
+        return result
+    
+    text = series[mask].astype(str).str.strip()
+    # Apenas valores com formato de data podem ser convertidos
+    remaining = text[text.str.match(DATE_SHAPE_REGEX)]
+    
+    for fmt in date_formats or DATE_FORMATS:
+        if remaining.empty:
+            break
+        parsed = pd.to_datetime(remaining, format=fmt, errors='coerce')
+        converted = parsed.notna()
+        if converted.any():
+            result[converted[converted].index] = parsed[converted].dt.date
+            remaining = remaining[~converted]
+    
+    # Datas fora do intervalo suportado pelo pandas (ex.: antes de 1677) usam a conversão por valor
+    for index, value in remaining.items():
+        result[index] = convert_to_date(value)
+    
+    return result
+
+class ColumnType:
+    """Tipo inferido de uma coluna, com o formato de leitura e o formato de exibição"""
+    
+    def __init__(self, kind, parse_format=None):
+        self.kind = kind  # 'money', 'percent', 'number', 'date', 'text' ou None (sem valores)
+        self.parse_format = parse_format  # Formato de data predominante, se houver
+        self.display_format = EXCEL_NUMBER_FORMATS.get(kind)
+    
+    def __repr__(self):
+        return f"ColumnType({self.kind!r}, {self.parse_format!r})"
+
+class ColumnSchema:
+    """Tipos das colunas inferidos uma única vez e compartilhados pelo pipeline
+    
+    O mesmo esquema é usado na conversão dos valores, na formatação do Excel e
+    na pré-visualização. Ao combinar tabelas, vale o primeiro tipo conhecido
+    de cada coluna.
+    """
+    
+    def __init__(self):
+        self.columns = OrderedDict()  # nome da coluna -> ColumnType
+    
+    def __contains__(self, column):
+        return column in self.columns
+    
+    def __len__(self):
+        return len(self.columns)
+    
+    def get(self, column):
+        """Retorna o ColumnType da coluna ou None se ela não for conhecida"""
+        return self.columns.get(column)
+    
+    def kind(self, column):
+        """Retorna o tipo da coluna ('text' se desconhecido)"""
+        column_type = self.columns.get(column)
+        if column_type is None or column_type.kind is None:
+            return 'text'
+        return column_type.kind
+    
+    def update(self, other):
+        """Incorpora as colunas de outro esquema, sem sobrescrever tipos já conhecidos"""
+        for column, column_type in other.columns.items():
+            current = self.columns.get(column)
+            if current is None or current.kind is None:
+                self.columns[column] = column_type
+        return self
+    
+    def renamed(self, mapping):
+        """Cópia do esquema com as colunas renomeadas por mapping (nome antigo -> novo)"""
+        schema = ColumnSchema()
+        for column, column_type in self.columns.items():
+            column = mapping.get(column, column)
+            current = schema.columns.get(column)
+            if current is None or current.kind is None:
+                schema.columns[column] = column_type
+        return schema
+
+def detect_date_format(sample_values):
+    """Retorna o formato de data que reconhece mais valores da amostra"""
+    best_format, best_count = None, 0
+    for fmt in DATE_FORMATS:
+        count = 0
+        for value in sample_values:
+            try:
+                datetime.datetime.strptime(str(value).strip(), fmt)
+                count += 1
+            except:
+                continue
+        if count > best_count:
+            best_format, best_count = fmt, count
+    return best_format
+
+def infer_column_schema(df):
+    """Infere o tipo de cada coluna de dados de um DataFrame em uma única passagem"""
+    schema = ColumnSchema()
+    for col in df.columns:
+        # Pular colunas de metadados
+        if col in METADATA_COLUMNS:
+            continue
+        
+        # Obter amostra de valores não nulos
+        sample_values = df[col].dropna().head(20).astype(str).tolist()
+        if not sample_values:
+            schema.columns[col] = ColumnType(None)
+            continue
+        
+        # Detectar tipo da coluna
+        col_type = detect_column_type(col, sample_values)
+        parse_format = detect_date_format(sample_values) if col_type == 'date' else None
+        schema.columns[col] = ColumnType(col_type, parse_format)
+    return schema
+
+def apply_column_schema(df, schema):
+    """Converte as colunas de um DataFrame de acordo com os tipos do esquema"""
+    # Criar uma cópia para não modificar o original
+    processed_df = df.copy()
+    
+    for col in processed_df.columns:
+        column_type = schema.get(col)
+        if column_type is None:
+            continue
+        
+        # Converter valores com base no tipo detectado
+        if column_type.kind == 'money':
+            processed_df[col] = convert_series_to_numeric(processed_df[col])
+        elif column_type.kind == 'number':
+            processed_df[col] = convert_series_to_numeric(processed_df[col])
+        elif column_type.kind == 'date':
+            date_formats = DATE_FORMATS
+            if column_type.parse_format:
+                # Formato predominante primeiro; os demais como alternativa
+                date_formats = [column_type.parse_format] + [f for f in DATE_FORMATS if f != column_type.parse_format]
+            processed_df[col] = convert_series_to_date(processed_df[col], date_formats)
+        elif column_type.kind == 'percent':
+            processed_df[col] = convert_series_to_percent(processed_df[col])
+    
+    return processed_df
+
+def process_dataframe(df, schema=None, timer=None):
+    """Processa o DataFrame para converter tipos de dados
+    
+    Se schema for informado, os tipos inferidos para a tabela são acumulados nele.
+    Se timer for informado, recebe os tempos de 'type_inference' e 'coercion'.
+    """
+    if timer is None:
+        timer = StageTimer()
+    with timer.measure('type_inference'):
+        table_schema = infer_column_schema(df)
+    with timer.measure('coercion'):
+        processed_df = apply_column_schema(df, table_schema)
+    if schema is not None:
+        schema.update(table_schema)
+    return processed_df
+
+def detect_table_type(df):
+    """Detecta o tipo de tabela com base nas colunas e conteúdo"""
+    # Implementação básica - pode ser expandida com mais heurísticas
+    cols = [str(col).lower() for col in df.columns]
+    
+    # Verificar padrões comuns em colunas
+    financial_keywords = ['valor', 'preço', 'custo', 'total', 'r$', 'reais', 'saldo']
+    date_keywords = ['data', 'período', 'mês', 'ano', 'dia']
+    person_keywords = ['nome', 'pessoa', 'cliente', 'funcionário', 'cpf', 'cnpj']
+    
+    financial_score = sum(1 for kw in financial_keywords if any(kw in col for col in cols))
+    date_score = sum(1 for kw in date_keywords if any(kw in col for col in cols))
+    person_score = sum(1 for kw in person_keywords if any(kw in col for col in cols))
+    
+    if financial_score > max(date_score, person_score):
+        return "financial"
+    elif date_score > max(financial_score, person_score):
+        return "date"
+    elif person_score > max(financial_score, date_score):
+        return "person"
+    else:
+        return "general"
+
+# Sufixo adicionado por clean_columns a nomes repetidos ("Valor_1")
+DUPLICATE_SUFFIX_REGEX = re.compile(r'_\d+$')
+COLUMN_KEY_REGEX = re.compile(r'[^a-z0-9%$]+')
+DIGITS_REGEX = re.compile(r'\d+')
+
+def normalize_column_key(column):
+    """Chave de comparação de um cabeçalho: sem acentos, caixa, pontuação e espaços extras"""
+    text = unicodedata.normalize('NFKD', str(column).lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return COLUMN_KEY_REGEX.sub(' ', text).strip()
+
+def within_one_edit(a, b):
+    """Indica se as palavras diferem em no máximo uma inserção, remoção ou troca de caractere"""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return False
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+class ColumnAligner:
+    """Mapeia cabeçalhos quase iguais de tabelas diferentes para colunas canônicas
+    
+    Funciona de forma incremental, uma tabela por vez. Cada cabeçalho é
+    reduzido a uma chave normalizada (normalize_column_key, sem o sufixo
+    "_N" de clean_columns); chaves iguais caem na mesma coluna. Uma chave
+    nova é comparada apenas com as colunas canônicas do mesmo bloco
+    (palavras e prefixo em comum, mesmos números e comprimento compatível)
+    e o resultado fica memorizado, de modo que o custo não cresce com o
+    número de tabelas. O nome canônico é o da primeira ocorrência.
+    
+    Só são unidas variações de grafia (is_variant): chaves iguais sem os
+    espaços, ou com as mesmas palavras a menos de um caractere em palavras
+    longas. Campos diferentes com nomes parecidos ("Valor Líquido" e "Valor
+    Liquidado", "Data Emissão" e "Data Admissão") ficam separados.
+    """
+    
+    SIMILARITY_THRESHOLD = 0.88
+    MIN_EDIT_WORD_LENGTH = 6  # Palavras mais curtas precisam ser iguais
+    
+    def __init__(self, threshold=None):
+        self.threshold = threshold if threshold is not None else self.SIMILARITY_THRESHOLD
+        self.canonical_names = {}  # chave canônica -> nome canônico
+        self.key_map = {}  # chave normalizada -> chave canônica
+        self.blocks = {}  # bloco -> chaves canônicas
+        self.variants = OrderedDict()  # nome canônico -> {nome original: ocorrências}
+        self.table_types = {}  # tipo (detect_table_type) -> tabelas
+        self.columns_seen = 0
+        self.comparisons = 0
+    
+    @staticmethod
+    def _block_keys(key):
+        """Blocos da chave: cada palavra e o prefixo, junto com os números ("Campo 1" e "Campo 2" não se comparam)"""
+        digits = ' '.join(DIGITS_REGEX.findall(key))
+        words = [word for word in key.split() if len(word) >= 3 and not word.isdigit()]
+        return {(word, digits) for word in words} | {('^' + key.replace(' ', '')[:3], digits)}
+    
+    def is_variant(self, key, candidate):
+        """Indica se duas chaves normalizadas são grafias do mesmo cabeçalho"""
+        if key.replace(' ', '') == candidate.replace(' ', ''):
+            return True  # "Valor Total" e "ValorTotal"
+        words, candidate_words = key.split(), candidate.split()
+        if len(words) != len(candidate_words):
+            return False
+        return all(
+            word == other or (min(len(word), len(other)) >= self.MIN_EDIT_WORD_LENGTH and within_one_edit(word, other))
+            for word, other in zip(words, candidate_words)
+        )
+    
+    def _find_similar(self, key):
+        """Procura no índice em blocos a chave canônica mais parecida, se houver"""
+        candidates = set()
+        for block in self._block_keys(key):
+            candidates.update(self.blocks.get(block, ()))
+        
+        best_key, best_score = None, self.threshold
+        for candidate in candidates:
+            # Limite superior da razão de SequenceMatcher pelo comprimento
+            if 2 * min(len(key), len(candidate)) < best_score * (len(key) + len(candidate)):
+                continue
+            self.comparisons += 1
+            if not self.is_variant(key, candidate):
+                continue
+            score = similar(key, candidate)
+            if score >= best_score:
+                best_key, best_score = candidate, score
+        return best_key
+    
+    def _canonical(self, key, name):
+        """Retorna o nome canônico da chave, registrando uma nova coluna se necessário"""
+        canonical_key = self.key_map.get(key)
+        if canonical_key is None:
+            canonical_key = self._find_similar(key) if key else None
+            if canonical_key is None:
+                canonical_key = key
+                self.canonical_names[key] = name
+                for block in self._block_keys(key):
+                    self.blocks.setdefault(block, []).append(key)
+            self.key_map[key] = canonical_key
+        return self.canonical_names[canonical_key]
+    
+    def align(self, df):
+        """Renomeia as colunas de uma tabela para os nomes canônicos"""
+        table_type = detect_table_type(df)
+        self.table_types[table_type] = self.table_types.get(table_type, 0) + 1
+        
+        used = {column for column in df.columns if column in METADATA_COLUMNS}
+        mapping = {}
+        for column in df.columns:
+            if column in METADATA_COLUMNS:
+                continue
+            self.columns_seen += 1
+            base = DUPLICATE_SUFFIX_REGEX.sub('', str(column)) or str(column)
+            key = normalize_column_key(base)
+            canonical = self._canonical(key, base)
+            
+            # Duas colunas da mesma tabela nunca são unidas
+            first, count = canonical, 0
+            while canonical in used:
+                count += 1
+                canonical = self._canonical(f"{key} {count}", f"{first}_{count}")
+            used.add(canonical)
+            
+            variants = self.variants.setdefault(canonical, OrderedDict())
+            variants[column] = variants.get(column, 0) + 1
+            if canonical != column:
+                mapping[column] = canonical
+        
+        return df.rename(columns=mapping) if mapping else df
+    
+    def mapping(self):
+        """Colunas canônicas que receberam mais de um nome: {canônico: {nome original: ocorrências}}"""
+        return OrderedDict(
+            (canonical, dict(variants)) for canonical, variants in self.variants.items()
+            if len(variants) > 1 or canonical not in variants
+        )
+    
+    def stats(self):
+        """Contadores do alinhamento, no formato de ConversionResult.stats"""
+        return {
+            'columns_seen': self.columns_seen,
+            'columns_canonical': len(self.variants),
+            'columns_merged': sum(len(variants) - (canonical in variants)
+                                  for canonical, variants in self.variants.items()),
+            'column_comparisons': self.comparisons,
+            'table_types': dict(self.table_types),
+        }
+
+# Estratégias de extração testadas em ordem para cada página
+EXTRACTION_STRATEGIES = [
+    {"vertical_strategy": "text", "horizontal_strategy": "text"},
+    {"vertical_strategy": "lines", "horizontal_strategy": "lines"},
+    {"vertical_strategy": "lines_strict", "horizontal_strategy": "lines_strict"}
+]
+
+class StrategySelector:
+    """Decide, para cada página, se vale extrair tabelas e em que ordem testar as estratégias
+    
+    A classificação usa apenas contagens baratas (caracteres, linhas, retângulos
+    e curvas): páginas sem texto são puladas e páginas sem traçados não testam
+    as estratégias baseadas em linhas, e páginas com traçados começam por
+    'lines'. A ordem depende só da própria página, para que o resultado não
+    mude com a divisão do documento entre processos ou checkpoints.
+    Contadores de acertos/erros por estratégia permitem acompanhar o ganho.
+    """
+    
+    def __init__(self, adaptive=True, min_chars=10):
+        self.adaptive = adaptive
+        self.min_chars = min_chars
+        self.pages = 0
+        self.pages_skipped = 0
+        self.hits = {strategy_name(s): 0 for s in EXTRACTION_STRATEGIES}
+        self.misses = {strategy_name(s): 0 for s in EXTRACTION_STRATEGIES}
+    
+    def plan(self, page, scan=None):
+        """Retorna a lista ordenada de estratégias a testar (vazia para pular a página)
+        
+        Com scan (PdfiumPageScan), as contagens vêm da pré-análise e páginas
+        sem regiões tabulares são puladas sem a análise de layout do pdfplumber.
+        """
+        self.pages += 1
+        if scan is not None and not scan.tabular:
+            self.pages_skipped += 1
+            return []
+        if not self.adaptive:
+            return list(EXTRACTION_STRATEGIES)
+        
+        if (scan.char_count if scan is not None else len(page.chars)) < self.min_chars:
+            self.pages_skipped += 1
+            return []
+        
+        if scan is not None:
+            ruled = scan.ruled
+        else:
+            ruled = (len(page.lines) + len(page.rects) + len(page.curves)) > 0
+        if ruled:
+            # Tabelas com traçado: começar pelas estratégias de linhas
+            candidates = EXTRACTION_STRATEGIES[1:] + EXTRACTION_STRATEGIES[:1]
+        else:
+            # Sem traçados as estratégias de linhas nunca encontram tabelas
+            candidates = [s for s in EXTRACTION_STRATEGIES if s["vertical_strategy"] == "text"]
+        
+        return candidates
+    
+    def record(self, strategy, hit):
+        """Registra o resultado de uma tentativa de extração"""
+        name = strategy_name(strategy)
+        if hit:
+            self.hits[name] += 1
+        else:
+            self.misses[name] += 1
+    
+    def stats(self):
+        """Retorna os contadores em um dicionário serializável"""
+        return {
+            'pages': self.pages,
+            'pages_skipped': self.pages_skipped,
+            'strategy_hits': dict(self.hits),
+            'strategy_misses': dict(self.misses),
+        }
+
+def strategy_name(strategy):
+    """Nome curto de uma estratégia de extração"""
+    return strategy["vertical_strategy"]
+
+def merge_strategy_stats(target, stats):
+    """Acumula os contadores de um StrategySelector em um dicionário"""
+    target['pages'] = target.get('pages', 0) + stats['pages']
+    target['pages_skipped'] = target.get('pages_skipped', 0) + stats['pages_skipped']
+    for key in ('strategy_hits', 'strategy_misses'):
+        counters = target.setdefault(key, {})
+        for name, count in stats[key].items():
+            counters[name] = counters.get(name, 0) + count
+    if 'stage_seconds' in stats:
+        merge_stage_seconds(target, stats['stage_seconds'])
+    if 'page_stats' in stats:
+        target.setdefault('page_stats', []).extend(stats['page_stats'])
+    return target
+
+# Etapas da conversão medidas por StageTimer, na ordem em que ocorrem
+PIPELINE_STAGES = ['scan', 'extract', 'context', 'checkpoint', 'stitch', 'alignment', 'type_inference', 'coercion',
+                   'concat', 'write', 'format']
+
+class StageTimer:
+    """Acumula o tempo gasto em cada etapa da conversão e o registro de cada página
+    
+    Os tempos são somados por etapa; com extração paralela, as etapas de
+    extração e contexto somam o tempo de todos os processos.
+    """
+    
+    def __init__(self):
+        self.seconds = OrderedDict()
+        self.pages = []  # Um dicionário por página extraída (ver extract_page_tables)
+    
+    @contextmanager
+    def measure(self, stage):
+        """Mede o bloco e soma o tempo à etapa informada"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+    
+    def as_dict(self):
+        """Retorna os tempos por etapa, na ordem de PIPELINE_STAGES"""
+        ordered = [stage for stage in PIPELINE_STAGES if stage in self.seconds]
+        ordered += [stage for stage in self.seconds if stage not in PIPELINE_STAGES]
+        return {stage: self.seconds[stage] for stage in ordered}
+    
+    def add_page(self, page_stats):
+        """Registra os tempos e contadores de uma página"""
+        self.pages.append(page_stats)
+    
+    def stats(self):
+        """Retorna os tempos por etapa e os registros das páginas, no formato de merge_strategy_stats"""
+        return {'stage_seconds': self.as_dict(), 'page_stats': list(self.pages)}
+
+def merge_stage_seconds(target, seconds):
+    """Soma tempos por etapa ao dicionário 'stage_seconds' das estatísticas"""
+    stage_seconds = target.setdefault('stage_seconds', {})
+    for stage, value in seconds.items():
+        stage_seconds[stage] = stage_seconds.get(stage, 0.0) + value
+    return target
+
+def format_duration(seconds):
+    """Duração legível: '45 s', '3 min 05 s' ou '1 h 02 min'"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} min {seconds:02d} s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} h {minutes:02d} min"
+
+class ExtractionProgress:
+    """Progresso da extração: páginas concluídas, tabelas encontradas e tempo restante estimado
+    
+    A estimativa usa o ritmo das páginas extraídas nesta execução; páginas
+    recuperadas de checkpoints contam como concluídas, mas não entram no
+    ritmo. Se callback for informado, ele é chamado com o próprio objeto a
+    cada avanço, no processo e na thread que consomem as tabelas.
+    """
+    
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.total_pages = 0
+        self.pages_done = 0
+        self.pages_resumed = 0
+        self.tables_found = 0
+        self.started = time.perf_counter()
+    
+    def start(self, total_pages):
+        """Inicia a contagem para um documento com total_pages páginas"""
+        self.total_pages = total_pages
+        self.started = time.perf_counter()
+        self._notify()
+    
+    def advance(self, pages, tables, resumed=False):
+        """Registra páginas concluídas e as tabelas aproveitadas nelas"""
+        self.pages_done += pages
+        self.tables_found += tables
+        if resumed:
+            self.pages_resumed += pages
+        self._notify()
+    
+    def _notify(self):
+        if self.callback is not None:
+            self.callback(self)
+    
+    def fraction(self):
+        """Fração concluída, entre 0 e 1"""
+        if not self.total_pages:
+            return 0.0
+        return min(1.0, self.pages_done / self.total_pages)
+    
+    def eta_seconds(self):
+        """Tempo restante estimado em segundos, ou None antes da primeira página extraída"""
+        extracted = self.pages_done - self.pages_resumed
+        if extracted <= 0:
+            return None
+        remaining = max(0, self.total_pages - self.pages_done)
+        return (time.perf_counter() - self.started) / extracted * remaining
+
+def peak_rss_mb(children=False):
+    """Pico de memória residente do processo (ou do maior processo filho), em MB
+    
+    É o pico desde o início do processo, não apenas da conversão atual.
+    Retorna None onde o módulo resource não está disponível (Windows).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em bytes no macOS e em KB no Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# Perfiladores aceitos por RunProfiler; pyinstrument é opcional
+PROFILERS = ['cprofile', 'pyinstrument']
+
+def available_profilers():
+    """Perfiladores instalados no ambiente"""
+    return [name for name in PROFILERS if name == 'cprofile' or importlib.util.find_spec(name) is not None]
+
+class RunProfiler:
+    """Perfilador opcional de uma conversão, usado como gerenciador de contexto
+    
+    Com kind=None não faz nada. Apenas o processo principal é perfilado; com
+    workers > 1 a extração nos processos auxiliares não aparece no relatório.
+    """
+    
+    def __init__(self, kind=None, limit=40):
+        if kind is not None and kind not in PROFILERS:
+            raise ValueError(f"Perfilador desconhecido: {kind}")
+        self.kind = kind
+        self.limit = limit
+        self._profiler = None
+    
+    def __enter__(self):
+        if self.kind == 'pyinstrument':
+            from pyinstrument import Profiler  # Dependência opcional
+            self._profiler = Profiler()
+            self._profiler.start()
+        elif self.kind == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+        elif self.kind == 'cprofile':
+            self._profiler.disable()
+        return False
+    
+    def text(self):
+        """Relatório em texto do perfilador (None se nenhum foi usado)"""
+        if self._profiler is None:
+            return None
+        if self.kind == 'pyinstrument':
+            return self._profiler.output_text(unicode=True)
+        
+        output = StringIO()
+        pstats.Stats(self._profiler, stream=output).sort_stats('cumulative').print_stats(self.limit)
+        return output.getvalue()
+
+class PageTextIndex:
+    """Índice das linhas de texto de uma página, ordenadas pela posição vertical
+    
+    O texto da página é extraído uma única vez e compartilhado por todas as
+    tabelas; a busca das linhas acima de uma tabela é uma busca binária.
+    """
+    
+    def __init__(self, lines):
+        lines = sorted(lines, key=lambda line: line[0])
+        self.tops = [top for top, _ in lines]
+        self.texts = [text.strip() for _, text in lines]
+    
+    @classmethod
+    def from_page(cls, page):
+        """Índice a partir das linhas de texto do pdfplumber"""
+        return cls((line['top'], line['text']) for line in page.extract_text_lines(return_chars=False))
+    
+    def lines_above(self, y_position, limit=7):
+        """Retorna as últimas linhas não vazias que começam acima da posição informada"""
+        end = bisect.bisect_left(self.tops, y_position)
+        lines = [text for text in self.texts[:end] if text]
+        return lines[-limit:]
+    
+    def first_line(self):
+        """Retorna a primeira linha não vazia da página (cabeçalho de página), se houver"""
+        return next((text for text in self.texts if text), None)
+
+def find_page_tables(page, strategy):
+    """Localiza as tabelas da página, retornando (linhas, bbox, bordas das colunas) de cada uma"""
+    from pdfplumber.table import TableSettings
+    
+    table_settings = TableSettings.resolve(strategy)
+    text_settings = table_settings.text_settings or {}
+    return [
+        (table.extract(**text_settings), table.bbox, [column.bbox[0] for column in table.columns] + [table.bbox[2]])
+        for table in page.find_tables(table_settings)
+    ]
+
+def table_fingerprint(rows, top, bottom):
+    """Impressão digital de uma tabela: conteúdo das células e posição vertical na página
+    
+    Tabelas com a mesma impressão em páginas diferentes são cabeçalhos ou
+    rodapés repetidos (ver TableStitcher).
+    """
+    digest = hashlib.sha1(f"{top:.2f}:{bottom:.2f}".encode('utf-8'))
+    for row in rows:
+        for cell in row:
+            text = '' if cell is None else WHITESPACE_REGEX.sub(' ', str(cell)).strip()
+            digest.update(text.encode('utf-8') + b'\x1f')
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+def table_layout(page, table, bbox, column_edges, lines_above, page_header=None):
+    """Geometria e assinatura de uma tabela extraída, usadas para unir tabelas quebradas entre páginas
+    
+    As posições são frações da largura/altura da página; header é a primeira
+    linha bruta (antes de clean_columns), lines_above, as linhas de texto
+    logo acima da tabela (title é a última delas) e page_header, a primeira
+    linha de texto da página.
+    """
+    top, bottom = bbox[1] / page.height, bbox[3] / page.height
+    return {
+        'columns': [round(x / page.width, 4) for x in column_edges],
+        'top': round(top, 4),
+        'bottom': round(bottom, 4),
+        'header': list(table[0]),
+        'title': lines_above[-1] if lines_above else None,
+        'lines_above': list(lines_above),
+        'page_header': page_header,
+        'fingerprint': table_fingerprint(table, top, bottom),
+    }
+
+def extract_page_tables(page, page_num, warnings=None, selector=None, timer=None, cleaning=None, scan=None):
+    """Extrai as tabelas de uma única página, com o contexto do texto anterior
+    
+    Se timer (StageTimer) for informado, recebe os tempos das etapas 'extract' e
+    'context' e o registro da página: tempo, tentativas de estratégia, tabelas
+    encontradas/aproveitadas e tabelas e linhas descartadas pelo filtro de linhas.
+    cleaning (CleaningRules) define esse filtro; o padrão mantém as linhas com
+    mais de 30% das células preenchidas. Com scan (PdfiumPageScan), a decisão
+    de pular a página e o texto do contexto vêm da pré-análise do pypdfium2.
+    A geometria de cada tabela (table_layout) fica em df.attrs['layout'].
+    """
+    page_tables = []
+    if selector is None:
+        selector = StrategySelector(adaptive=False)
+    if timer is None:
+        timer = StageTimer()
+    
+    page_started = time.perf_counter()
+    page_stats = {
+        'page': page_num,
+        'seconds': 0.0,
+        'strategy_attempts': 0,
+        'strategy': None,
+        'tables_found': 0,
+        'tables_kept': 0,
+        'tables_dropped': 0,  # Tabelas esvaziadas pelo filtro de linhas
+        'rows_dropped': 0,
+        'tables_failed': 0,
+    }
+    
+    # Tentar diferentes estratégias de extração
+    tables = []
+    with timer.measure('extract'):
+        for strategy in selector.plan(page, scan):
+            page_stats['strategy_attempts'] += 1
+            try:
+                tables = find_page_tables(page, strategy)
+                if tables and any(len(t) > 1 for t, _, _ in tables):
+                    selector.record(strategy, True)
+                    page_stats['strategy'] = strategy_name(strategy)
+                    break  # Encontrou tabelas válidas, usar esta estratégia
+            except Exception:
+                tables = []
+            selector.record(strategy, False)  # Tentar próxima estratégia
+    
+    text_index = None  # Construído apenas se alguma tabela da página for aproveitada
+    
+    for table_num, (table, bbox, column_edges) in enumerate(tables, 1):
+        if not table or len(table) <= 1:  # Ignorar tabelas vazias
+            continue
+            
+        try:
+            with timer.measure('extract'):
+                # Headers únicos e limpos; linhas vazias ou pouco preenchidas removidas antes do DataFrame
+                df = build_table_frame(table, cleaning)
+            
+            page_stats['tables_found'] += 1
+            page_stats['rows_dropped'] += len(table) - 1 - len(df)
+            if df.empty:
+                page_stats['tables_dropped'] += 1
+            else:
+                # Obter contexto (texto antes da tabela)
+                context = f"Página {page_num}, Tabela {table_num}"
+                context_lines = []
+                try:
+                    # Posição Y da tabela obtida diretamente da sua bounding box
+                    y_position = bbox[1]
+                    
+                    if y_position > 0:
+                        with timer.measure('context'):
+                            if text_index is None and scan is not None:
+                                text_index = PageTextIndex(scan.text_lines())
+                            elif text_index is None:
+                                text_index = PageTextIndex.from_page(page)
+                            # Pegar as últimas linhas como contexto (ajustado para pegar mais texto)
+                            context_lines = text_index.lines_above(y_position, limit=7) # Aumentado para 7 linhas
+                        if context_lines:
+                            context = ' '.join(context_lines)
+                        
+                except Exception:
+                    # Se falhar, manter o contexto padrão
+                    pass
+                
+                # Adicionar colunas de metadados
+                df['Origem'] = context
+                df['Página'] = page_num
+                df['Tabela'] = table_num
+                df.attrs['layout'] = table_layout(page, table, bbox, column_edges, context_lines,
+                                                  text_index.first_line() if text_index is not None else None)
+                
+                page_tables.append(df)
+                page_stats['tables_kept'] += 1
+        except Exception as e:
+            page_stats['tables_failed'] += 1
+            if warnings is not None:
+                warnings.append(f"Ignorando tabela na página {page_num} devido a erro: {str(e)}")
+            continue
+    
+    page_stats['seconds'] = time.perf_counter() - page_started
+    timer.add_page(page_stats)
+    return page_tables
+
+class BufferStream:
+    """Fluxo somente leitura sobre um buffer em memória, sem copiar o conteúdo
+    
+    Cada leitura copia apenas o trecho pedido pelo pdfminer; o buffer original
+    (upload, memória compartilhada) não é duplicado.
+    """
+    
+    def __init__(self, buffer):
+        self.view = memoryview(buffer).cast('B')
+        self.position = 0
+    
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else min(self.position + size, len(self.view))
+        data = self.view[self.position:end].tobytes()
+        self.position = max(self.position, end)
+        return data
+    
+    def readinto(self, target):
+        target = memoryview(target).cast('B')
+        end = min(self.position + len(target), len(self.view))
+        size = max(0, end - self.position)
+        target[:size] = self.view[self.position:self.position + size]
+        self.position += size
+        return size
+    
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += len(self.view)
+        self.position = max(0, offset)
+        return self.position
+    
+    def tell(self):
+        return self.position
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def close(self):
+        self.view.release()
+
+# PDF copiado para memória compartilhada, acessível pelos processos de extração
+SharedPDF = namedtuple('SharedPDF', ['name', 'size'])
+
+def share_pdf_buffer(buffer):
+    """Copia o PDF para um bloco de memória compartilhada (uma única cópia para todos os processos)"""
+    view = memoryview(buffer).cast('B')
+    shm = SharedMemory(create=True, size=max(1, len(view)))
+    shm.buf[:len(view)] = view
+    return shm, SharedPDF(shm.name, len(view))
+
+@contextmanager
+def open_pdf_stream(source):
+    """Abre a origem do PDF como um fluxo, sem arquivos temporários
+    
+    Caminhos são mapeados em memória (mmap), de modo que apenas as partes
+    lidas do arquivo ocupam memória; buffers (bytes, memoryview) e PDFs em
+    memória compartilhada são lidos diretamente com BufferStream.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield f  # mmap não aceita arquivos vazios
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    yield mapped
+    elif isinstance(source, SharedPDF):
+        # O bloco é removido pelo processo que o criou (iter_extracted_tables)
+        shm = SharedMemory(name=source.name)
+        stream = BufferStream(shm.buf[:source.size])
+        try:
+            yield stream
+        finally:
+            stream.close()
+            shm.close()
+    else:
+        stream = BufferStream(source)
+        try:
+            yield stream
+        finally:
+            stream.close()
+
+# Pré-análise das páginas antes do pdfplumber: 'pdfplumber' analisa todas as
+# páginas; 'pdfium' descarta com o pypdfium2 as páginas sem regiões tabulares
+SCAN_BACKENDS = {
+    'pdfplumber': "pdfplumber (todas as páginas)",
+    'pdfium': "pypdfium2 (pré-análise rápida)",
+}
+
+class PdfiumPageScan:
+    """Pré-análise nativa de uma página com pypdfium2: texto, traçados e regiões tabulares
+    
+    Os trechos de texto (retângulos do pdfium) são agrupados em linhas. A
+    página é candidata a ter tabelas se tiver traçados (estratégias de
+    linhas) ou ao menos MIN_TABULAR_ROWS linhas com trechos separados por
+    um espaço maior que a altura da linha (estratégia de texto). O texto das
+    linhas, usado no contexto das tabelas, só é lido quando pedido.
+    """
+    
+    MIN_TABULAR_ROWS = 2
+    
+    def __init__(self, page):
+        self.page = page
+        self.textpage = page.get_textpage()
+        self.height = page.get_height()
+        self.char_count = self.textpage.count_chars()
+        self.ruled = next(page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH]), None) is not None
+        self.lines = self._group_lines([self.textpage.get_rect(i) for i in range(self.textpage.count_rects())])
+        tabular_rows = sum(1 for line in self.lines if self._has_column_gap(line))
+        self.tabular = self.char_count > 0 and (self.ruled or tabular_rows >= self.MIN_TABULAR_ROWS)
+    
+    @staticmethod
+    def _group_lines(rects):
+        """Agrupa os retângulos (esquerda, base, direita, topo) em linhas, de cima para baixo"""
+        lines = []
+        for rect in sorted(rects, key=lambda rect: -rect[3]):
+            middle = (rect[1] + rect[3]) / 2
+            if lines and lines[-1]['bottom'] <= middle <= lines[-1]['top']:
+                line = lines[-1]
+                line['rects'].append(rect)
+                line['bottom'] = min(line['bottom'], rect[1])
+            else:
+                lines.append({'top': rect[3], 'bottom': rect[1], 'rects': [rect]})
+        return lines
+    
+    @staticmethod
+    def _has_column_gap(line):
+        if len(line['rects']) < 2:
+            return False
+        height = line['top'] - line['bottom']
+        rects = sorted(line['rects'])
+        return any(right[0] - left[2] > height for left, right in zip(rects, rects[1:]))
+    
+    def text_lines(self):
+        """Linhas de texto como (posição vertical a partir do topo, texto), para PageTextIndex
+        
+        A posição é o centro da linha, o que evita que a própria linha de
+        cabeçalho de uma tabela apareça no seu contexto.
+        """
+        text_lines = []
+        for line in self.lines:
+            left = min(rect[0] for rect in line['rects'])
+            right = max(rect[2] for rect in line['rects'])
+            text = self.textpage.get_text_bounded(left, line['bottom'], right, line['top'])
+            text_lines.append((self.height - (line['top'] + line['bottom']) / 2, WHITESPACE_REGEX.sub(' ', text).strip()))
+        return text_lines
+    
+    def close(self):
+        self.textpage.close()
+        self.page.close()
+
+@contextmanager
+def open_pdfium_document(source):
+    """Abre a origem do PDF no pypdfium2: caminhos são lidos pelo próprio pdfium, buffers sem cópia"""
+    if isinstance(source, (str, os.PathLike)):
+        document = pdfium.PdfDocument(os.fspath(source))
+        try:
+            yield document
+        finally:
+            document.close()
+    else:
+        with open_pdf_stream(source) as stream:
+            document = pdfium.PdfDocument(stream)
+            try:
+                yield document
+            finally:
+                document.close()
+
+@contextmanager
+def open_page_scanner(source, backend='pdfplumber'):
+    """Pré-analisador do backend: função número da página (base 1) -> PdfiumPageScan, ou None sem pré-análise"""
+    if backend == 'pdfplumber':
+        yield None
+    elif backend == 'pdfium':
+        with open_pdfium_document(source) as document:
+            yield lambda page_num: PdfiumPageScan(document[page_num - 1])
+    else:
+        raise ValueError(f"Backend de pré-análise desconhecido: {backend}")
+
+def iter_page_tables(source, first_page=1, last_page=None, warnings=None, selector=None, timer=None,
+                     cleaning=None, backend='pdfplumber'):
+    """Extrai as tabelas de cada página de um intervalo, gerando (número da página, tabelas)
+    
+    Com backend='pdfium', cada página é pré-analisada pelo pypdfium2 (etapa
+    'scan'); páginas sem regiões tabulares não passam pela análise de layout
+    do pdfplumber e o contexto das tabelas vem do texto do pdfium.
+    """
+    if timer is None:
+        timer = StageTimer()
+    with open_page_scanner(source, backend) as scan_page:
+        for page_num, page in iter_pages(source, first_page, last_page):
+            scan = None
+            if scan_page is not None:
+                with timer.measure('scan'):
+                    scan = scan_page(page_num)
+            try:
+                yield page_num, extract_page_tables(page, page_num, warnings, selector, timer, cleaning, scan)
+            finally:
+                if scan is not None:
+                    scan.close()
+
+def iter_pages(source, first_page=1, last_page=None):
+    """Etapa 1 do pipeline: abre o PDF e percorre as páginas de um intervalo (inclusivo, base 1)
+    
+    source pode ser um caminho, um buffer em memória ou um SharedPDF (ver open_pdf_stream).
+    """
+    pages = None
+    if last_page is not None:
+        pages = list(range(first_page, last_page + 1))
+    
+    with open_pdf_stream(source) as stream, pdfplumber.open(stream, pages=pages) as pdf:
+        for page in pdf.pages:
+            yield page.page_number, page
+            # Liberar os objetos de layout já usados da página
+            page.close()
+
+def count_pages(source):
+    """Número de páginas do PDF"""
+    with open_pdf_stream(source) as stream, pdfplumber.open(stream) as pdf:
+        return len(pdf.pages)
+
+def extract_page_range(source, first_page, last_page, adaptive=True, cleaning=None, backend='pdfplumber'):
+    """Extrai as tabelas de um intervalo de páginas (inclusivo, base 1) abrindo o PDF de forma independente"""
+    range_tables = []
+    range_warnings = []
+    selector = StrategySelector(adaptive=adaptive)
+    timer = StageTimer()
+    
+    for _, page_tables in iter_page_tables(source, first_page, last_page, range_warnings, selector, timer,
+                                           cleaning, backend):
+        range_tables.extend(page_tables)
+    
+    range_stats = selector.stats()
+    range_stats.update(timer.stats())
+    return range_tables, range_warnings, range_stats
+
+def split_page_ranges(total_pages, workers, chunks_per_worker=4):
+    """Divide o documento em intervalos contíguos de páginas para distribuir entre os processos"""
+    if total_pages <= 0:
+        return []
+    
+    # Mais intervalos que processos para equilibrar páginas mais pesadas
+    chunk_count = max(1, min(total_pages, workers * chunks_per_worker))
+    chunk_size = -(-total_pages // chunk_count)  # Divisão arredondada para cima
+    
+    return [(first, min(first + chunk_size - 1, total_pages))
+            for first in range(1, total_pages + 1, chunk_size)]
+
+# Versão do formato dos fragmentos; alterar invalida os checkpoints existentes
+CHECKPOINT_VERSION = 4
+
+# Páginas por fragmento de checkpoint (fixo, para que os intervalos coincidam entre execuções)
+CHECKPOINT_PAGES = 25
+
+# Colunas de metadados preenchidas na extração, reconstruídas a partir dos fragmentos
+EXTRACTION_METADATA_COLUMNS = ['Origem', 'Página', 'Tabela']
+
+def document_digest(source):
+    """Hash SHA-256 do conteúdo do PDF, lido em blocos"""
+    digest = hashlib.sha256()
+    with open_pdf_stream(source) as stream:
+        while True:
+            chunk = stream.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCheckpoint:
+    """Fragmentos Parquet com as tabelas extraídas de cada intervalo de páginas de um documento
+    
+    Os fragmentos ficam em root_dir/<hash do documento>-<configurações>/ e são
+    gravados de forma atômica assim que um intervalo termina; uma execução
+    interrompida ou repetida do mesmo documento reaproveita os intervalos já
+    concluídos. Cada linha do fragmento guarda o número da tabela, o índice
+    original e as células brutas (strings ou nulos); colunas, metadados e
+    geometria de cada tabela, avisos e estatísticas ficam nos metadados do arquivo.
+    """
+    
+    def __init__(self, root_dir, document_key, range_pages=CHECKPOINT_PAGES):
+        self.range_pages = range_pages
+        self.directory = os.path.join(root_dir, document_key)
+        os.makedirs(self.directory, exist_ok=True)
+        os.utime(self.directory)  # Marca o uso recente para cleanup_checkpoints
+    
+    @classmethod
+    def for_document(cls, root_dir, source, adaptive=True, range_pages=CHECKPOINT_PAGES, cleaning=None,
+                     backend='pdfplumber'):
+        """Checkpoint do documento, identificado pelo conteúdo e pelas configurações de extração"""
+        cleaning = cleaning if cleaning is not None else CleaningRules()
+        settings = json.dumps({'version': CHECKPOINT_VERSION, 'adaptive': adaptive, 'range_pages': range_pages,
+                               'cleaning': cleaning.settings(), 'backend': backend}, sort_keys=True)
+        settings_digest = hashlib.sha256(settings.encode('utf-8')).hexdigest()[:16]
+        return cls(root_dir, f"{document_digest(source)}-{settings_digest}", range_pages)
+    
+    def page_ranges(self, total_pages):
+        """Intervalos de páginas (inclusivos, base 1) de cada fragmento"""
+        return [(first, min(first + self.range_pages - 1, total_pages))
+                for first in range(1, total_pages + 1, self.range_pages)]
+    
+    def fragment_path(self, first_page, last_page):
+        return os.path.join(self.directory, f"{first_page:06d}-{last_page:06d}.parquet")
+    
+    def has(self, first_page, last_page):
+        return os.path.exists(self.fragment_path(first_page, last_page))
+    
+    def save(self, first_page, last_page, tables, warnings, stats):
+        """Grava o fragmento de um intervalo concluído"""
+        table_ids, indexes, cells, tables_meta = [], [], [], []
+        for table_id, df in enumerate(tables):
+            data_columns = [col for col in df.columns if col not in EXTRACTION_METADATA_COLUMNS]
+            tables_meta.append({
+                'columns': list(df.columns),
+                'data_columns': data_columns,
+                'rows': len(df),
+                'origem': df['Origem'].iloc[0],
+                'pagina': int(df['Página'].iloc[0]),
+                'tabela': int(df['Tabela'].iloc[0]),
+                'layout': df.attrs.get('layout'),
+            })
+            table_ids.extend([table_id] * len(df))
+            indexes.extend(df.index.tolist())
+            cells.extend(df[data_columns].to_numpy(dtype=object).tolist())
+        
+        metadata = {'tables': tables_meta, 'warnings': list(warnings), 'stats': stats}
+        fragment = pa.table(
+            {
+                'table': pa.array(table_ids, pa.int32()),
+                'index': pa.array(indexes, pa.int64()),
+                'cells': pa.array(cells, pa.list_(pa.string())),
+            },
+            metadata={b'pdf_to_xls': json.dumps(metadata, ensure_ascii=False).encode('utf-8')}
+        )
+        
+        path = self.fragment_path(first_page, last_page)
+        tmp_path = path + '.tmp'
+        pq.write_table(fragment, tmp_path)
+        os.replace(tmp_path, path)
+    
+    def load(self, first_page, last_page):
+        """Lê o fragmento de um intervalo, retornando (tabelas, avisos, estatísticas)"""
+        fragment = pq.read_table(self.fragment_path(first_page, last_page))
+        metadata = json.loads(fragment.schema.metadata[b'pdf_to_xls'].decode('utf-8'))
+        indexes = fragment.column('index').to_pylist()
+        cells = fragment.column('cells').to_pylist()
+        
+        tables = []
+        start = 0
+        for table_meta in metadata['tables']:
+            end = start + table_meta['rows']
+            df = pd.DataFrame(cells[start:end], columns=table_meta['data_columns'], index=pd.Index(indexes[start:end]))
+            df['Origem'] = table_meta['origem']
+            df['Página'] = table_meta['pagina']
+            df['Tabela'] = table_meta['tabela']
+            if list(df.columns) != table_meta['columns']:
+                df = df[table_meta['columns']]
+            if table_meta['layout'] is not None:
+                df.attrs['layout'] = table_meta['layout']
+            tables.append(df)
+            start = end
+        
+        return tables, metadata['warnings'], metadata['stats']
+
+def cleanup_checkpoints(root_dir, max_age_seconds=7 * 24 * 3600):
+    """Remove os checkpoints de documentos não usados há mais de max_age_seconds"""
+    try:
+        entries = list(os.scandir(root_dir))
+    except OSError:
+        return
+    cutoff = time.time() - max_age_seconds
+    for entry in entries:
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            continue
+
+def resolve_workers(workers):
+    """Normaliza o número de processos de extração (None ou 0 usa todos os núcleos)"""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+def pdf_buffer(file):
+    """Retorna o conteúdo de um PDF em memória como memoryview, sem cópia quando possível"""
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return memoryview(file)
+    if hasattr(file, 'getbuffer'):
+        # BytesIO e UploadedFile do Streamlit expõem o buffer interno
+        return file.getbuffer()
+    return memoryview(file.getvalue())
+
+def iter_extracted_tables(file, workers=1, adaptive=True, stats=None, warnings=None, checkpoint_dir=None,
+                          progress=None, cleaning=None, backend='pdfplumber'):
+    """Etapa 2 do pipeline: gera as tabelas extraídas, com contexto, na ordem (página, tabela)
+    
+    As tabelas são entregues à medida que as páginas são processadas. Com
+    workers > 1 os intervalos de páginas são processados em paralelo e
+    entregues em ordem assim que cada um termina. Avisos e contadores das
+    estratégias são acumulados nas listas/dicionários informados. O arquivo
+    pode ser o caminho de um PDF (lido por mmap), um objeto em memória como o
+    upload do Streamlit ou bytes (lidos diretamente do buffer) ou um SharedPDF;
+    com workers > 1 um PDF em memória é copiado uma única vez para memória
+    compartilhada.
+    
+    Com checkpoint_dir, documentos com mais de CHECKPOINT_PAGES páginas são
+    extraídos em intervalos fixos gravados como fragmentos (ExtractionCheckpoint);
+    os intervalos já concluídos em execuções anteriores são lidos dos fragmentos.
+    
+    Se progress (ExtractionProgress) for informado, ele avança a cada página;
+    com workers > 1, a cada intervalo entregue. cleaning (CleaningRules) define
+    a limpeza das linhas de cada tabela e backend, a pré-análise das páginas
+    (ver SCAN_BACKENDS e iter_page_tables).
+    """
+    workers = resolve_workers(workers)
+    if progress is None:
+        progress = ExtractionProgress()
+    
+    buffer = None
+    if isinstance(file, (str, os.PathLike)):
+        # Arquivo já em disco (linha de comando): mapear diretamente
+        source = os.fspath(file)
+    elif isinstance(file, SharedPDF):
+        # Já em memória compartilhada por outro processo
+        source = file
+    else:
+        buffer = source = pdf_buffer(file)
+    
+    executor = None
+    shared = None
+    try:
+        total_pages = count_pages(source)
+        progress.start(total_pages)
+        
+        if checkpoint_dir is not None and total_pages > CHECKPOINT_PAGES:
+            checkpoint = ExtractionCheckpoint.for_document(checkpoint_dir, source, adaptive, cleaning=cleaning,
+                                                           backend=backend)
+            page_ranges = checkpoint.page_ranges(total_pages)
+            pending = [(first, last) for first, last in page_ranges if not checkpoint.has(first, last)]
+            
+            if workers > 1 and len(pending) > 1:
+                if buffer is not None:
+                    shared, source = share_pdf_buffer(buffer)
+                executor = ProcessPoolExecutor(max_workers=min(workers, len(pending)))
+                computed = executor.map(
+                    extract_page_range,
+                    [source] * len(pending),
+                    [first for first, _ in pending],
+                    [last for _, last in pending],
+                    [adaptive] * len(pending),
+                    [cleaning] * len(pending),
+                    [backend] * len(pending)
+                )
+            else:
+                computed = (extract_page_range(source, first, last, adaptive, cleaning, backend)
+                            for first, last in pending)
+            
+            for first, last in page_ranges:
+                timer = StageTimer()
+                if (first, last) in pending:
+                    range_tables, range_warnings, range_stats = next(computed)
+                    with timer.measure('checkpoint'):
+                        try:
+                            checkpoint.save(first, last, range_tables, range_warnings, range_stats)
+                        except Exception as e:
+                            range_warnings = range_warnings + [f"Não foi possível gravar o checkpoint das páginas {first}-{last}: {str(e)}"]
+                else:
+                    with timer.measure('checkpoint'):
+                        range_tables, range_warnings, range_stats = checkpoint.load(first, last)
+                    # Os tempos gravados são da execução anterior
+                    range_stats = {key: value for key, value in range_stats.items() if key != 'stage_seconds'}
+                    if stats is not None:
+                        stats['pages_resumed'] = stats.get('pages_resumed', 0) + last - first + 1
+                
+                if warnings is not None:
+                    warnings.extend(range_warnings)
+                if stats is not None:
+                    merge_strategy_stats(stats, range_stats)
+                    merge_stage_seconds(stats, timer.as_dict())
+                progress.advance(last - first + 1, len(range_tables), resumed=(first, last) not in pending)
+                yield from range_tables
+        
+        elif workers == 1 or total_pages <= 1:
+            selector = StrategySelector(adaptive=adaptive)
+            timer = StageTimer()
+            try:
+                for _, page_tables in iter_page_tables(source, 1, None, warnings, selector, timer, cleaning, backend):
+                    progress.advance(1, len(page_tables))
+                    yield from page_tables
+            finally:
+                if stats is not None:
+                    serial_stats = selector.stats()
+                    serial_stats.update(timer.stats())
+                    merge_strategy_stats(stats, serial_stats)
+        else:
+            if buffer is not None:
+                # Os processos auxiliares leem o PDF da memória compartilhada
+                shared, source = share_pdf_buffer(buffer)
+            
+            page_ranges = split_page_ranges(total_pages, workers)
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(page_ranges)))
+            # map preserva a ordem dos intervalos, mantendo a ordem (página, tabela)
+            results = executor.map(
+                extract_page_range,
+                [source] * len(page_ranges),
+                [first for first, _ in page_ranges],
+                [last for _, last in page_ranges],
+                [adaptive] * len(page_ranges),
+                [cleaning] * len(page_ranges),
+                [backend] * len(page_ranges)
+            )
+            for (first, last), (range_tables, range_warnings, range_stats) in zip(page_ranges, results):
+                if warnings is not None:
+                    warnings.extend(range_warnings)
+                if stats is not None:
+                    merge_strategy_stats(stats, range_stats)
+                progress.advance(last - first + 1, len(range_tables))
+                yield from range_tables
+    finally:
+        if executor is not None:
+            # Interrompido antes do fim: descartar os intervalos ainda pendentes
+            executor.shutdown(wait=True, cancel_futures=True)
+        if shared is not None:
+            shared.close()
+            shared.unlink()
+        if buffer is not None:
+            buffer.release()
+
+# Tolerância (fração da largura da página) entre as bordas das colunas de partes de uma mesma tabela
+STITCH_COLUMN_TOLERANCE = 0.02
+# Uma tabela só continua na página seguinte se terminar abaixo desta fração da altura da página
+STITCH_MIN_BOTTOM = 0.6
+# Célula com aparência de valor (número, moeda, data, percentual): primeira linha de dados, não cabeçalho
+VALUE_CELL_REGEX = re.compile(r'^[-+(]?\s*(R\$)?\s*\d[\d.,/\s-]*%?\)?$')
+
+def header_signature(header):
+    """Assinatura de uma linha de cabeçalho bruta, comparável entre páginas"""
+    return [normalize_column_key(cell) if cell is not None else '' for cell in header]
+
+def title_signature(title):
+    """Título acima de uma tabela sem os números (páginas, datas, números de apólice)"""
+    if title is None:
+        return None
+    return DIGITS_REGEX.sub('#', WHITESPACE_REGEX.sub(' ', title).strip().lower())
+
+def looks_like_data_row(row):
+    """Indica se a primeira linha de uma tabela é de dados (alguma célula com aparência de valor)"""
+    return any(cell is not None and VALUE_CELL_REGEX.match(str(cell).strip()) for cell in row)
+
+class TableStitcher:
+    """Une as partes de tabelas quebradas entre páginas e descarta as tabelas repetidas de um documento
+    
+    Funciona de forma incremental, uma tabela extraída por vez, na ordem
+    (página, tabela), usando a geometria de df.attrs['layout'] (ver
+    table_layout). Uma tabela cuja impressão digital já apareceu no documento
+    (cabeçalho ou rodapé de página desenhado como tabela) é descartada. A
+    última tabela de uma página continua na primeira da página seguinte
+    quando as colunas têm as mesmas bordas, a tabela anterior chega à parte
+    de baixo da página, a nova parte não tem título próprio (ver
+    _page_boilerplate) e repete o cabeçalho ou começa direto pelos dados;
+    nesse caso a primeira linha, lida como cabeçalho na extração, volta a ser
+    uma linha de dados.
+    
+    A decisão sobre a passagem de uma página para a seguinte é tomada quando
+    a seguinte termina, depois de conhecidas as tabelas repetidas dela (um
+    rodapé só é reconhecido na página seguinte); até lá as tabelas dessas
+    duas páginas ficam retidas. As partes unidas recebem a 'Origem' da
+    primeira parte e mantêm a própria 'Página' e 'Tabela'.
+    """
+    
+    def __init__(self, cleaning=None, column_tolerance=STITCH_COLUMN_TOLERANCE):
+        self.cleaning = cleaning if cleaning is not None else CleaningRules()
+        self.column_tolerance = column_tolerance
+        self.fingerprints = {}  # Impressão digital -> ocorrências no documento
+        self.pending = []  # Tabelas ainda não entregues, na ordem do documento
+        self.page_number = None
+        self.page_entries = []  # Tabelas da página em andamento
+        self.previous_number = None
+        self.previous_entries = []  # Tabelas da página anterior, ainda passíveis de continuação
+        self.tables_stitched = 0
+        self.tables_deduplicated = 0
+    
+    def add(self, df):
+        """Recebe uma tabela extraída; retorna a lista das tabelas já concluídas"""
+        page = int(df['Página'].iloc[0])
+        ready = self._close_page() if page != self.page_number else []
+        self.page_number = page
+        
+        layout = df.attrs.get('layout')
+        if layout is not None:
+            occurrences = self.fingerprints.get(layout['fingerprint'], 0)
+            self.fingerprints[layout['fingerprint']] = occurrences + 1
+            if occurrences:
+                self.tables_deduplicated += 1
+                return ready
+        
+        entry = {'frames': [df], 'layouts': [layout]}
+        self.pending.append(entry)
+        self.page_entries.append(entry)
+        return ready
+    
+    def finish(self):
+        """Retorna as tabelas restantes, ao fim do documento"""
+        ready = self._close_page()
+        ready.extend(self._build(entry) for entry in self.pending)
+        self.pending = []
+        self.previous_entries = []
+        return ready
+    
+    def stats(self):
+        """Contadores de partes unidas e de tabelas repetidas descartadas"""
+        return {'tables_stitched': self.tables_stitched, 'tables_deduplicated': self.tables_deduplicated}
+    
+    def _repeated(self, entry):
+        layout = entry['layouts'][0]
+        return layout is not None and self.fingerprints[layout['fingerprint']] > 1
+    
+    def _close_page(self):
+        """Une a página anterior à que terminou e entrega as tabelas que não podem mais mudar"""
+        if self.previous_entries and self.page_number == self.previous_number + 1:
+            tails = [entry for entry in self.previous_entries if not self._repeated(entry)]
+            heads = [entry for entry in self.page_entries if not self._repeated(entry)]
+            if tails and heads:
+                tail, head = tails[-1], heads[0]
+                # Títulos das tabelas que começam na página anterior
+                page_titles = {title_signature(entry['layouts'][0]['title']) for entry in tails}
+                repeated_header = self._continuation(tail, head, page_titles)
+                if repeated_header is not None:
+                    self._merge(tail, head['frames'][0], head['layouts'][0], repeated_header)
+                    # A tabela unida passa a ser a candidata a continuar na próxima página
+                    self.pending = [entry for entry in self.pending if entry is not head]
+                    self.page_entries = [tail if entry is head else entry for entry in self.page_entries]
+        
+        self.previous_number, self.previous_entries = self.page_number, self.page_entries
+        self.page_entries = []
+        
+        ready = []
+        while self.pending and not any(self.pending[0] is entry for entry in self.previous_entries):
+            ready.append(self._build(self.pending.pop(0)))
+        return ready
+    
+    def _continuation(self, tail, head, page_titles):
+        """None se head não continua tail; senão, se head repete o cabeçalho de tail"""
+        first, last, layout = tail['layouts'][0], tail['layouts'][-1], head['layouts'][0]
+        if first is None or layout is None or last['bottom'] < STITCH_MIN_BOTTOM:
+            return None
+        if len(layout['columns']) != len(last['columns']):
+            return None
+        if any(abs(a - b) > self.column_tolerance for a, b in zip(layout['columns'], last['columns'])):
+            return None
+        if layout['title'] is not None and not self._page_boilerplate(layout, last, page_titles):
+            return None  # Título próprio: nova tabela, ainda que com as mesmas colunas
+        if header_signature(layout['header']) == header_signature(first['header']):
+            return True
+        if looks_like_data_row(layout['header']):
+            return False
+        return None
+    
+    @staticmethod
+    def _page_boilerplate(layout, last, page_titles):
+        """Indica se o título de layout é texto repetido de página, e não o título de uma nova tabela
+        
+        Vale para a primeira linha da página que repete a da página anterior
+        a menos dos números ("Extrato - página 2") e para uma linha que também
+        aparece acima de last na página anterior sem ser o título de uma
+        tabela que começa nela (quadro de cabeçalho repetido).
+        """
+        title = title_signature(layout['title'])
+        page_header = title_signature(layout.get('page_header'))
+        if title == page_header and page_header == title_signature(last.get('page_header')):
+            return True
+        lines_above = {title_signature(line) for line in last.get('lines_above', ())}
+        return title in lines_above and title not in page_titles
+    
+    def _merge(self, tail, df, layout, repeated_header):
+        """Acrescenta a tail a parte df, com as colunas da primeira parte"""
+        first = tail['frames'][0]
+        data_columns = [col for col in first.columns if col not in EXTRACTION_METADATA_COLUMNS]
+        part_columns = [col for col in df.columns if col not in EXTRACTION_METADATA_COLUMNS]
+        df = df.rename(columns=dict(zip(part_columns, data_columns)))
+        
+        if not repeated_header:
+            # A linha lida como cabeçalho na extração é a primeira linha de dados da parte
+            cells = table_cells([layout['header']], len(data_columns))
+            if self.cleaning.row_mask(cells, pd.isna(cells))[0]:
+                row = df.iloc[:1].copy()
+                row[data_columns] = cells
+                df = pd.concat([row, df])
+        
+        df['Origem'] = first['Origem'].iloc[0]
+        tail['frames'].append(df)
+        tail['layouts'].append(layout)
+        self.tables_stitched += 1
+    
+    @staticmethod
+    def _build(entry):
+        frames = entry['frames']
+        if len(frames) == 1:
+            frames[0].attrs.pop('layout', None)
+            return frames[0]
+        df = pd.concat(frames, ignore_index=True)
+        df.attrs.clear()
+        return df
+
+def iter_stitched_tables(tables, stitcher=None, timer=None):
+    """Etapa 3 do pipeline: une as tabelas quebradas entre páginas e descarta as repetidas (ver TableStitcher)"""
+    if stitcher is None:
+        yield from tables
+        return
+    if timer is None:
+        timer = StageTimer()
+    for df in tables:
+        with timer.measure('stitch'):
+            ready = stitcher.add(df)
+        yield from ready
+    with timer.measure('stitch'):
+        ready = stitcher.finish()
+    yield from ready
+
+def iter_aligned_tables(tables, aligner=None, timer=None):
+    """Etapa 4 do pipeline: alinha os cabeçalhos de cada tabela às colunas canônicas"""
+    if aligner is None:
+        yield from tables
+        return
+    if timer is None:
+        timer = StageTimer()
+    for df in tables:
+        with timer.measure('alignment'):
+            df = aligner.align(df)
+        yield df
+
+def iter_typed_tables(tables, schema=None, timer=None):
+    """Etapa 5 do pipeline: converte os tipos de cada tabela, acumulando o esquema informado"""
+    for df in tables:
+        yield process_dataframe(df, schema, timer)
+
+def extract_tables_with_context(file, workers=1, adaptive=True, stats=None):
+    """Extrai tabelas com contexto do texto anterior
+    
+    Com workers > 1 o documento é dividido em intervalos de páginas processados
+    em paralelo; o resultado é reagrupado na ordem (página, tabela) e é idêntico
+    ao do processamento sequencial. Com adaptive=True a ordem das estratégias é
+    decidida página a página pelos traçados; use adaptive=False para testar
+    sempre todas as estratégias na ordem original. Se stats for um dicionário,
+    ele recebe os contadores de páginas puladas e de acertos por estratégia.
+    """
+    import streamlit as st  # Apenas as funções legadas exibem avisos diretamente na interface
+    
+    all_warnings = []
+    all_tables_data = list(iter_extracted_tables(file, workers, adaptive, stats, all_warnings))
+    
+    for message in all_warnings:
+        st.warning(message)
+    
+    # Não agrupar por similaridade, apenas retornar a lista de tabelas
+    return all_tables_data
+
+def freeze_panes_cell(columns):
+    """Célula de congelamento de painéis: abaixo do cabeçalho e à direita dos metadados"""
+    from openpyxl.utils import get_column_letter
+    
+    metadata_count = sum(1 for col in columns if col in METADATA_COLUMNS)
+    return f"{get_column_letter(metadata_count + 1)}2"
+
+# Colunas com mais linhas que isto têm a largura medida em uma amostra de linhas igualmente espaçadas
+WIDTH_SAMPLE_ROWS = 10000
+# Planilhas com mais linhas que isto recebem só os formatos numéricos, sem bordas e alinhamentos por célula
+CELL_STYLE_MAX_ROWS = 100000
+
+def column_text_width(series, sample_rows=WIDTH_SAMPLE_ROWS):
+    """Maior comprimento do texto dos valores de uma coluna, como em astype(str)
+    
+    Colunas categóricas são medidas pelas categorias presentes; colunas com
+    mais de sample_rows linhas, por uma amostra de linhas igualmente
+    espaçadas (a primeira e a última incluídas). Texto, inteiros e float64
+    são convertidos com str(), que nas tabelas pequenas custa bem menos que
+    astype(str) e dá o mesmo texto.
+    """
+    if series.empty:
+        return 0
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = pd.unique(series.cat.codes)
+        lengths = series.cat.categories.astype(str).str.len().to_numpy()[codes[codes >= 0]]
+        missing_length = len('nan') if (codes < 0).any() else 0
+        return int(max(lengths.max(initial=0), missing_length))
+    if len(series) > sample_rows:
+        series = series.iloc[np.linspace(0, len(series) - 1, sample_rows).astype(np.intp)]
+    if series.dtype.kind in 'Oiub' or series.dtype == np.float64:
+        return max(map(len, map(str, series.tolist())))
+    return int(series.astype(str).str.len().max())
+
+def use_cell_styles(row_count, cell_styles=None):
+    """Resolve a opção de estilos por célula; None decide pelo número de linhas (CELL_STYLE_MAX_ROWS)"""
+    if cell_styles is None:
+        return row_count <= CELL_STYLE_MAX_ROWS
+    return cell_styles
+
+def excel_style_key(value, kind):
+    """Estilo de uma célula de dados (ver register_named_styles) pelo valor e pelo tipo da coluna
+    
+    Valores numéricos e datas recebem o estilo do tipo, com o formato de
+    EXCEL_NUMBER_FORMATS; nas colunas numéricas e de datas os demais valores
+    recebem apenas a borda.
+    """
+    if kind in ('money', 'percent', 'number'):
+        is_formatted = value is not None and isinstance(value, (int, float))
+    elif kind == 'date':
+        is_formatted = value is not None and isinstance(value, datetime.date)
+    else:
+        return 'text'
+    return kind if is_formatted else 'plain'
+
+def format_excel_worksheet(worksheet, df, schema=None, cell_styles=None):
+    """Aplica formatação a uma planilha Excel (sem barras de dados)
+    
+    Os tipos das colunas vêm do esquema informado; sem esquema, são inferidos do DataFrame.
+    Cabeçalho e células recebem os estilos nomeados de register_named_styles;
+    com cell_styles=False (o padrão acima de CELL_STYLE_MAX_ROWS linhas) as
+    células de dados recebem apenas o formato numérico.
+    """
+    from openpyxl.utils import get_column_letter
+    
+    if schema is None:
+        schema = infer_column_schema(df)
+    styles = register_named_styles(worksheet.parent)
+    
+    # Aplicar estilos ao cabeçalho
+    for cell in worksheet[1]:
+        cell.style = styles['header']
+    
+    # Ajustar largura das colunas
+    for i, (column, values) in enumerate(df.items(), 1):
+        # Calcular largura baseada no conteúdo (amostrado em colunas longas)
+        max_length = max(len(str(column)), column_text_width(values))
+        adjusted_width = min(max(max_length + 2, 10), 50)  # Entre 10 e 50 caracteres
+        worksheet.column_dimensions[get_column_letter(i)].width = adjusted_width
+    
+    # Estilo das células conforme o tipo da coluna (metadados e colunas sem dados são texto)
+    kinds = [schema.kind(column) for column in df.columns]
+    if use_cell_styles(len(df), cell_styles):
+        for kind, cells in zip(kinds, worksheet.iter_cols(min_row=2, max_col=len(kinds))):
+            for cell in cells:
+                cell.style = styles[excel_style_key(cell.value, kind)]
+    else:
+        # Modo rápido: apenas os valores numéricos e as datas, com o formato do tipo
+        for kind, cells in zip(kinds, worksheet.iter_cols(min_row=2, max_col=len(kinds))):
+            if kind not in EXCEL_NUMBER_FORMATS:
+                continue
+            number_format = EXCEL_NUMBER_FORMATS[kind]
+            for cell in cells:
+                if excel_style_key(cell.value, kind) == kind:
+                    cell.number_format = number_format
+    
+    # Congelar painéis para facilitar a navegação
+    worksheet.freeze_panes = freeze_panes_cell(df.columns)  # Congelar cabeçalho e colunas de metadados
+    
+    # Adicionar filtros ao cabeçalho
+    worksheet.auto_filter.ref = worksheet.dimensions
+
+def write_empty_workbook(output):
+    """Grava a planilha informativa usada quando nenhuma tabela é encontrada"""
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        pd.DataFrame(['Nenhuma tabela válida foi encontrada']).to_excel(
+            writer, sheet_name="Info", index=False)
+
+def compact_integers(values, missing=None):
+    """Menor tipo inteiro que comporta os valores; com valores ausentes, o tipo anulável correspondente"""
+    present = values if missing is None else values[~missing]
+    if present.size:
+        dtype = np.promote_types(np.min_scalar_type(present.min()), np.min_scalar_type(present.max()))
+    else:
+        dtype = np.dtype('uint8')
+    if missing is None:
+        return values.astype(dtype)
+    return pd.arrays.IntegerArray(np.where(missing, 0, values).astype(dtype), missing)
+
+def compact_column(column, pieces, lengths):
+    """Une os valores de uma coluna em todas as tabelas com um tipo compacto
+    
+    pieces tem um array por tabela (None quando a tabela não tem a coluna).
+    Colunas numéricas continuam numéricas (inteiros no menor tipo), texto vira
+    string Arrow (categórico em Arquivo e Origem), datas viram date32 e apenas
+    colunas com tipos misturados continuam como objetos.
+    """
+    # Trechos sem nenhum valor (colunas sem tipo em uma tabela) não definem o tipo da coluna
+    pieces = [None if piece is not None and piece.dtype == object and pd.isna(piece).all() else piece
+              for piece in pieces]
+    present = [piece for piece in pieces if piece is not None]
+    if present and all(piece.dtype.kind in 'iuf' for piece in present):
+        if all(piece.dtype.kind in 'iu' for piece in present):
+            values = np.concatenate([np.zeros(length, dtype=np.int64) if piece is None else piece
+                                     for piece, length in zip(pieces, lengths)])
+            if len(present) == len(pieces):
+                return compact_integers(values)
+            missing = np.concatenate([np.full(length, piece is None) for piece, length in zip(pieces, lengths)])
+            return compact_integers(values, missing)
+        return np.concatenate([np.full(length, np.nan) if piece is None else piece
+                               for piece, length in zip(pieces, lengths)])
+    
+    values = np.concatenate([np.full(length, None, dtype=object) if piece is None else piece.astype(object)
+                             for piece, length in zip(pieces, lengths)])
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind in ('string', 'empty'):
+        if column in DICTIONARY_COLUMNS:
+            return pd.Categorical(values)
+        return pd.array(values, dtype=ARROW_STRING)
+    if kind == 'date':
+        return pd.array(values, dtype=ARROW_DATE)
+    return values
+
+def combine_tables(tables, columns):
+    """Concatena as tabelas tipadas coluna a coluna, com tipos compactos (ver compact_column)
+    
+    Equivale a pd.concat(tables, ignore_index=True)[columns], mas sem as
+    colunas de objetos completadas com NA nem o texto de contexto repetido
+    em cada linha.
+    """
+    # Tabelas consecutivas com as mesmas colunas e tipos são unidas primeiro (caminho rápido do pd.concat)
+    runs = []
+    for _, group in itertools.groupby(tables, key=lambda df: (tuple(df.columns), tuple(df.dtypes))):
+        group = list(group)
+        runs.append(group[0] if len(group) == 1 else pd.concat(group, ignore_index=True))
+    
+    lengths = [len(df) for df in runs]
+    pieces = {column: [None] * len(runs) for column in columns}
+    for i, df in enumerate(runs):
+        for column, series in df.items():
+            pieces[column][i] = series.to_numpy()
+    data = {column: compact_column(column, pieces[column], lengths) for column in columns}
+    return pd.DataFrame(data, index=pd.RangeIndex(sum(lengths)), columns=columns)
+
+class ExcelSink:
+    """Etapa final do pipeline em memória: acumula as tabelas tipadas e gera a planilha formatada
+    
+    A união das colunas é mantida de forma incremental, na ordem em que aparecem.
+    """
+    
+    SHEET_NAME = "Todas as Tabelas"
+    
+    def __init__(self, schema=None, timer=None, cell_styles=None):
+        self.schema = schema if schema is not None else ColumnSchema()
+        self.timer = timer if timer is not None else StageTimer()
+        self.cell_styles = cell_styles  # Estilos por célula; None decide pelo número de linhas
+        self.columns = OrderedDict()  # União das colunas, na ordem de aparição
+        self.tables = []
+    
+    def add_table(self, df):
+        """Recebe uma tabela já tipada"""
+        self.tables.append(df)
+        for column in df.columns:
+            self.columns.setdefault(column, None)
+    
+    def ordered_columns(self):
+        """Colunas da planilha, com os metadados primeiro"""
+        metadata_cols = [col for col in METADATA_COLUMNS if col in self.columns]
+        return metadata_cols + [col for col in self.columns if col not in METADATA_COLUMNS]
+    
+    def finish(self):
+        """Gera o XLSX e retorna um BytesIO posicionado no início"""
+        output = BytesIO()
+        if not self.tables:
+            # Criar planilha vazia como fallback
+            write_empty_workbook(output)
+            output.seek(0)
+            return output
+        
+        with self.timer.measure('concat'):
+            # Concatenar todas as tabelas (metadados primeiro); colunas ausentes em uma tabela ficam vazias
+            combined_df = combine_tables(self.tables, self.ordered_columns())
+        
+        writer = pd.ExcelWriter(output, engine='openpyxl')
+        with self.timer.measure('write'):
+            # Salvar na planilha principal
+            combined_df.to_excel(writer, sheet_name=self.SHEET_NAME, index=False)
+        
+        with self.timer.measure('format'):
+            # Aplicar formatação à planilha principal
+            worksheet = writer.sheets[self.SHEET_NAME]
+            format_excel_worksheet(worksheet, combined_df, self.schema, self.cell_styles)
+        
+        with self.timer.measure('write'):
+            writer.close()
+        
+        output.seek(0)
+        return output
+
+def create_excel_file(all_tables, streaming=False, spool_dir=None):
+    """Cria arquivo Excel com todas as tabelas concatenadas em uma única planilha
+    
+    Com streaming=True a planilha é gravada em modo write-only por
+    StreamingExcelWriter e o retorno é um arquivo temporário em disco.
+    """
+    if streaming:
+        return write_excel_streaming(all_tables, spool_dir)
+    
+    if not all_tables:
+        return ExcelSink().finish()
+    
+    try:
+        # Processar tipos de dados para cada tabela individualmente antes de concatenar
+        sink = ExcelSink()
+        tables = iter_aligned_tables(all_tables, ColumnAligner(), sink.timer)
+        for df in iter_typed_tables(tables, sink.schema, sink.timer):
+            sink.add_table(df)
+        return sink.finish()
+    
+    except Exception as e:
+        import streamlit as st
+        
+        # Fallback: criar planilha simples se a padronização ou concatenação falhar
+        st.warning(f"Usando método alternativo de agrupamento devido a: {str(e)}")
+        
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            # Simplesmente concatenar sem padronização e processamento de tipos
+            simple_combined = pd.concat(all_tables, ignore_index=True, sort=False)
+            simple_combined.to_excel(writer, sheet_name="Todas as Tabelas", index=False)
+            
+            # Aplicar formatação básica
+            worksheet = writer.sheets["Todas as Tabelas"]
+            format_excel_worksheet(worksheet, simple_combined)
+        
+        output.seek(0)
+        return output
+
+def register_named_styles(workbook):
+    """Registra no workbook os estilos nomeados da planilha consolidada
+    
+    Retorna um dicionário tipo de célula -> nome do estilo.
+    """
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+    
+    border = Border(
+        left=Side(style='thin'), 
+        right=Side(style='thin'), 
+        top=Side(style='thin'), 
+        bottom=Side(style='thin')
+    )
+    right = Alignment(horizontal='right')
+    
+    named_styles = {
+        'header': NamedStyle(
+            name='PDF Cabeçalho',
+            fill=PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid"),
+            font=Font(bold=True, color="FFFFFF", size=11),
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+            border=border
+        ),
+        'text': NamedStyle(name='PDF Texto', alignment=Alignment(vertical='center', wrap_text=True), border=border),
+        'plain': NamedStyle(name='PDF Borda', border=border),
+        'money': NamedStyle(name='PDF Moeda', number_format=EXCEL_NUMBER_FORMATS['money'], alignment=right, border=border),
+        'percent': NamedStyle(name='PDF Percentual', number_format=EXCEL_NUMBER_FORMATS['percent'], alignment=right, border=border),
+        'number': NamedStyle(name='PDF Número', number_format=EXCEL_NUMBER_FORMATS['number'], alignment=right, border=border),
+        'date': NamedStyle(name='PDF Data', number_format=EXCEL_NUMBER_FORMATS['date'], alignment=Alignment(horizontal='center'), border=border),
+    }
+    
+    for named_style in named_styles.values():
+        if named_style.name not in workbook.named_styles:
+            workbook.add_named_style(named_style)
+    
+    return {key: named_style.name for key, named_style in named_styles.items()}
+
+def is_missing(value):
+    """Indica se um valor escalar é nulo (None, NaN, NA ou NaT)"""
+    return value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and value != value)
+
+class SpooledTableSink:
+    """Base dos destinos em fluxo, com memória limitada a uma tabela
+    
+    Cada tabela tipada recebida em add_table é serializada em um arquivo
+    temporário e a união das colunas é acumulada de forma incremental. Em
+    finish() as tabelas são relidas uma a uma por _write_output, que grava
+    o resultado em outro arquivo temporário.
+    """
+    
+    SUFFIX = ''
+    
+    def __init__(self, spool_dir=None, schema=None, timer=None):
+        self.spool_dir = spool_dir
+        self.schema = schema if schema is not None else ColumnSchema()
+        self.timer = timer if timer is not None else StageTimer()
+        self.columns = OrderedDict()  # União das colunas, na ordem de aparição
+        self.table_count = 0
+        self.row_count = 0
+        self._spool = tempfile.TemporaryFile(dir=spool_dir, suffix='.pkl')
+    
+    def add_table(self, processed_df):
+        """Recebe uma tabela já tipada e a grava no arquivo temporário"""
+        self._observe(processed_df)
+        with self.timer.measure('write'):
+            pickle.dump(processed_df, self._spool, protocol=pickle.HIGHEST_PROTOCOL)
+        for column in processed_df.columns:
+            self.columns.setdefault(column, None)
+        self.table_count += 1
+        self.row_count += len(processed_df)
+    
+    def _observe(self, processed_df):
+        """Acumula informações da tabela necessárias à gravação (larguras, tipos)"""
+    
+    def ordered_columns(self):
+        """Colunas da saída, com os metadados primeiro"""
+        metadata_cols = [col for col in METADATA_COLUMNS if col in self.columns]
+        return metadata_cols + [col for col in self.columns if col not in METADATA_COLUMNS]
+    
+    def iter_tables(self):
+        """Relê do arquivo temporário as tabelas processadas, uma de cada vez"""
+        self._spool.seek(0)
+        for _ in range(self.table_count):
+            yield pickle.load(self._spool)
+    
+    def finish(self):
+        """Gera a saída e retorna um arquivo temporário posicionado no início"""
+        output = tempfile.TemporaryFile(dir=self.spool_dir, suffix=self.SUFFIX)
+        try:
+            self._write_output(output)
+        finally:
+            self._spool.close()
+        
+        output.seek(0)
+        return output
+    
+    def _write_output(self, output):
+        raise NotImplementedError
+
+class StreamingExcelWriter(SpooledTableSink):
+    """Grava a planilha consolidada em modo write-only, com memória limitada a uma tabela
+    
+    As larguras das colunas são acumuladas em add_table; em finish() as tabelas
+    são gravadas em um workbook write-only com estilos nomeados compartilhados.
+    Com cell_styles=False (o padrão acima de CELL_STYLE_MAX_ROWS linhas) só os
+    valores numéricos e as datas são gravados como células com formato.
+    """
+    
+    SHEET_NAME = "Todas as Tabelas"
+    SUFFIX = '.xlsx'
+    
+    def __init__(self, spool_dir=None, schema=None, timer=None, cell_styles=None):
+        super().__init__(spool_dir, schema, timer)
+        self.cell_styles = cell_styles  # Estilos por célula; None decide pelo número de linhas
+        self.column_widths = OrderedDict()  # Largura máxima do conteúdo de cada coluna
+    
+    def _observe(self, processed_df):
+        with self.timer.measure('format'):
+            for column, values in processed_df.items():
+                max_length = max(len(str(column)), column_text_width(values))
+                self.column_widths[column] = max(self.column_widths.get(column, 0), max_length)
+    
+    def _write_output(self, output):
+        if self.table_count == 0:
+            # Criar planilha vazia como fallback
+            write_empty_workbook(output)
+        else:
+            self._write_workbook(output)
+    
+    def _write_workbook(self, output):
+        # Os estilos das células são aplicados durante a gravação das linhas
+        # ('write'); 'format' cobre apenas larguras, painéis e estilos nomeados
+        from openpyxl.utils import get_column_letter
+        
+        with self.timer.measure('format'):
+            workbook = openpyxl.Workbook(write_only=True)
+            styles = register_named_styles(workbook)
+            worksheet = workbook.create_sheet(self.SHEET_NAME)
+            columns = self.ordered_columns()
+            
+            # Larguras e painéis precisam ser definidos antes da primeira linha
+            for i, column in enumerate(columns, 1):
+                adjusted_width = min(max(self.column_widths[column] + 2, 10), 50)  # Entre 10 e 50 caracteres
+                worksheet.column_dimensions[get_column_letter(i)].width = adjusted_width
+            worksheet.freeze_panes = freeze_panes_cell(columns)  # Congelar cabeçalho e colunas de metadados
+            worksheet.auto_filter.ref = f"A1:{get_column_letter(len(columns))}{self.row_count + 1}"
+        
+        with self.timer.measure('write'):
+            header = []
+            for column in columns:
+                cell = openpyxl.cell.WriteOnlyCell(worksheet, column)
+                cell.style = styles['header']
+                header.append(cell)
+            worksheet.append(header)
+            
+            kinds = [self.schema.kind(column) for column in columns]
+            cell_styles = use_cell_styles(self.row_count, self.cell_styles)
+            for df in self.iter_tables():
+                # Apenas uma tabela em memória; colunas ausentes ficam vazias
+                df = df.reindex(columns=columns)
+                for row in df.itertuples(index=False, name=None):
+                    worksheet.append([self._make_cell(worksheet, value, kind, styles, cell_styles)
+                                      for value, kind in zip(row, kinds)])
+            
+            workbook.save(output)
+    
+    @staticmethod
+    def _make_cell(worksheet, value, kind, styles, cell_styles=True):
+        if is_missing(value):
+            value = None
+        style = excel_style_key(value, kind)
+        if not cell_styles and style not in EXCEL_NUMBER_FORMATS:
+            return value  # Modo rápido: valor gravado sem estilo
+        
+        cell = openpyxl.cell.WriteOnlyCell(worksheet, value)
+        if cell_styles:
+            cell.style = styles[style]
+        else:
+            cell.number_format = EXCEL_NUMBER_FORMATS[style]
+        return cell
+
+def write_excel_streaming(tables, spool_dir=None):
+    """Grava um iterável de tabelas com StreamingExcelWriter e retorna o arquivo temporário"""
+    writer = StreamingExcelWriter(spool_dir)
+    tables = iter_aligned_tables(tables, ColumnAligner(), writer.timer)
+    for df in iter_typed_tables(tables, writer.schema, writer.timer):
+        writer.add_table(df)
+    return writer.finish()
+
+def value_category(series):
+    """Classifica os valores de uma coluna tipada: 'int', 'float', 'date', 'text' ou 'null' (sem valores)"""
+    if pd.api.types.is_integer_dtype(series):
+        return 'int'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'float'
+    values = series.dropna()
+    if values.empty:
+        return 'null'
+    if all(isinstance(value, datetime.date) and not isinstance(value, datetime.datetime) for value in values):
+        return 'date'
+    return 'text'
+
+class ColumnarSink(SpooledTableSink):
+    """Base dos destinos Arrow (Parquet e Arrow IPC) com tipos preservados
+    
+    Valores monetários, percentuais e numéricos são gravados como float64,
+    datas como date32, Página/Tabela como int32 e os metadados de texto
+    (Arquivo, Origem) com codificação de dicionário. Uma coluna com tipos
+    diferentes entre tabelas é gravada como texto. O tipo de cada coluna no
+    esquema ('money', 'percent'...) fica nos metadados do campo.
+    """
+    
+    ARROW_TYPES = {'int': 'int32', 'float': 'float64', 'date': 'date32', 'text': 'string'}
+    
+    def __init__(self, spool_dir=None, schema=None, timer=None):
+        super().__init__(spool_dir, schema, timer)
+        self.categories = {}  # Coluna -> categorias de valores observadas
+        self.dictionaries = {column: OrderedDict() for column in DICTIONARY_COLUMNS}
+    
+    def _observe(self, processed_df):
+        for column in processed_df.columns:
+            series = processed_df[column]
+            if column in self.dictionaries:
+                for value in series.dropna().unique():
+                    self.dictionaries[column].setdefault(str(value), len(self.dictionaries[column]))
+            else:
+                self.categories.setdefault(column, set()).add(value_category(series))
+    
+    def column_category(self, column):
+        """Categoria final da coluna, combinando todas as tabelas"""
+        categories = self.categories.get(column, set()) - {'null'}
+        if categories == {'int', 'float'}:
+            return 'float'
+        if len(categories) == 1:
+            return categories.pop()
+        return 'text'
+    
+    def arrow_schema(self):
+        fields = []
+        for column in self.ordered_columns():
+            if column in self.dictionaries:
+                arrow_type = pa.dictionary(pa.int32(), pa.string())
+            else:
+                arrow_type = pa.type_for_alias(self.ARROW_TYPES[self.column_category(column)])
+            kind = 'metadata' if column in METADATA_COLUMNS else self.schema.kind(column)
+            fields.append(pa.field(column, arrow_type, metadata={'kind': kind}))
+        return pa.schema(fields)
+    
+    def _arrow_array(self, column, series, arrow_type):
+        if series is None:
+            return pa.nulls(self._rows, type=arrow_type)
+        
+        if pa.types.is_dictionary(arrow_type):
+            dictionary = self.dictionaries[column]
+            indices = series.map(lambda value: None if is_missing(value) else dictionary[str(value)])
+            return pa.DictionaryArray.from_arrays(
+                pa.array(indices.astype('Int32'), type=pa.int32(), from_pandas=True),
+                pa.array(list(dictionary), type=pa.string())
+            )
+        
+        if pa.types.is_string(arrow_type):
+            try:
+                return pa.array(series, type=arrow_type, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Coluna com tipos mistos entre tabelas: gravar o texto de cada valor
+                return pa.array(series.map(lambda value: None if is_missing(value) else str(value)),
+                                type=arrow_type, from_pandas=True)
+        
+        return pa.array(series, type=arrow_type, from_pandas=True)
+    
+    def iter_arrow_tables(self, arrow_schema, batch_rows=65536):
+        """Converte as tabelas do arquivo temporário para o esquema Arrow final
+        
+        Tabelas pequenas são agrupadas em lotes de até batch_rows linhas, para
+        que cada grupo de linhas do arquivo não tenha apenas algumas linhas.
+        """
+        batch, batch_size = [], 0
+        for df in self.iter_tables():
+            self._rows = len(df)
+            arrays = [self._arrow_array(field.name, df[field.name] if field.name in df.columns else None, field.type)
+                      for field in arrow_schema]
+            batch.append(pa.Table.from_arrays(arrays, schema=arrow_schema))
+            batch_size += len(df)
+            if batch_size >= batch_rows:
+                yield pa.concat_tables(batch)
+                batch, batch_size = [], 0
+        if batch:
+            yield pa.concat_tables(batch)
+
+class ParquetSink(ColumnarSink):
+    """Grava a tabela consolidada em Parquet, uma tabela por vez"""
+    
+    SUFFIX = '.parquet'
+    
+    def _write_output(self, output):
+        arrow_schema = self.arrow_schema()
+        with self.timer.measure('write'):
+            with pq.ParquetWriter(output, arrow_schema) as writer:
+                for table in self.iter_arrow_tables(arrow_schema):
+                    writer.write_table(table)
+
+class ArrowSink(ColumnarSink):
+    """Grava a tabela consolidada no formato de arquivo Arrow IPC (Feather v2)"""
+    
+    SUFFIX = '.arrow'
+    
+    def _write_output(self, output):
+        arrow_schema = self.arrow_schema()
+        with self.timer.measure('write'):
+            with pa.ipc.new_file(output, arrow_schema) as writer:
+                for table in self.iter_arrow_tables(arrow_schema):
+                    writer.write_table(table)
+
+class CsvSink(SpooledTableSink):
+    """Grava a tabela consolidada em CSV (UTF-8, separador vírgula, datas ISO), uma tabela por vez"""
+    
+    SUFFIX = '.csv'
+    
+    def _write_output(self, output):
+        columns = self.ordered_columns()
+        with self.timer.measure('write'):
+            text_output = io.TextIOWrapper(output, encoding='utf-8', newline='')
+            try:
+                if not columns:
+                    return
+                pd.DataFrame(columns=columns).to_csv(text_output, index=False)
+                for df in self.iter_tables():
+                    df.reindex(columns=columns).to_csv(text_output, index=False, header=False)
+            finally:
+                # Devolver o arquivo binário sem fechá-lo
+                text_output.flush()
+                text_output.detach()
+
+# Formatos de saída: rótulo, extensão e tipo MIME
+OUTPUT_FORMATS = {
+    'xlsx': ("Excel (XLSX)", '.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': ("Parquet", '.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ("Arrow IPC", '.arrow', 'application/vnd.apache.arrow.file'),
+    'csv': ("CSV", '.csv', 'text/csv'),
+}
+
+def make_sink(output_format='xlsx', streaming=False, spool_dir=None, cell_styles=None):
+    """Cria o destino da tabela consolidada para o formato informado
+    
+    cell_styles vale apenas para XLSX (ver CELL_STYLE_MAX_ROWS).
+    """
+    if output_format == 'xlsx':
+        if streaming:
+            return StreamingExcelWriter(spool_dir, cell_styles=cell_styles)
+        return ExcelSink(cell_styles=cell_styles)
+    if output_format == 'parquet':
+        return ParquetSink(spool_dir)
+    if output_format == 'arrow':
+        return ArrowSink(spool_dir)
+    if output_format == 'csv':
+        return CsvSink(spool_dir)
+    raise ValueError(f"Formato de saída desconhecido: {output_format}")
+
+class ConversionResult:
+    """Resumo de uma conversão: contagens, pré-visualização, esquema, avisos e estatísticas"""
+    
+    PREVIEW_ROWS = 20
+    
+    def __init__(self):
+        self.table_count = 0
+        self.row_count = 0
+        self.preview = None  # Primeiras linhas da tabela consolidada, já tipadas
+        self.schema = ColumnSchema()
+        self.warnings = []
+        self.stats = {}
+        self.profile = None  # Texto do perfilador, se a conversão foi perfilada
+        self.column_mapping = {}  # Colunas unificadas pelo alinhamento (ver ColumnAligner.mapping)
+    
+    def add_table(self, df):
+        """Atualiza as contagens e completa a pré-visualização com uma tabela tipada"""
+        self.table_count += 1
+        self.row_count += len(df)
+        
+        preview_rows = 0 if self.preview is None else len(self.preview)
+        if preview_rows < self.PREVIEW_ROWS:
+            head = df.head(self.PREVIEW_ROWS - preview_rows)
+            if self.preview is None:
+                self.preview = head.reset_index(drop=True)
+            else:
+                self.preview = pd.concat([self.preview, head], ignore_index=True, sort=False)
+    
+    def performance_report(self):
+        """Relatório estruturado de desempenho: tempos por etapa, contadores, memória e páginas"""
+        hits = self.stats.get('strategy_hits', {})
+        misses = self.stats.get('strategy_misses', {})
+        page_stats = self.stats.get('page_stats', [])
+        return {
+            'total_seconds': self.stats.get('total_seconds'),
+            'pages': self.stats.get('pages', 0),
+            'pages_skipped': self.stats.get('pages_skipped', 0),
+            'pages_resumed': self.stats.get('pages_resumed', 0),
+            'tables': self.table_count,
+            'rows': self.row_count,
+            'stage_seconds': dict(self.stats.get('stage_seconds', {})),
+            'strategy_attempts': sum(hits.values()) + sum(misses.values()),
+            'strategy_hits': dict(hits),
+            'strategy_misses': dict(misses),
+            'tables_found': sum(page['tables_found'] for page in page_stats),
+            'tables_dropped': sum(page['tables_dropped'] for page in page_stats),
+            'rows_dropped': sum(page['rows_dropped'] for page in page_stats),
+            'tables_failed': sum(page['tables_failed'] for page in page_stats),
+            'tables_stitched': self.stats.get('tables_stitched', 0),
+            'tables_deduplicated': self.stats.get('tables_deduplicated', 0),
+            'columns_seen': self.stats.get('columns_seen', 0),
+            'columns_merged': self.stats.get('columns_merged', 0),
+            'column_comparisons': self.stats.get('column_comparisons', 0),
+            'peak_rss_mb': self.stats.get('peak_rss_mb'),
+            'peak_worker_rss_mb': self.stats.get('peak_worker_rss_mb'),
+            'page_stats': list(page_stats),
+        }
+    
+    def memory_usage(self):
+        """Estimativa da memória ocupada, usada pelo cache"""
+        if self.preview is None:
+            return 0
+        return int(self.preview.memory_usage(index=True, deep=True).sum())
+
+def convert_pdf(file, sink, workers=1, adaptive=True, on_table=None, profiler=None, checkpoint_dir=None,
+                align_columns=True, on_progress=None, cleaning=None, backend='pdfplumber', stitch_tables=True):
+    """Executa o pipeline completo de forma incremental: páginas → tabelas → tipos → destino
+    
+    Cada tabela é entregue ao destino (ExcelSink ou StreamingExcelWriter) assim
+    que é extraída e tipada; on_table, se informado, é chamado com o
+    ConversionResult parcial após cada tabela. Os tempos, contadores e o pico
+    de memória ficam em result.stats (ver ConversionResult.performance_report);
+    com profiler='cprofile' ou 'pyinstrument', o relatório do perfilador fica
+    em result.profile. Com checkpoint_dir, a extração de PDFs grandes é retomada
+    dos fragmentos de execuções anteriores (ver iter_extracted_tables). Com
+    align_columns=True os cabeçalhos quase iguais são unificados antes da
+    tipagem e o mapeamento fica em result.column_mapping. on_progress, se
+    informado, é chamado com um ExtractionProgress a cada página extraída.
+    cleaning (CleaningRules) define a limpeza das linhas das tabelas e
+    backend, a pré-análise das páginas (ver SCAN_BACKENDS). Com
+    stitch_tables=True as tabelas quebradas entre páginas são unidas e as
+    repetidas em todas as páginas, descartadas antes da tipagem (ver TableStitcher).
+    Retorna (resultado, arquivo gerado).
+    """
+    result = ConversionResult()
+    result.schema = sink.schema
+    started = time.perf_counter()
+    
+    with RunProfiler(profiler) as run_profiler:
+        aligner = ColumnAligner() if align_columns else None
+        stitcher = TableStitcher(cleaning) if stitch_tables else None
+        tables = iter_extracted_tables(file, workers, adaptive, result.stats, result.warnings, checkpoint_dir,
+                                       ExtractionProgress(on_progress), cleaning, backend)
+        tables = iter_stitched_tables(tables, stitcher, sink.timer)
+        tables = iter_aligned_tables(tables, aligner, sink.timer)
+        for df in iter_typed_tables(tables, sink.schema, sink.timer):
+            sink.add_table(df)
+            result.add_table(df)
+            if on_table is not None:
+                on_table(result)
+        
+        excel_file = sink.finish()
+    
+    if stitcher is not None:
+        result.stats.update(stitcher.stats())
+    if aligner is not None:
+        result.stats.update(aligner.stats())
+        result.column_mapping = aligner.mapping()
+    merge_stage_seconds(result.stats, sink.timer.as_dict())
+    result.stats['total_seconds'] = time.perf_counter() - started
+    result.stats['peak_rss_mb'] = peak_rss_mb()
+    result.stats['peak_worker_rss_mb'] = peak_rss_mb(children=True)
+    result.profile = run_profiler.text()
+    return result, excel_file
+
+def spool_tables(file, spool_path, source_name, adaptive=True, checkpoint_dir=None, profiler=None, on_table=None,
+                 on_progress=None, cleaning=None, backend='pdfplumber', stitch_tables=True):
+    """Extrai e tipa as tabelas de um PDF, gravando-as em spool_path para uma consolidação posterior
+    
+    Cada tabela recebe a coluna 'Arquivo' com source_name. Os cabeçalhos não
+    são alinhados aqui: o alinhamento é feito entre todos os arquivos em
+    consolidate_spools. on_table, on_progress, cleaning, backend e
+    stitch_tables têm o mesmo papel que em convert_pdf. Retorna o ConversionResult, com o esquema inferido em
+    result.schema.
+    """
+    result = ConversionResult()
+    timer = StageTimer()
+    started = time.perf_counter()
+    stitcher = TableStitcher(cleaning) if stitch_tables else None
+    with RunProfiler(profiler) as run_profiler, open(spool_path, 'wb') as f:
+        tables = iter_extracted_tables(file, 1, adaptive, result.stats, result.warnings, checkpoint_dir,
+                                       ExtractionProgress(on_progress), cleaning, backend)
+        tables = iter_stitched_tables(tables, stitcher, timer)
+        for df in iter_typed_tables(tables, result.schema, timer):
+            # Identificar o arquivo de origem de cada linha
+            df.insert(0, SOURCE_FILE_COLUMN, source_name)
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            result.add_table(df)
+            if on_table is not None:
+                on_table(result)
+    if stitcher is not None:
+        result.stats.update(stitcher.stats())
+    merge_stage_seconds(result.stats, timer.as_dict())
+    result.stats['total_seconds'] = time.perf_counter() - started
+    result.stats['peak_rss_mb'] = peak_rss_mb()
+    result.profile = run_profiler.text()
+    return result
+
+def iter_spooled_tables(spool_path, table_count):
+    """Relê as tabelas gravadas por spool_tables"""
+    with open(spool_path, 'rb') as f:
+        for _ in range(table_count):
+            yield pickle.load(f)
+
+def consolidate_spools(spools, sink, aligner=None):
+    """Grava no destino as tabelas de vários arquivos de spool_tables, na ordem informada
+    
+    spools é uma lista de (caminho, número de tabelas, esquema). Com aligner
+    (ColumnAligner) os cabeçalhos são alinhados entre todos os arquivos e os
+    esquemas passam para os nomes canônicos. Retorna o arquivo gerado.
+    """
+    for spool_path, table_count, schema in spools:
+        if aligner is None:
+            sink.schema.update(schema)
+        for df in iter_spooled_tables(spool_path, table_count):
+            if aligner is not None:
+                with sink.timer.measure('alignment'):
+                    aligned = aligner.align(df)
+                # Tipos inferidos no processo do arquivo, com os nomes canônicos
+                sink.schema.update(schema.renamed(dict(zip(df.columns, aligned.columns))))
+                df = aligned
+            sink.add_table(df)
+    return sink.finish()
+
+_batch_progress = None  # Fila de progresso dos processos de JobQueue
+
+def init_batch_worker(progress):
+    """Inicializador dos processos de JobQueue"""
+    global _batch_progress
+    _batch_progress = progress
+
+def convert_batch_file(index, source, name, options, path, preview_path=None):
+    """Converte um arquivo de um trabalho (executado nos processos de JobQueue)
+    
+    Com options['consolidate'] as tabelas tipadas são gravadas em path por
+    spool_tables; caso contrário a saída do próprio arquivo é gravada em path,
+    com options['workers'] processos de extração, e as primeiras linhas
+    tipadas ficam em preview_path (ver JobQueue.preview) assim que prontas.
+    O progresso é enviado à fila de progresso, identificado por index, a cada
+    página e a cada tabela.
+    """
+    def report(**update):
+        if _batch_progress is not None:
+            _batch_progress.put((index, update))
+    
+    def report_table(partial):
+        report(tables=partial.table_count, rows=partial.row_count)
+    
+    def write_preview(partial):
+        report_table(partial)
+        if partial.row_count <= ConversionResult.PREVIEW_ROWS or partial.table_count == 1:
+            # Gravar e renomear: a interface lê a prévia enquanto a conversão continua
+            with open(preview_path + '.part', 'wb') as f:
+                pickle.dump((partial.preview, partial.schema), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(preview_path + '.part', preview_path)
+    
+    def report_pages(progress):
+        report(pages=progress.pages_done, total_pages=progress.total_pages, eta=progress.eta_seconds())
+    
+    if options['consolidate']:
+        return spool_tables(source, path, name, options['adaptive'], options['checkpoint_dir'],
+                            profiler=options['profiler'], on_table=report_table, on_progress=report_pages,
+                            cleaning=options['cleaning'], backend=options['backend'],
+                            stitch_tables=options['stitch'])
+    
+    sink = make_sink(options['format'], options['streaming'], os.path.dirname(path))
+    result, output_file = convert_pdf(source, sink, workers=options.get('workers', 1), adaptive=options['adaptive'],
+                                      on_table=write_preview if preview_path is not None else report_table,
+                                      profiler=options['profiler'], checkpoint_dir=options['checkpoint_dir'],
+                                      align_columns=options['align'], on_progress=report_pages,
+                                      cleaning=options['cleaning'], backend=options['backend'],
+                                      stitch_tables=options['stitch'])
+    with output_file, open(path, 'wb') as f:
+        shutil.copyfileobj(output_file, f)
+    return result
+
+# Opções de conversão gravadas com cada trabalho da fila (cleaning é gravado por CleaningRules.settings)
+JOB_OPTION_KEYS = ['format', 'streaming', 'adaptive', 'align', 'stitch', 'consolidate', 'checkpoint_dir', 'backend',
+                   'profiler']
+
+def job_options(options):
+    """Opções de conversão em formato JSON, para o banco da fila"""
+    stored = {key: options.get(key) for key in JOB_OPTION_KEYS}
+    cleaning = options.get('cleaning')
+    stored['cleaning'] = (cleaning if cleaning is not None else CleaningRules()).settings()
+    return stored
+
+def load_job_options(stored):
+    """Opções de conversão de um trabalho, no formato usado por convert_batch_file"""
+    options = dict(stored)
+    options['cleaning'] = CleaningRules(**stored['cleaning'])
+    return options
+
+def consolidate_job(spools, options, output_path):
+    """Reúne as tabelas dos arquivos de um trabalho em output_path (executado no pool de JobQueue)
+    
+    Retorna o mapeamento das colunas unificadas (ver ColumnAligner.mapping).
+    """
+    sink = make_sink(options['format'], options['streaming'], os.path.dirname(output_path))
+    aligner = ColumnAligner() if options['align'] else None
+    with consolidate_spools(spools, sink, aligner) as output_file, open(output_path, 'wb') as f:
+        shutil.copyfileobj(output_file, f)
+    return aligner.mapping() if aligner is not None else {}
+
+class JobQueue:
+    """Fila local de conversões em segundo plano, persistida em SQLite
+    
+    Cada trabalho (um ou mais PDFs e as opções da conversão) recebe um id e
+    fica registrado em jobs.sqlite3, dentro de root_dir, com os PDFs, os
+    resultados e as saídas em um subdiretório próprio. Uma thread distribui os
+    arquivos entre no máximo `workers` processos, de modo que o número de
+    conversões simultâneas não depende do número de sessões; os trabalhos com
+    menos arquivos em andamento têm prioridade. Quando nenhum outro arquivo
+    espera na fila, o arquivo enviado ocupa também os processos livres,
+    menos um, extraindo intervalos de páginas em paralelo; o processo
+    reservado atende o próximo arquivo enviado sem que ele espere o arquivo
+    grande terminar. status() informa a situação
+    de cada arquivo ('queued', 'running', 'done', 'failed' ou 'cancelled'),
+    com páginas, tabelas, linhas e tempo restante estimado. Arquivos
+    interrompidos pelo encerramento do processo voltam para a fila quando o
+    banco é reaberto, e trabalhos concluídos há mais de ttl_seconds são
+    removidos com os seus arquivos. Se um processo do pool morre (falta de
+    memória, falha no leitor de PDF), os arquivos em andamento falham e o
+    pool é recriado; a fila continua atendendo os demais trabalhos.
+    """
+    
+    POLL_SECONDS = 0.2
+    BROKEN_POOL_ERROR = "O processo de conversão foi encerrado inesperadamente (falta de memória ou falha no PDF)"
+    CLEANUP_SECONDS = 600
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            options TEXT NOT NULL,
+            created REAL NOT NULL,
+            started REAL,
+            finished REAL,
+            outputs TEXT NOT NULL DEFAULT '[]',
+            column_mapping TEXT NOT NULL DEFAULT '{}',
+            error TEXT
+        );
+        CREATE TABLE IF NOT EXISTS job_files (
+            job_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            pages INTEGER NOT NULL DEFAULT 0,
+            total_pages INTEGER,
+            eta REAL,
+            tables INTEGER NOT NULL DEFAULT 0,
+            rows INTEGER NOT NULL DEFAULT 0,
+            seconds REAL,
+            warnings TEXT NOT NULL DEFAULT '[]',
+            error TEXT,
+            PRIMARY KEY (job_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS job_files_status ON job_files (status);
+    """
+    
+    # Próximo arquivo a converter: primeiro dos trabalhos com menos arquivos em andamento, depois o mais antigo
+    CLAIM_QUERY = """
+        SELECT f.job_id, f.position, f.name, j.options FROM job_files f JOIN jobs j ON j.id = f.job_id
+        WHERE f.status = 'queued' AND j.status IN ('queued', 'running')
+        ORDER BY (SELECT COUNT(*) FROM job_files r WHERE r.job_id = f.job_id AND r.status = 'running'),
+                 j.created, f.position
+        LIMIT 1
+    """
+    
+    # Trabalhos cujos arquivos já terminaram, prontos para gerar as saídas
+    FINISHED_FILES_QUERY = """
+        SELECT id, options FROM jobs j
+        WHERE status = 'running' AND NOT EXISTS (
+            SELECT 1 FROM job_files f WHERE f.job_id = j.id AND f.status IN ('queued', 'running'))
+        ORDER BY created
+    """
+    
+    # Arquivos à espera de um processo (além do que acabou de ser retirado da fila)
+    WAITING_QUERY = """
+        SELECT COUNT(*) FROM job_files f JOIN jobs j ON j.id = f.job_id
+        WHERE f.status = 'queued' AND j.status IN ('queued', 'running')
+    """
+    
+    def __init__(self, root_dir, workers=None, ttl_seconds=24 * 3600):
+        self.root_dir = root_dir
+        self.workers = resolve_workers(workers)
+        self.ttl_seconds = ttl_seconds
+        self.db_path = os.path.join(root_dir, 'jobs.sqlite3')
+        os.makedirs(root_dir, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(self.SCHEMA)
+            # Arquivos em andamento quando o processo anterior foi encerrado voltam para a fila
+            db.execute("UPDATE job_files SET status = 'queued', pages = 0, eta = NULL WHERE status = 'running'")
+        self.cleanup()
+        
+        self._progress = multiprocessing.Queue()
+        self._executor = self._new_executor()
+        self._futures = {}  # future -> (id do trabalho, posição do arquivo ou None na consolidação)
+        self._slots = {}  # future -> processos ocupados (mais de um com extração paralela)
+        self._finishing = set()  # Trabalhos com a consolidação em andamento
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_batch_worker,
+                                   initargs=(self._progress,))
+    
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+    
+    def _job_dir(self, job_id):
+        return os.path.join(self.root_dir, job_id)
+    
+    def submit(self, files, options):
+        """Enfileira a conversão de files (lista de (nome, bytes)) e retorna o id do trabalho"""
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir)
+        for position, (_, data) in enumerate(files):
+            with open(os.path.join(job_dir, f'{position}.pdf'), 'wb') as f:
+                f.write(data)
+        
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, status, options, created) VALUES (?, 'queued', ?, ?)",
+                       (job_id, json.dumps(job_options(options)), time.time()))
+            db.executemany("INSERT INTO job_files (job_id, position, name, status) VALUES (?, ?, ?, 'queued')",
+                           [(job_id, position, name) for position, (name, _) in enumerate(files)])
+        self._wake.set()
+        return job_id
+    
+    def status(self, job_id):
+        """Situação de um trabalho e de cada arquivo, ou None se o trabalho não existir (ou já expirou)
+        
+        As saídas são pares (nome para download, caminho do arquivo).
+        """
+        with self._connect() as db:
+            job = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            files = db.execute("SELECT * FROM job_files WHERE job_id = ? ORDER BY position", (job_id,)).fetchall()
+        
+        job_dir = self._job_dir(job_id)
+        return {
+            'id': job_id,
+            'status': job['status'],
+            'finished': job['status'] in ('done', 'failed', 'cancelled'),
+            'options': json.loads(job['options']),
+            'files': [{
+                'name': row['name'], 'status': row['status'], 'pages': row['pages'],
+                'total_pages': row['total_pages'], 'eta': row['eta'], 'tables': row['tables'], 'rows': row['rows'],
+                'seconds': row['seconds'], 'warnings': json.loads(row['warnings']), 'error': row['error'],
+            } for row in files],
+            'outputs': [(name, os.path.join(job_dir, file_name)) for name, file_name in json.loads(job['outputs'])],
+            'column_mapping': json.loads(job['column_mapping']),
+            'error': job['error'],
+        }
+    
+    def preview(self, job_id, position=0):
+        """Primeiras linhas tipadas de um arquivo do trabalho e o seu esquema, ou None
+        
+        Disponível durante a conversão de arquivos não consolidados, assim que
+        as primeiras tabelas ficam prontas.
+        """
+        try:
+            with open(os.path.join(self._job_dir(job_id), f'{position}.preview'), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+    
+    def result(self, job_id, position=0):
+        """ConversionResult de um arquivo convertido do trabalho, ou None"""
+        try:
+            with open(os.path.join(self._job_dir(job_id), f'{position}.result'), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+    
+    def cancel(self, job_id):
+        """Cancela um trabalho: arquivos ainda na fila não são convertidos"""
+        with self._connect() as db:
+            cursor = db.execute("UPDATE jobs SET status = 'cancelled', finished = ? "
+                                "WHERE id = ? AND status IN ('queued', 'running')", (time.time(), job_id))
+            if cursor.rowcount:
+                db.execute("UPDATE job_files SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'",
+                           (job_id,))
+    
+    def cleanup(self):
+        """Remove os trabalhos concluídos há mais de ttl_seconds e os seus arquivos; retorna quantos"""
+        with self._connect() as db:
+            expired = [row['id'] for row in db.execute("SELECT id FROM jobs WHERE finished < ?",
+                                                       (time.time() - self.ttl_seconds,))]
+            db.executemany("DELETE FROM job_files WHERE job_id = ?", [(job_id,) for job_id in expired])
+            db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+        for job_id in expired:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        return len(expired)
+    
+    def close(self):
+        """Encerra a fila após registrar as conversões em andamento; os arquivos na fila continuam no banco"""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self._executor.shutdown()
+    
+    def _run(self):
+        last_cleanup = time.monotonic()
+        while not self._closed or self._futures:
+            try:
+                if not self._closed:
+                    self._dispatch()
+                if self._futures:
+                    done, _ = futures_wait(list(self._futures), timeout=self.POLL_SECONDS,
+                                           return_when=FIRST_COMPLETED)
+                else:
+                    self._wake.wait(self.POLL_SECONDS)
+                    self._wake.clear()
+                    done = ()
+                self._drain_progress()
+                for future in done:
+                    if future in self._futures:  # Já descartado se o pool foi recriado
+                        self._collect(future)
+                if time.monotonic() - last_cleanup > self.CLEANUP_SECONDS:
+                    self.cleanup()
+                    last_cleanup = time.monotonic()
+            except sqlite3.OperationalError:
+                # Banco ocupado por outra conexão: tentar novamente no próximo ciclo
+                time.sleep(self.POLL_SECONDS)
+            except Exception:
+                # A thread atende todas as sessões: registrar o erro e seguir com a fila
+                logging.getLogger(__name__).exception("Erro na fila de conversões")
+                time.sleep(self.POLL_SECONDS)
+    
+    def _dispatch(self):
+        """Envia ao pool as consolidações pendentes e os próximos arquivos da fila, até o limite de processos"""
+        self._finish_jobs()
+        while self._busy() < self.workers:
+            with self._connect() as db:
+                row = db.execute(self.CLAIM_QUERY).fetchone()
+                if row is None:
+                    return
+                job_id, position = row['job_id'], row['position']
+                db.execute("UPDATE job_files SET status = 'running' WHERE job_id = ? AND position = ?",
+                           (job_id, position))
+                db.execute("UPDATE jobs SET status = 'running', started = COALESCE(started, ?) WHERE id = ?",
+                           (time.time(), job_id))
+                
+                options = load_job_options(json.loads(row['options']))
+                options['workers'] = 1
+                # Um processo fica sempre livre para o próximo arquivo enviado não esperar este terminar
+                spare = self.workers - self._busy() - 2
+                if spare > 0 and not options['consolidate'] and not db.execute(self.WAITING_QUERY).fetchone()[0]:
+                    # Ninguém mais na fila: os demais processos livres extraem intervalos de páginas deste arquivo
+                    options['workers'] += spare
+            
+            job_dir = self._job_dir(job_id)
+            try:
+                future = self._executor.submit(
+                    convert_batch_file, (job_id, position), os.path.join(job_dir, f'{position}.pdf'), row['name'],
+                    options, os.path.join(job_dir, f'{position}.part'), os.path.join(job_dir, f'{position}.preview')
+                )
+            except Exception as e:
+                # O arquivo não chegou ao pool: devolvê-lo à fila
+                with self._connect() as db:
+                    db.execute("UPDATE job_files SET status = 'queued' WHERE job_id = ? AND position = ?",
+                               (job_id, position))
+                if isinstance(e, BrokenProcessPool):
+                    self._reset_executor()
+                    continue
+                raise
+            self._futures[future] = (job_id, position)
+            self._slots[future] = options['workers']
+    
+    def _busy(self):
+        """Processos ocupados pelos arquivos e consolidações em andamento"""
+        return sum(self._slots.get(future, 1) for future in self._futures)
+    
+    def _finish_jobs(self):
+        """Gera as saídas dos trabalhos cujos arquivos já terminaram"""
+        with self._connect() as db:
+            ready = [(row['id'], json.loads(row['options'])) for row in db.execute(self.FINISHED_FILES_QUERY)
+                     if row['id'] not in self._finishing]
+            done_files = {job_id: db.execute("SELECT position, name FROM job_files WHERE job_id = ? AND status = 'done' "
+                                             "ORDER BY position", (job_id,)).fetchall() for job_id, _ in ready}
+        
+        for job_id, options in ready:
+            extension = OUTPUT_FORMATS[options['format']][1]
+            if not options['consolidate']:
+                outputs = [(os.path.splitext(row['name'])[0] + '_tabelas_consolidadas' + extension,
+                            f"{row['position']}.part") for row in done_files[job_id]]
+                self._finish_job(job_id, outputs=outputs)
+                continue
+            if not done_files[job_id]:
+                self._finish_job(job_id)
+                continue
+            if self._busy() >= self.workers:
+                return  # A consolidação também ocupa um processo do pool
+            
+            job_dir = self._job_dir(job_id)
+            spools = []
+            for row in done_files[job_id]:
+                result = self.result(job_id, row['position'])
+                spools.append((os.path.join(job_dir, f"{row['position']}.part"), result.table_count, result.schema))
+            try:
+                future = self._executor.submit(consolidate_job, spools, load_job_options(options),
+                                               os.path.join(job_dir, 'tabelas_consolidadas' + extension))
+            except BrokenProcessPool:
+                self._reset_executor()
+                return  # Tentar novamente no próximo ciclo, com o novo pool
+            self._futures[future] = (job_id, None)
+            self._finishing.add(job_id)
+    
+    def _finish_job(self, job_id, outputs=(), column_mapping=None, error=None):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = ?, finished = ?, outputs = ?, column_mapping = ?, error = ? "
+                       "WHERE id = ? AND status = 'running'",
+                       ('failed' if error else 'done', time.time(), json.dumps(list(outputs)),
+                        json.dumps(column_mapping or {}), error, job_id))
+    
+    def _reset_executor(self):
+        """Recria o pool depois que um processo morreu; o trabalho em andamento no pool antigo falha"""
+        broken, self._executor = self._executor, self._new_executor()
+        in_flight, self._futures = self._futures, {}
+        for future, (job_id, position) in in_flight.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Concluído antes da falha do pool
+                self._futures[future] = (job_id, position)
+                self._collect(future)
+            else:
+                self._slots.pop(future, None)
+                self._fail(job_id, position, self.BROKEN_POOL_ERROR)
+        broken.shutdown(wait=False, cancel_futures=True)
+    
+    def _fail(self, job_id, position, error):
+        """Registra a falha de um arquivo (ou da consolidação, com position None)"""
+        if position is None:
+            self._finishing.discard(job_id)
+            self._finish_job(job_id, error=error)
+            return
+        with self._connect() as db:
+            db.execute("UPDATE job_files SET status = 'failed', eta = NULL, error = ? "
+                       "WHERE job_id = ? AND position = ?", (error, job_id, position))
+    
+    def _drain_progress(self):
+        updates = []
+        while True:
+            try:
+                (job_id, position), update = self._progress.get_nowait()
+            except queue.Empty:
+                break
+            updates.append((job_id, position, update))
+        if not updates:
+            return
+        with self._connect() as db:
+            for job_id, position, update in updates:
+                assignments = ', '.join(f'{column} = ?' for column in update)
+                db.execute(f"UPDATE job_files SET {assignments} WHERE job_id = ? AND position = ? AND status = 'running'",
+                           (*update.values(), job_id, position))
+    
+    def _collect(self, future):
+        """Registra o resultado de um arquivo ou da consolidação de um trabalho"""
+        job_id, position = self._futures.pop(future)
+        self._slots.pop(future, None)
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            self._fail(job_id, position, self.BROKEN_POOL_ERROR)
+            self._reset_executor()
+            return
+        except Exception as e:
+            self._fail(job_id, position, str(e))
+            return
+        
+        if position is None:
+            self._finishing.discard(job_id)
+            extension = OUTPUT_FORMATS[self.status(job_id)['options']['format']][1]
+            file_name = 'tabelas_consolidadas' + extension
+            self._finish_job(job_id, outputs=[(file_name, file_name)], column_mapping=result)
+            return
+        
+        try:
+            with open(os.path.join(self._job_dir(job_id), f'{position}.result'), 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self._fail(job_id, position, f"Não foi possível gravar o resultado: {str(e)}")
+            return
+        with self._connect() as db:
+            db.execute("UPDATE job_files SET status = 'done', tables = ?, rows = ?, eta = NULL, seconds = ?, "
+                       "warnings = ? WHERE job_id = ? AND position = ?",
+                       (result.table_count, result.row_count, result.stats.get('total_seconds'),
+                        json.dumps(list(result.warnings)), job_id, position))
+
+# Versão do formato dos resultados; alterar invalida entradas antigas do cache em disco
+CACHE_VERSION = 8
+
+class ResultCache:
+    """Cache LRU de resultados de conversão (ConversionResult e XLSX final)
+    
+    As entradas são indexadas pelo hash do conteúdo do PDF e pelas configurações
+    de extração. A memória é limitada por max_bytes; se disk_dir for informado,
+    as entradas também são gravadas em disco (limitadas por max_disk_bytes) e
+    recuperadas de lá quando saem da memória.
+    """
+    
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_dir=None, max_disk_bytes=2 * 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # chave -> (resultado, xlsx, tamanho)
+        self._size = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(pdf_bytes, settings=None):
+        """Gera a chave do cache a partir do conteúdo do PDF e das configurações"""
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        settings_json = json.dumps(settings or {}, sort_keys=True, default=str)
+        settings_digest = hashlib.sha256(settings_json.encode('utf-8')).hexdigest()[:16]
+        return f"v{CACHE_VERSION}-{digest}-{settings_digest}"
+    
+    @staticmethod
+    def estimate_size(result, xlsx_bytes):
+        """Estima a memória ocupada por uma entrada"""
+        size = len(xlsx_bytes) if xlsx_bytes else 0
+        return size + result.memory_usage()
+    
+    def get(self, key):
+        """Retorna (resultado, xlsx_bytes) ou None se a chave não estiver no cache"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1]
+        
+        entry = self._load_from_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        
+        # Promover para a memória
+        self._store_in_memory(key, entry[0], entry[1])
+        return entry
+    
+    def put(self, key, result, xlsx_bytes):
+        """Armazena o resultado de uma conversão"""
+        self._store_in_memory(key, result, xlsx_bytes)
+        self._store_on_disk(key, result, xlsx_bytes)
+    
+    def clear(self):
+        """Remove todas as entradas em memória"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+    
+    def _store_in_memory(self, key, result, xlsx_bytes):
+        size = self.estimate_size(result, xlsx_bytes)
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[2]
+            if size > self.max_bytes:
+                return  # Entrada maior que o limite: manter apenas em disco
+            self._entries[key] = (result, xlsx_bytes, size)
+            self._size += size
+            # Remover as entradas menos usadas recentemente
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted[2]
+    
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.pkl')
+    
+    def _load_from_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                result, xlsx_bytes = pickle.load(f)
+            os.utime(path)  # Atualizar a data de acesso para a política LRU em disco
+            return result, xlsx_bytes
+        except Exception:
+            return None
+    
+    def _store_on_disk(self, key, result, xlsx_bytes):
+        if not self.disk_dir:
+            return
+        tmp_path = None
+        try:
+            # Gravar em arquivo temporário e renomear para não deixar entradas corrompidas
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((result, xlsx_bytes), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._disk_path(key))
+            self._evict_disk()
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except:
+                pass
+    
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
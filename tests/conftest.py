@@ -0,0 +1,99 @@
+"""Fixtures compartilhadas: PDFs sintéticos (gerados com benchmark.py) e opções de conversão"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import converter
+
+
+class PageBuilder:
+    """Fluxo de conteúdo de uma página montado a partir de linhas de texto e tabelas"""
+
+    def __init__(self):
+        self.ops = []
+        self.y = benchmark.PAGE_HEIGHT - 50
+
+    def text(self, value, size=benchmark.FONT_SIZE):
+        self.ops.append(f"BT /F1 {size} Tf {benchmark.MARGIN} {self.y:.2f} Td "
+                        f"({benchmark.escape_pdf_text(value)}) Tj ET")
+        self.y -= 18
+        return self
+
+    def table(self, rows, ruled=True):
+        column_width = (benchmark.PAGE_WIDTH - 2 * benchmark.MARGIN) / len(rows[0])
+        top = self.y
+        for r, row in enumerate(rows):
+            for c, cell in enumerate(row):
+                self.ops.append(f"BT /F1 {benchmark.FONT_SIZE} Tf {benchmark.MARGIN + 2 + c * column_width:.2f} "
+                                f"{top - (r + 1) * benchmark.ROW_HEIGHT + 4:.2f} Td "
+                                f"({benchmark.escape_pdf_text(cell)}) Tj ET")
+        bottom = top - len(rows) * benchmark.ROW_HEIGHT
+        if ruled:
+            for r in range(len(rows) + 1):
+                row_y = top - r * benchmark.ROW_HEIGHT
+                self.ops.append(f"{benchmark.MARGIN} {row_y:.2f} m "
+                                f"{benchmark.PAGE_WIDTH - benchmark.MARGIN:.2f} {row_y:.2f} l S")
+            for c in range(len(rows[0]) + 1):
+                col_x = benchmark.MARGIN + c * column_width
+                self.ops.append(f"{col_x:.2f} {top:.2f} m {col_x:.2f} {bottom:.2f} l S")
+        self.y = bottom - 30
+        return self
+
+    def rule(self, x0, y0, x1, y1):
+        self.ops.append(f"{x0} {y0} m {x1} {y1} l S")
+        return self
+
+    def content(self):
+        return "\n".join(self.ops)
+
+
+def data_rows(count, seed=1, cols=5, header=True):
+    """Linhas de uma tabela sintética (com o cabeçalho padrão do benchmark, se header)"""
+    import random
+    rnd = random.Random(seed)
+    rows = [benchmark.synthetic_row(rnd, cols, r) for r in range(count)]
+    return ([benchmark.synthetic_headers(cols)] if header else []) + rows
+
+
+@pytest.fixture
+def write_pages(tmp_path):
+    """Grava um PDF com uma página por PageBuilder e retorna o caminho"""
+    def write(name, pages):
+        contents = [page.content() for page in pages]
+        build_page_content = benchmark.build_page_content
+        benchmark.build_page_content = lambda index, case, rnd: contents[index]
+        try:
+            return benchmark.write_synthetic_pdf(str(tmp_path / name), pages=len(contents))
+        finally:
+            benchmark.build_page_content = build_page_content
+    return write
+
+
+@pytest.fixture
+def corpus_pdf(tmp_path):
+    """Grava um caso do corpus do benchmark, com parâmetros alterados, e retorna o caminho"""
+    def write(name, **overrides):
+        case = dict(benchmark.CORPUS_CASES[name], **overrides)
+        return benchmark.write_synthetic_pdf(str(tmp_path / f"{name}.pdf"), **case)
+    return write
+
+
+@pytest.fixture
+def job_options():
+    """Opções de um trabalho da fila, como as enviadas pela interface"""
+    return dict(format='xlsx', streaming=True, adaptive=True, align=True, stitch=True, consolidate=False,
+                checkpoint_dir=None, backend='pdfplumber', profiler=None, cleaning=converter.CleaningRules())
+
+
+def convert(path, **kwargs):
+    """Converte um PDF para Parquet e retorna o ConversionResult e a tabela consolidada"""
+    import pandas as pd
+
+    result, output_file = converter.convert_pdf(path, converter.make_sink('parquet'), **kwargs)
+    with output_file:
+        frame = pd.read_parquet(output_file) if result.table_count else pd.DataFrame()
+    return result, frame
@@ -0,0 +1,22 @@
+"""Alinhamento de cabeçalhos entre tabelas (ColumnAligner)"""
+import pandas as pd
+import pytest
+
+import benchmark
+import converter
+
+
+@pytest.mark.parametrize('first, second, expected', benchmark.ALIGNMENT_CHECKS)
+def test_only_spelling_variants_are_merged(first, second, expected):
+    aligner = converter.ColumnAligner()
+    aligner.align(pd.DataFrame(columns=[first]))
+    aligned = aligner.align(pd.DataFrame(columns=[second]))
+
+    assert (list(aligned.columns) == [first]) is expected
+
+
+def test_columns_of_one_table_are_never_merged():
+    aligner = converter.ColumnAligner()
+    aligned = aligner.align(pd.DataFrame(columns=['Valor Total', 'VALOR  TOTAL']))
+
+    assert list(aligned.columns) == ['Valor Total', 'Valor Total_1']
@@ -0,0 +1,46 @@
+"""Linha de comando: arquivo consolidado e detecção de saídas atualizadas"""
+import os
+
+import cli
+
+
+def run(tmp_path, *inputs):
+    return cli.main([*map(str, inputs), '-j', '1', '--json', '--consolidate', str(tmp_path / 'out.xlsx')])
+
+
+def test_failed_input_is_retried_on_next_run(corpus_pdf, tmp_path, capsys):
+    good = corpus_pdf('ruled', pages=2)
+    bad = tmp_path / 'bad.pdf'
+    bad.write_text('não é um PDF')
+
+    assert run(tmp_path, good, bad) == 1
+    # A saída foi publicada, mas a falha não pode ser esquecida na execução seguinte
+    assert os.path.exists(tmp_path / 'out.xlsx')
+    assert run(tmp_path, good, bad) == 1
+
+
+def test_unchanged_inputs_are_skipped(corpus_pdf, tmp_path, capsys):
+    first = corpus_pdf('ruled', pages=2)
+    second = corpus_pdf('unruled', pages=2)
+
+    assert run(tmp_path, first, second) == 0
+    capsys.readouterr()
+    assert run(tmp_path, first, second) == 0
+    assert '"skipped": 2' in capsys.readouterr().out
+
+
+def test_changed_or_removed_inputs_rebuild(corpus_pdf, tmp_path, capsys):
+    first = corpus_pdf('ruled', pages=2)
+    second = corpus_pdf('unruled', pages=2)
+    run(tmp_path, first, second)
+
+    capsys.readouterr()
+    run(tmp_path, first)
+    assert '"converted": 1' in capsys.readouterr().out
+
+    run(tmp_path, first, second)
+    stat = os.stat(second)
+    os.utime(second, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    capsys.readouterr()
+    run(tmp_path, first, second)
+    assert '"converted": 2' in capsys.readouterr().out
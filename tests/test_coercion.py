@@ -0,0 +1,37 @@
+"""Conversão de colunas: o caminho por valor (tabelas pequenas) e o vetorizado dão o mesmo resultado"""
+import pandas as pd
+import pytest
+
+import converter
+
+NUMBERS = ['R$ 1.234,56', '1,234.56', '12,5', '-3', '1.234.567', '1,234,567', 'abc', None, '', '.5', '1e3', '10.5']
+PERCENTS = ['12,5%', '3%', ' 7,25 % ', '1.234,5%', 'n/d', None, '-0,5%']
+DATES = ['01/02/2020', '2020-02-01', '31/02/2020', '01/02/1500', '1/2/20', '20/12/31', 'hoje', None, ' 05-06-2021 ']
+
+
+def both_paths(convert, values, *args):
+    """Converte os valores como tabela pequena e repetidos em uma coluna grande"""
+    small = pd.Series(values, dtype='object')
+    repeats = converter.VECTORIZED_MIN_ROWS // len(values) + 1
+    large = pd.Series(values * repeats, dtype='object')
+    assert len(small) < converter.VECTORIZED_MIN_ROWS <= len(large)
+    return convert(small, *args), convert(large, *args).iloc[:len(values)]
+
+
+@pytest.mark.parametrize('convert, values', [
+    (converter.convert_series_to_numeric, NUMBERS),
+    (converter.convert_series_to_percent, PERCENTS),
+])
+def test_numeric_paths_match(convert, values):
+    small, large = both_paths(convert, values)
+    assert small.dtype == large.dtype == 'float64'
+    pd.testing.assert_series_equal(small, large)
+
+
+@pytest.mark.parametrize('date_formats', [None, ['%y/%m/%d'] + converter.DATE_FORMATS])
+def test_date_paths_match(date_formats):
+    small, large = both_paths(converter.convert_series_to_date, DATES, date_formats)
+    assert small.dtype == large.dtype == 'object'
+    # A conversão vetorizada mistura NaN e None nos valores que não são datas
+    assert [None if pd.isna(value) else value for value in small] == \
+        [None if pd.isna(value) else value for value in large]
@@ -0,0 +1,56 @@
+"""Extração por página: escolha de estratégia, processos paralelos e checkpoints"""
+import os
+
+import converter
+from conftest import PageBuilder, convert, data_rows
+
+
+def mixed_ruling_pdf(write_pages):
+    # Página 1 sem traçado (com um fio solto), página 2 com duas tabelas traçadas
+    return write_pages('mixed.pdf', [
+        PageBuilder().text("Extrato sem traçado").table(data_rows(20, seed=1), ruled=False).rule(40, 60, 300, 60),
+        PageBuilder().text("Quadro 1").table(data_rows(10, seed=2)).text("Quadro 2").table(data_rows(10, seed=3)),
+    ])
+
+
+def test_output_does_not_depend_on_worker_count(write_pages):
+    path = mixed_ruling_pdf(write_pages)
+    serial = list(converter.iter_extracted_tables(path, workers=1))
+    parallel = list(converter.iter_extracted_tables(path, workers=2))
+
+    assert len(serial) == len(parallel) == 3
+    for a, b in zip(serial, parallel):
+        assert a.equals(b)
+
+
+def test_checkpoint_resume_matches_uncheckpointed_run(corpus_pdf, tmp_path):
+    path = corpus_pdf('ruled', pages=converter.CHECKPOINT_PAGES + 5, tables=1, rows=5)
+    checkpoint_dir = str(tmp_path / 'checkpoints')
+    _, expected = convert(path)
+
+    first, first_frame = convert(path, checkpoint_dir=checkpoint_dir)
+    assert not first.stats.get('pages_resumed')
+    assert first_frame.equals(expected)
+
+    resumed, resumed_frame = convert(path, checkpoint_dir=checkpoint_dir)
+    assert resumed.stats['pages_resumed'] == converter.CHECKPOINT_PAGES + 5
+    assert resumed_frame.equals(expected)
+
+
+def test_interrupted_run_extracts_only_missing_ranges(corpus_pdf, tmp_path):
+    path = corpus_pdf('statement', pages=converter.CHECKPOINT_PAGES + 5)
+    checkpoint_dir = str(tmp_path / 'checkpoints')
+    _, expected = convert(path)
+    convert(path, checkpoint_dir=checkpoint_dir)
+
+    # Simular uma interrupção antes do último intervalo
+    fragments = [os.path.join(root, name) for root, _, names in os.walk(checkpoint_dir) for name in names
+                 if name.endswith('.parquet')]
+    assert len(fragments) == 2
+    os.remove(max(fragments))
+
+    resumed, resumed_frame = convert(path, checkpoint_dir=checkpoint_dir)
+    assert resumed.stats['pages_resumed'] == converter.CHECKPOINT_PAGES
+    # A união entre páginas atravessa a fronteira dos fragmentos
+    assert resumed.table_count == 2
+    assert resumed_frame.equals(expected)
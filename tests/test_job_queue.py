@@ -0,0 +1,151 @@
+"""Fila de conversões em segundo plano (JobQueue)"""
+import os
+import sqlite3
+import time
+
+import pytest
+
+import converter
+
+CONVERT_BATCH_FILE = converter.convert_batch_file
+
+
+def wait_finished(job_queue, job_id, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = job_queue.status(job_id)
+        if status is None or status['finished']:
+            return status
+        time.sleep(0.1)
+    raise AssertionError(f"trabalho {job_id} não terminou em {timeout}s")
+
+
+@pytest.fixture
+def pdf_bytes(corpus_pdf):
+    with open(corpus_pdf('ruled', pages=2), 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(**kwargs):
+        job_queue = converter.JobQueue(str(tmp_path / 'jobs'), **kwargs)
+        queues.append(job_queue)
+        return job_queue
+    yield make
+    for job_queue in queues:
+        if not job_queue._closed:
+            job_queue.close()
+
+
+def slow_first_file(index, source, name, options, path, preview_path=None):
+    if name == 'lento.pdf':
+        time.sleep(2)
+    return CONVERT_BATCH_FILE(index, source, name, options, path, preview_path)
+
+
+def record_workers(index, source, name, options, path, preview_path=None):
+    with open(path + '.workers', 'w') as f:
+        f.write(str(options['workers']))
+    if name == 'grande.pdf':
+        time.sleep(3)
+    return CONVERT_BATCH_FILE(index, source, name, options, path, preview_path)
+
+
+def crash_on_file(index, source, name, options, path, preview_path=None):
+    if name == 'falha.pdf':
+        time.sleep(0.5)
+        os._exit(1)  # Como um encerramento por falta de memória
+    return CONVERT_BATCH_FILE(index, source, name, options, path, preview_path)
+
+
+
+def test_single_file_job(make_queue, pdf_bytes, job_options):
+    job_queue = make_queue(workers=1)
+    job_id = job_queue.submit([('a.pdf', pdf_bytes)], job_options)
+    status = wait_finished(job_queue, job_id)
+
+    assert status['status'] == 'done'
+    assert [state['status'] for state in status['files']] == ['done']
+    assert job_queue.result(job_id).table_count == 4
+    assert os.path.exists(status['outputs'][0][1])
+    assert job_queue.preview(job_id) is not None
+
+
+def test_lone_file_leaves_a_process_for_the_next_job(make_queue, pdf_bytes, job_options, monkeypatch):
+    monkeypatch.setattr(converter, 'convert_batch_file', record_workers)
+    job_queue = make_queue(workers=3)
+    big = job_queue.submit([('grande.pdf', pdf_bytes)], job_options)
+    while job_queue.status(big)['files'][0]['status'] != 'running':
+        time.sleep(0.05)
+    small = job_queue.submit([('pequeno.pdf', pdf_bytes)], job_options)
+
+    assert wait_finished(job_queue, small)['status'] == 'done'
+    assert not job_queue.status(big)['finished']
+    with open(os.path.join(job_queue._job_dir(big), '0.part.workers')) as f:
+        assert f.read() == '2'
+
+
+def test_interrupted_files_are_requeued_on_reopen(make_queue, tmp_path, pdf_bytes, job_options, monkeypatch):
+    monkeypatch.setattr(converter.JobQueue, '_dispatch', lambda self: None)
+    job_queue = make_queue(workers=1)
+    job_id = job_queue.submit([('a.pdf', pdf_bytes)], job_options)
+    job_queue.close()
+
+    # Estado deixado por um servidor encerrado no meio da conversão
+    with sqlite3.connect(str(tmp_path / 'jobs' / 'jobs.sqlite3')) as db:
+        db.execute("UPDATE jobs SET status = 'running'")
+        db.execute("UPDATE job_files SET status = 'running', pages = 1")
+    monkeypatch.undo()
+
+    job_queue = make_queue(workers=1)
+    assert job_queue.status(job_id)['files'][0]['status'] in ('queued', 'running', 'done')
+    assert wait_finished(job_queue, job_id)['files'][0]['status'] == 'done'
+
+
+def test_cancel_drops_queued_files(make_queue, pdf_bytes, job_options, monkeypatch):
+    monkeypatch.setattr(converter, 'convert_batch_file', slow_first_file)
+    job_queue = make_queue(workers=1)
+    job_id = job_queue.submit([('lento.pdf', pdf_bytes), ('b.pdf', pdf_bytes), ('c.pdf', pdf_bytes)],
+                              job_options)
+    while job_queue.status(job_id)['files'][0]['status'] != 'running':
+        time.sleep(0.05)
+    job_queue.cancel(job_id)
+    job_queue.close()
+
+    status = job_queue.status(job_id)
+    assert status['status'] == 'cancelled'
+    assert [state['status'] for state in status['files'][1:]] == ['cancelled', 'cancelled']
+
+
+def test_finished_jobs_expire(make_queue, pdf_bytes, job_options):
+    job_queue = make_queue(workers=1, ttl_seconds=0.5)
+    job_id = job_queue.submit([('a.pdf', pdf_bytes)], job_options)
+    wait_finished(job_queue, job_id)
+    time.sleep(0.6)
+
+    assert job_queue.cleanup() == 1
+    assert job_queue.status(job_id) is None
+    assert not os.path.exists(job_queue._job_dir(job_id))
+
+
+def test_queue_survives_a_dead_pool_process(make_queue, pdf_bytes, job_options, monkeypatch):
+    monkeypatch.setattr(converter, 'convert_batch_file', crash_on_file)
+    # Com um único processo, os demais arquivos ainda esperam na fila quando ele morre
+    job_queue = make_queue(workers=1)
+    crashed = job_queue.submit([('falha.pdf', pdf_bytes), ('a.pdf', pdf_bytes)], job_options)
+    later = job_queue.submit([('b.pdf', pdf_bytes)], job_options)
+
+    crashed_status = wait_finished(job_queue, crashed)
+    assert crashed_status['files'][0]['status'] == 'failed'
+    assert crashed_status['files'][0]['error'] == converter.JobQueue.BROKEN_POOL_ERROR
+    assert crashed_status['files'][1]['status'] == 'done'
+    assert wait_finished(job_queue, later)['files'][0]['status'] == 'done'
+
+    # O pool recriado continua atendendo, inclusive consolidações
+    after = job_queue.submit([('c.pdf', pdf_bytes), ('d.pdf', pdf_bytes)], dict(job_options, consolidate=True))
+    status = wait_finished(job_queue, after)
+    assert status['status'] == 'done' and status['outputs']
+    assert job_queue._thread.is_alive()
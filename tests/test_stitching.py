@@ -0,0 +1,66 @@
+"""União de tabelas quebradas entre páginas (TableStitcher)"""
+from conftest import PageBuilder, convert, data_rows
+
+
+def test_statement_is_stitched_and_boilerplate_dropped(corpus_pdf):
+    result, frame = convert(corpus_pdf('statement', pages=4))
+
+    # Quadro do topo (uma vez) e a tabela contínua, com os 4 x 40 lançamentos
+    assert result.table_count == 2
+    assert result.stats['tables_stitched'] == 3
+    assert result.stats['tables_deduplicated'] == 3
+    main = frame[frame['Origem'].astype(str).str.contains('Demonstrativo de parcelas')]
+    assert len(main) == 160
+    assert sorted(main['Página'].unique()) == [1, 2, 3, 4]
+
+
+def test_stitching_matches_serial_with_workers(corpus_pdf):
+    path = corpus_pdf('statement', pages=4)
+    serial, serial_frame = convert(path)
+    parallel, parallel_frame = convert(path, workers=2)
+
+    assert parallel.stats['tables_stitched'] == serial.stats['tables_stitched']
+    assert parallel_frame.equals(serial_frame)
+
+
+def test_new_titled_tables_are_not_stitched(corpus_pdf):
+    result, frame = convert(corpus_pdf('titled', pages=4))
+
+    assert result.table_count == 4
+    assert result.stats['tables_stitched'] == 0
+
+
+def test_table_with_other_title_keeps_its_origin(write_pages):
+    # Mesmo cabeçalho e colunas; a tabela da página 2 tem título próprio
+    path = write_pages('titles.pdf', [
+        PageBuilder().text("Relatório anual").text("Prêmios emitidos").table(data_rows(45, seed=1)),
+        PageBuilder().text("Sinistros pagos").table(data_rows(20, seed=2)),
+    ])
+    result, frame = convert(path)
+
+    assert result.table_count == 2
+    assert result.stats['tables_stitched'] == 0
+    origins = frame.groupby('Página', observed=True)['Origem'].first().astype(str)
+    assert origins[1].endswith("Prêmios emitidos")
+    assert origins[2] == "Sinistros pagos"
+
+
+def test_running_page_header_does_not_block_stitching(write_pages):
+    path = write_pages('running.pdf', [
+        PageBuilder().text("Relatório de prêmios - Página 1").table(data_rows(45, seed=1)),
+        PageBuilder().text("Relatório de prêmios - Página 2").table(data_rows(48, seed=2, header=False)),
+        PageBuilder().text("Relatório de prêmios - Página 3").table(data_rows(20, seed=3)),
+    ])
+    result, frame = convert(path)
+
+    assert result.table_count == 1
+    assert result.stats['tables_stitched'] == 2
+    # A primeira linha da página 2, lida como cabeçalho, volta a ser dado
+    assert len(frame) == 45 + 48 + 20
+
+
+def test_no_stitch_keeps_every_part(corpus_pdf):
+    result, _ = convert(corpus_pdf('statement', pages=4), stitch_tables=False)
+
+    assert result.table_count == 8
+    assert result.stats.get('tables_stitched', 0) == 0